@@ -2,7 +2,8 @@
 Admin Configuration for Meal Plans App
 """
 from django.contrib import admin
-from .models import MealPlan, Meal
+from .models import MealPlan, Meal, MealPlanTemplate, TemplateMeal, CalendarFeed
+from apps.shopping.regeneration import refresh_plan_lists
 
 
 class MealInline(admin.TabularInline):
@@ -21,6 +22,24 @@ class MealPlanAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     inlines = [MealInline]
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').with_summary()
+    
+    @admin.display(description='Total recipes', ordering='meal_count')
+    def total_recipes(self, obj):
+        return obj.meal_count
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'user' in form.changed_data:
+            # Keep the denormalized owner on meals in sync
+            obj.meals.update(user=obj.user)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change and any(formset.has_changed() for formset in formsets):
+            refresh_plan_lists(form.instance.pk)
+    
     fieldsets = (
         ('Basic Information', {
             'fields': ('user', 'name', 'description')
@@ -36,3 +55,27 @@ class MealPlanAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+class TemplateMealInline(admin.TabularInline):
+    """Inline admin for template meals"""
+    model = TemplateMeal
+    extra = 1
+    autocomplete_fields = ['recipe']
+
+
+@admin.register(MealPlanTemplate)
+class MealPlanTemplateAdmin(admin.ModelAdmin):
+    """Admin configuration for MealPlanTemplate model"""
+    list_display = ['name', 'user', 'created_at']
+    search_fields = ['name', 'user__username', 'description']
+    readonly_fields = ['created_at', 'updated_at']
+    inlines = [TemplateMealInline]
+
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    """Admin configuration for CalendarFeed model"""
+    list_display = ['user', 'created_at']
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = ['token', 'created_at']
@@ -8,6 +8,7 @@ from . import api_views
 router = DefaultRouter()
 router.register(r'meal-plans', api_views.MealPlanViewSet, basename='mealplan')
 router.register(r'meals', api_views.MealViewSet, basename='meal')
+router.register(r'templates', api_views.MealPlanTemplateViewSet, basename='mealplantemplate')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,14 +1,27 @@
 """
 REST API Views for Meal Plans App
 """
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from .models import MealPlan, Meal
+from django.db.models import Count, Prefetch
+from django.utils import timezone
+
+from .models import MealPlan, Meal, MealPlanTemplate, attach_recipe_previews
 from .serializers import (
-    MealPlanListSerializer, MealPlanDetailSerializer,
-    MealPlanCreateUpdateSerializer, MealSerializer
+    MealPlanListSerializer, MealPlanDetailSerializer, MealPlanCompactSerializer,
+    MealPlanCreateUpdateSerializer, MealSerializer,
+    MealPlanGenerateSerializer, MealPlanCloneSerializer,
+    MealPlanTemplateSerializer, MealPlanTemplateApplySerializer,
+    MealDateRangeSerializer, MealBatchSerializer
 )
+from .generator import PlanConstraints, generate_meal_plan
+from .cloning import clone_meal_plan, save_as_template, apply_template
+from .batch import MealBatchError, apply_meal_operations
+from apps.recipes.models import Recipe
+from apps.shopping.regeneration import refresh_plan_lists
 
 
 class MealPlanViewSet(viewsets.ModelViewSet):
@@ -16,17 +29,139 @@ class MealPlanViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return MealPlan.objects.filter(user=self.request.user).prefetch_related('meals__recipe')
+        queryset = MealPlan.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            return queryset.with_summary().select_related('user').order_by('-start_date')
+        if self.is_compact():
+            # Recipes of meals still pointing at a queued recipe are sideloaded too
+            return queryset.select_related('user').prefetch_related(
+                'meals',
+                Prefetch(
+                    'meals__recipe',
+                    queryset=Recipe._base_manager.select_related('author', 'category')
+                    .prefetch_related('dietary_tags').annotate(favorites_count=Count('favorited_by'))
+                )
+            )
+        return queryset.prefetch_related(
+            Prefetch(
+                'meals',
+                queryset=Meal.objects.select_related(
+                    'recipe__author', 'recipe__category'
+                ).prefetch_related('recipe__dietary_tags')
+            )
+        )
+    
+    def is_compact(self):
+        """Whether ?compact= asks for meals with sideloaded recipes"""
+        return self.request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+    
+    def detail_data(self, meal_plan):
+        """Serialize a meal plan in the representation requested for detail responses"""
+        serializer_class = MealPlanCompactSerializer if self.is_compact() else MealPlanDetailSerializer
+        return serializer_class(meal_plan, context=self.get_serializer_context()).data
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action == 'list':
+            page = attach_recipe_previews(page)
+        return page
     
     def get_serializer_class(self):
         if self.action == 'list':
             return MealPlanListSerializer
         elif self.action in ['create', 'update', 'partial_update']:
             return MealPlanCreateUpdateSerializer
+        elif self.action == 'generate':
+            return MealPlanGenerateSerializer
+        elif self.action == 'clone':
+            return MealPlanCloneSerializer
+        elif self.action == 'batch':
+            return MealBatchSerializer
+        elif self.action == 'save_template':
+            return MealPlanTemplateSerializer
+        elif self.action == 'retrieve' and self.is_compact():
+            return MealPlanCompactSerializer
         return MealPlanDetailSerializer
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def generate(self, request, pk=None):
+        """Fill the open slots of a meal plan with recipes matching the given targets"""
+        meal_plan = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        constraints = PlanConstraints.from_data(serializer.validated_data)
+        meals = generate_meal_plan(
+            meal_plan, request.user, constraints,
+            seed=serializer.validated_data.get('seed')
+        )
+        refresh_plan_lists(
+            meal_plan.pk, None if constraints.replace_existing else {meal.recipe_id for meal in meals}
+        )
+        
+        meal_plan = self.get_queryset().get(pk=meal_plan.pk)
+        data = self.detail_data(meal_plan)
+        data['generated_meals'] = len(meals)
+        return Response(data, status=status.HTTP_201_CREATED if meals else status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['post'])
+    def batch(self, request, pk=None):
+        """Apply a list of create/move/swap/delete meal operations in one transaction"""
+        meal_plan = self.get_object()
+        context = dict(self.get_serializer_context(), meal_plan=meal_plan)
+        serializer = self.get_serializer(data=request.data, context=context)
+        serializer.is_valid(raise_exception=True)
+        
+        operations = serializer.validated_data['operations']
+        # Moves and swaps leave the ingredients alone; creates and deletes change them
+        recipe_ids = {op['recipe_id'] for op in operations if op['op'] == 'create'}
+        deleted_ids = [op['meal_id'] for op in operations if op['op'] == 'delete']
+        if deleted_ids:
+            recipe_ids.update(
+                Meal.objects.filter(meal_plan=meal_plan, pk__in=deleted_ids).values_list('recipe_id', flat=True)
+            )
+        try:
+            created, updated, deleted = apply_meal_operations(meal_plan, request.user, operations)
+        except MealBatchError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        refresh_plan_lists(meal_plan.pk, recipe_ids)
+        
+        meal_plan = self.get_queryset().get(pk=meal_plan.pk)
+        data = self.detail_data(meal_plan)
+        data['batch'] = {'created': created, 'updated': updated, 'deleted': deleted}
+        return Response(data)
+    
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """Copy a meal plan and its meals to a new start date"""
+        meal_plan = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        clone = clone_meal_plan(
+            meal_plan,
+            serializer.validated_data['start_date'],
+            name=serializer.validated_data.get('name')
+        )
+        clone = self.get_queryset().get(pk=clone.pk)
+        return Response(self.detail_data(clone), status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def save_template(self, request, pk=None):
+        """Save a meal plan as a reusable template"""
+        meal_plan = self.get_object()
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        
+        template = save_as_template(
+            meal_plan,
+            name=serializer.validated_data.get('name'),
+            description=serializer.validated_data.get('description')
+        )
+        return Response(MealPlanTemplateSerializer(template).data, status=status.HTTP_201_CREATED)
 
 
 class MealViewSet(viewsets.ModelViewSet):
@@ -34,5 +169,98 @@ class MealViewSet(viewsets.ModelViewSet):
     serializer_class = MealSerializer
     permission_classes = [IsAuthenticated]
     
+    # Columns of the compact row format returned by range and today
+    compact_fields = [
+        'id', 'meal_plan_id', 'date', 'meal_type', 'day_of_week', 'servings',
+        'is_completed', 'recipe_id', 'recipe__title', 'recipe__slug', 'recipe__calories'
+    ]
+    
     def get_queryset(self):
-        return Meal.objects.filter(meal_plan__user=self.request.user).select_related('recipe', 'meal_plan')
+        queryset = Meal.objects.filter(user=self.request.user).select_related('recipe', 'meal_plan')
+        if self.action == 'list' and 'start' in self.request.query_params:
+            start, end = self._date_range()
+            queryset = queryset.filter(date__range=(start, end))
+        return queryset
+    
+    def perform_create(self, serializer):
+        meal = serializer.save()
+        refresh_plan_lists(meal.meal_plan_id, [meal.recipe_id])
+    
+    def perform_update(self, serializer):
+        previous = (serializer.instance.meal_plan_id, serializer.instance.recipe_id, serializer.instance.servings)
+        meal = serializer.save()
+        if previous != (meal.meal_plan_id, meal.recipe_id, meal.servings):
+            refresh_plan_lists(previous[0], {previous[1], meal.recipe_id})
+            if meal.meal_plan_id != previous[0]:
+                refresh_plan_lists(meal.meal_plan_id, {previous[1], meal.recipe_id})
+    
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        refresh_plan_lists(instance.meal_plan_id, [instance.recipe_id])
+    
+    def _date_range(self):
+        serializer = MealDateRangeSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['start'], serializer.validated_data['end']
+    
+    def _compact_response(self, start, end):
+        rows = Meal.objects.filter(
+            user=self.request.user, date__range=(start, end)
+        ).order_by('date', 'meal_type', 'id').values_list(*self.compact_fields)
+        return Response({
+            'start': start,
+            'end': end,
+            'columns': [field.replace('__', '_') for field in self.compact_fields],
+            'rows': list(rows),
+        })
+    
+    @action(detail=False, methods=['get'], url_path='range')
+    def date_range(self, request):
+        """Meals across all plans between ?start= and ?end= (inclusive) as compact rows"""
+        start, end = self._date_range()
+        return self._compact_response(start, end)
+    
+    @action(detail=False, methods=['get'])
+    def today(self, request):
+        """Today's meals across all plans as compact rows"""
+        today = timezone.localdate()
+        return self._compact_response(today, today)
+
+
+class MealPlanTemplateViewSet(viewsets.ModelViewSet):
+    """API endpoint for meal plan templates"""
+    serializer_class = MealPlanTemplateSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+    
+    def get_queryset(self):
+        return MealPlanTemplate.objects.filter(user=self.request.user).prefetch_related('meals__recipe')
+    
+    def get_serializer_class(self):
+        if self.action == 'apply':
+            return MealPlanTemplateApplySerializer
+        return MealPlanTemplateSerializer
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def apply(self, request, pk=None):
+        """Create one meal plan per week from this template"""
+        template = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        plans = apply_template(
+            template,
+            serializer.validated_data['start_date'],
+            weeks=serializer.validated_data['weeks'],
+            name=serializer.validated_data.get('name')
+        )
+        # Same annotations and previews as the list endpoint instead of a COUNT per plan
+        plans = attach_recipe_previews(
+            MealPlan.objects.filter(pk__in=[plan.pk for plan in plans])
+            .with_summary().select_related('user').order_by('start_date')
+        )
+        data = MealPlanListSerializer(plans, many=True, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
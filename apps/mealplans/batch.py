@@ -0,0 +1,103 @@
+"""
+Batch Meal Operations for Meal Plans
+
+A list of create/move/swap/delete operations against one plan is validated
+up front with a fixed number of queries, replayed in memory, then written
+with one delete, one bulk_update and one bulk_create inside a transaction.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.recipes.models import Recipe
+from .models import Meal
+
+
+OPERATIONS = ('create', 'move', 'swap', 'delete')
+
+MAX_OPERATIONS = 200
+
+
+class MealBatchError(Exception):
+    """Raised when a batch of meal operations cannot be applied"""
+
+
+def plan_days(meal_plan):
+    """Number of day offsets a meal in this plan may use"""
+    return min(7, (meal_plan.end_date - meal_plan.start_date).days + 1)
+
+
+def visible_recipe_ids(user, recipe_ids):
+    """Subset of recipe_ids the user may plan with, in one query"""
+    return set(
+        Recipe.active.filter(Q(is_public=True) | Q(author=user), id__in=recipe_ids)
+        .values_list('id', flat=True)
+    )
+
+
+def _place(meal, meal_plan, day_of_week, meal_type):
+    meal.day_of_week = day_of_week
+    meal.meal_type = meal_type
+    meal.date = meal_plan.start_date + timedelta(days=day_of_week)
+
+
+@transaction.atomic
+def apply_meal_operations(meal_plan, user, operations):
+    """Apply validated operations to a meal plan; return (created, updated, deleted) counts"""
+    meal_ids = {
+        op[key] for op in operations for key in ('meal_id', 'other_meal_id') if key in op
+    }
+    meals = Meal.objects.select_for_update().filter(meal_plan=meal_plan).in_bulk(meal_ids)
+    missing = meal_ids - set(meals)
+    if missing:
+        raise MealBatchError(f'Meals not in this plan: {", ".join(map(str, sorted(missing)))}')
+
+    recipe_ids = {op['recipe_id'] for op in operations if op['op'] == 'create'}
+    hidden = recipe_ids - visible_recipe_ids(user, recipe_ids)
+    if hidden:
+        raise MealBatchError(f'Recipes not available: {", ".join(map(str, sorted(hidden)))}')
+
+    created, updated, deleted = [], {}, set()
+    for index, op in enumerate(operations):
+        for key in ('meal_id', 'other_meal_id'):
+            if op.get(key) in deleted:
+                raise MealBatchError(f'Operation {index} refers to meal {op[key]} deleted earlier in the batch.')
+
+        if op['op'] == 'create':
+            meal = Meal(
+                meal_plan=meal_plan,
+                user_id=meal_plan.user_id,
+                recipe_id=op['recipe_id'],
+                servings=op.get('servings', 1),
+                notes=op.get('notes', ''),
+            )
+            _place(meal, meal_plan, op['day_of_week'], op['meal_type'])
+            created.append(meal)
+        elif op['op'] == 'move':
+            meal = meals[op['meal_id']]
+            _place(meal, meal_plan, op['day_of_week'], op.get('meal_type', meal.meal_type))
+            updated[meal.pk] = meal
+        elif op['op'] == 'swap':
+            meal, other = meals[op['meal_id']], meals[op['other_meal_id']]
+            slot = (meal.day_of_week, meal.meal_type)
+            _place(meal, meal_plan, other.day_of_week, other.meal_type)
+            _place(other, meal_plan, *slot)
+            updated[meal.pk] = meal
+            updated[other.pk] = other
+        else:
+            deleted.add(op['meal_id'])
+            updated.pop(op['meal_id'], None)
+
+    if deleted:
+        Meal.objects.filter(pk__in=deleted).delete()
+    if updated:
+        # bulk_update skips auto_now, and exports key their ETag on updated_at
+        now = timezone.now()
+        for meal in updated.values():
+            meal.updated_at = now
+        Meal.objects.bulk_update(updated.values(), ['day_of_week', 'meal_type', 'date', 'updated_at'])
+    if created:
+        Meal.objects.bulk_create(created)
+    return len(created), len(updated), len(deleted)
@@ -0,0 +1,98 @@
+"""
+Bulk Clone, Template and Recurring-Week Operations for Meal Plans
+
+Meals are read as plain value rows and written back with bulk_create inside
+one transaction, so copying any number of weeks costs a handful of queries.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+from .models import MealPlan, Meal, MealPlanTemplate, TemplateMeal
+
+
+MEAL_COPY_FIELDS = ('recipe_id', 'meal_type', 'day_of_week', 'servings', 'notes')
+
+
+def _build_meals(meal_plan, rows):
+    """Instantiate Meal rows for a plan, recomputing dates from the day offset"""
+    return [
+        Meal(
+            meal_plan=meal_plan,
+            user_id=meal_plan.user_id,
+            recipe_id=recipe_id,
+            meal_type=meal_type,
+            day_of_week=day_of_week,
+            date=meal_plan.start_date + timedelta(days=day_of_week),
+            servings=servings,
+            notes=notes,
+        )
+        for recipe_id, meal_type, day_of_week, servings, notes in rows
+    ]
+
+
+def _create_plans(plans):
+    """Insert meal plans, in one statement when the database returns primary keys"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return MealPlan.objects.bulk_create(plans)
+    for plan in plans:
+        plan.save()
+    return plans
+
+
+@transaction.atomic
+def clone_meal_plan(meal_plan, start_date, name=None):
+    """Copy a meal plan and all its meals to a new start date"""
+    rows = list(meal_plan.meals.order_by().values_list(*MEAL_COPY_FIELDS))
+    clone = MealPlan.objects.create(
+        user=meal_plan.user,
+        name=name or meal_plan.name,
+        description=meal_plan.description,
+        start_date=start_date,
+        end_date=start_date + (meal_plan.end_date - meal_plan.start_date),
+        is_active=meal_plan.is_active,
+    )
+    Meal.objects.bulk_create(_build_meals(clone, rows))
+    return clone
+
+
+@transaction.atomic
+def save_as_template(meal_plan, name=None, description=None):
+    """Store the meals of a plan as a reusable template"""
+    rows = meal_plan.meals.order_by().values_list(*MEAL_COPY_FIELDS)
+    template = MealPlanTemplate.objects.create(
+        user=meal_plan.user,
+        name=name or meal_plan.name,
+        description=meal_plan.description if description is None else description,
+    )
+    TemplateMeal.objects.bulk_create([
+        TemplateMeal(
+            template=template,
+            recipe_id=recipe_id,
+            meal_type=meal_type,
+            day_of_week=day_of_week,
+            servings=servings,
+            notes=notes,
+        )
+        for recipe_id, meal_type, day_of_week, servings, notes in rows
+    ])
+    return template
+
+
+@transaction.atomic
+def apply_template(template, start_date, weeks=1, name=None):
+    """Create one meal plan per week from a template, starting at start_date"""
+    rows = list(template.meals.order_by().values_list(*MEAL_COPY_FIELDS))
+    name = name or template.name
+    plans = _create_plans([
+        MealPlan(
+            user=template.user,
+            name=f"{name} (Week {week + 1})" if weeks > 1 else name,
+            description=template.description,
+            start_date=start_date + timedelta(weeks=week),
+            end_date=start_date + timedelta(weeks=week, days=6),
+        )
+        for week in range(weeks)
+    ])
+    Meal.objects.bulk_create([meal for plan in plans for meal in _build_meals(plan, rows)])
+    return plans
@@ -0,0 +1,153 @@
+"""
+Streaming iCalendar and JSON Exports of Meal Plans
+
+Meals are read as value rows with ``.iterator()`` so exports of any size are
+produced in constant memory, and every export has a cheap version key that
+views use for conditional GET.
+"""
+import hashlib
+import json
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.urls import reverse
+
+from .models import Meal
+
+
+EXPORT_CHUNK_SIZE = 500
+
+# Local time each meal type is placed at in calendars
+MEAL_TIMES = {
+    'breakfast': time(8, 0),
+    'lunch': time(12, 30),
+    'snack': time(16, 0),
+    'dinner': time(19, 0),
+}
+MEAL_DURATION = timedelta(minutes=45)
+
+EXPORT_FIELDS = (
+    'id', 'meal_plan_id', 'meal_plan__name', 'date', 'meal_type', 'servings',
+    'notes', 'is_completed', 'recipe__title', 'recipe__slug', 'recipe__calories',
+    'created_at', 'updated_at',
+)
+
+
+def export_version(meals):
+    """Return (etag, last_modified) for a meal queryset in one aggregate query"""
+    summary = meals.order_by().aggregate(
+        count=Count('id'),
+        meals_updated=Max('updated_at'),
+        plans_updated=Max('meal_plan__updated_at'),
+        recipes_updated=Max('recipe__updated_at'),
+    )
+    stamps = [summary[key] for key in ('meals_updated', 'plans_updated', 'recipes_updated') if summary[key]]
+    last_modified = max(stamps) if stamps else None
+    key = '{count}:{meals_updated}:{plans_updated}:{recipes_updated}'.format(**summary)
+    return hashlib.md5(key.encode()).hexdigest(), last_modified
+
+
+def _rows(meals):
+    return meals.order_by('date', 'meal_type', 'id').values(*EXPORT_FIELDS).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+
+
+def _ical_escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _ical_line(name, value):
+    """Format a content line, folded at 75 octets as required by RFC 5545"""
+    folded, current, size = [], '', 0
+    for char in f'{name}:{value}':
+        width = len(char.encode())
+        if size + width > 75:
+            folded.append(current)
+            current, size = ' ', 1
+        current += char
+        size += width
+    folded.append(current)
+    return '\r\n'.join(folded) + '\r\n'
+
+
+def _ical_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def iter_ical(meals, calendar_name, recipe_url_prefix=''):
+    """Yield an iCalendar document with one event per meal"""
+    local_tz = ZoneInfo(settings.TIME_ZONE)
+    yield 'BEGIN:VCALENDAR\r\n'
+    yield 'VERSION:2.0\r\n'
+    yield 'PRODID:-//MealMate//Meal Plans//EN\r\n'
+    yield 'CALSCALE:GREGORIAN\r\n'
+    yield _ical_line('X-WR-CALNAME', _ical_escape(calendar_name))
+
+    for row in _rows(meals):
+        start = datetime.combine(row['date'], MEAL_TIMES[row['meal_type']], tzinfo=local_tz)
+        summary = f"{row['meal_type'].title()}: {row['recipe__title']}"
+        description = [f"Meal plan: {row['meal_plan__name']}", f"Servings: {row['servings']}"]
+        if row['recipe__calories']:
+            description.append(f"Calories: {row['recipe__calories'] * row['servings']}")
+        if row['notes']:
+            description.append(row['notes'])
+        url = recipe_url_prefix + reverse('recipes:recipe_detail', kwargs={'slug': row['recipe__slug']})
+
+        # One chunk per event keeps the number of writes down
+        yield ''.join([
+            'BEGIN:VEVENT\r\n',
+            _ical_line('UID', f"meal-{row['id']}@mealmate"),
+            _ical_line('DTSTAMP', _ical_datetime(row['updated_at'])),
+            _ical_line('DTSTART', _ical_datetime(start)),
+            _ical_line('DTEND', _ical_datetime(start + MEAL_DURATION)),
+            _ical_line('SUMMARY', _ical_escape(summary)),
+            _ical_line('DESCRIPTION', _ical_escape('\n'.join(description))),
+            _ical_line('URL', url),
+            'END:VEVENT\r\n',
+        ])
+
+    yield 'END:VCALENDAR\r\n'
+
+
+def iter_json(meals, meal_plan=None):
+    """Yield a JSON document listing every meal, one row at a time"""
+    yield '{'
+    if meal_plan is not None:
+        yield '"meal_plan": ' + json.dumps({
+            'id': meal_plan.pk,
+            'name': meal_plan.name,
+            'description': meal_plan.description,
+            'start_date': meal_plan.start_date,
+            'end_date': meal_plan.end_date,
+        }, cls=DjangoJSONEncoder) + ', '
+    yield '"meals": ['
+    separator = ''
+    for row in _rows(meals):
+        yield separator + json.dumps({
+            'id': row['id'],
+            'meal_plan': row['meal_plan_id'],
+            'date': row['date'],
+            'meal_type': row['meal_type'],
+            'servings': row['servings'],
+            'notes': row['notes'],
+            'is_completed': row['is_completed'],
+            'recipe': {
+                'title': row['recipe__title'],
+                'slug': row['recipe__slug'],
+                'calories': row['recipe__calories'],
+            },
+        }, cls=DjangoJSONEncoder)
+        separator = ', '
+    yield ']}'
+
+
+def user_meals(user):
+    """All meals across a user's meal plans"""
+    return Meal.objects.filter(user=user)
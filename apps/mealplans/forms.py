@@ -53,7 +53,7 @@ class MealForm(forms.ModelForm):
         
         # Filter recipes to show user's recipes and public recipes
         if user:
-            self.fields['recipe'].queryset = Recipe.objects.filter(
+            self.fields['recipe'].queryset = Recipe.active.filter(
                 Q(author=user) | Q(is_public=True)
             ).select_related('category')
         
@@ -87,3 +87,111 @@ class MealForm(forms.ModelForm):
             'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 2, 'placeholder': 'Optional notes'}),
         }
 
+
+
+class MealPlanGenerateForm(forms.Form):
+    """Form for automatically filling a meal plan with recipes"""
+    
+    meal_types = forms.MultipleChoiceField(
+        choices=Meal.MEAL_TYPE_CHOICES,
+        initial=[choice for choice, _ in Meal.MEAL_TYPE_CHOICES],
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'})
+    )
+    calorie_target = forms.IntegerField(
+        required=False, min_value=1,
+        help_text="Daily calories",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 2000'})
+    )
+    protein_target = forms.DecimalField(
+        required=False, min_value=1, max_digits=6, decimal_places=2,
+        help_text="Daily protein in grams",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 120'})
+    )
+    carbohydrates_target = forms.DecimalField(
+        required=False, min_value=1, max_digits=6, decimal_places=2,
+        help_text="Daily carbs in grams",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 250'})
+    )
+    fat_target = forms.DecimalField(
+        required=False, min_value=1, max_digits=6, decimal_places=2,
+        help_text="Daily fat in grams",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 70'})
+    )
+    max_breakfast_minutes = forms.IntegerField(
+        required=False, min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Any'})
+    )
+    max_lunch_minutes = forms.IntegerField(
+        required=False, min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Any'})
+    )
+    max_dinner_minutes = forms.IntegerField(
+        required=False, min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Any'})
+    )
+    max_snack_minutes = forms.IntegerField(
+        required=False, min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Any'})
+    )
+    no_repeat_days = forms.IntegerField(
+        initial=3, min_value=0, max_value=7,
+        help_text="Don't repeat a recipe within this many days",
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    servings = forms.IntegerField(
+        initial=1, min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    use_dietary_preferences = forms.BooleanField(
+        required=False, initial=True,
+        label="Only use recipes matching my dietary preferences",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    replace_existing = forms.BooleanField(
+        required=False,
+        label="Replace meals already in the plan",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+
+class MealPlanCloneForm(forms.Form):
+    """Form for copying a meal plan to a new start date"""
+    
+    name = forms.CharField(
+        max_length=200,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Name of the new meal plan'})
+    )
+    start_date = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+
+class MealPlanTemplateForm(forms.Form):
+    """Form for saving a meal plan as a reusable template"""
+    
+    name = forms.CharField(
+        max_length=200,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., High Protein Week'})
+    )
+    description = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Optional description'})
+    )
+
+
+class MealPlanTemplateApplyForm(forms.Form):
+    """Form for creating meal plans from a template"""
+    
+    start_date = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    weeks = forms.IntegerField(
+        initial=1, min_value=1, max_value=52,
+        help_text="Number of consecutive weeks to create",
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    name = forms.CharField(
+        max_length=200, required=False,
+        help_text="Defaults to the template name",
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Optional plan name'})
+    )
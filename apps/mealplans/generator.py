@@ -0,0 +1,306 @@
+"""
+Automatic Meal Plan Generation for MealMate
+
+Recipes are pruned in SQL (visibility, dietary preferences, time limits),
+loaded once into flat per-recipe feature arrays, then assigned to the open
+slots of a plan with a greedy pass followed by a bounded local search.
+"""
+import bisect
+import random
+from array import array
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from apps.recipes.models import Recipe
+from .models import Meal
+
+
+# Share of the daily nutrition targets each meal type is expected to cover
+MEAL_TYPE_SHARES = {
+    'breakfast': 0.25,
+    'lunch': 0.35,
+    'dinner': 0.30,
+    'snack': 0.10,
+}
+
+NUTRIENTS = ('calories', 'protein', 'carbohydrates', 'fat')
+
+# Meal.day_of_week is the day offset from the plan's start date
+PLAN_DAYS = 7
+
+
+class PlanConstraints:
+    """Targets and limits used when generating a meal plan"""
+
+    def __init__(self, meal_types=None, calories=None, protein=None, carbohydrates=None,
+                 fat=None, max_minutes=None, no_repeat_days=3, servings=1,
+                 use_dietary_preferences=True, replace_existing=False):
+        selected = set(meal_types or MEAL_TYPE_SHARES)
+        self.meal_types = [meal_type for meal_type, _ in Meal.MEAL_TYPE_CHOICES if meal_type in selected]
+        self.targets = {
+            name: float(value)
+            for name, value in zip(NUTRIENTS, (calories, protein, carbohydrates, fat))
+            if value
+        }
+        self.max_minutes = {
+            meal_type: minutes
+            for meal_type, minutes in (max_minutes or {}).items()
+            if minutes and meal_type in selected
+        }
+        self.no_repeat_days = no_repeat_days or 0
+        self.servings = servings or 1
+        self.use_dietary_preferences = use_dietary_preferences
+        self.replace_existing = replace_existing
+
+    @classmethod
+    def from_data(cls, data):
+        """Build constraints from validated form or serializer data"""
+        return cls(
+            meal_types=data.get('meal_types'),
+            calories=data.get('calorie_target'),
+            protein=data.get('protein_target'),
+            carbohydrates=data.get('carbohydrates_target'),
+            fat=data.get('fat_target'),
+            max_minutes={
+                meal_type: data.get(f'max_{meal_type}_minutes')
+                for meal_type in MEAL_TYPE_SHARES
+            },
+            no_repeat_days=data.get('no_repeat_days'),
+            servings=data.get('servings'),
+            use_dietary_preferences=data.get('use_dietary_preferences', True),
+            replace_existing=data.get('replace_existing', False),
+        )
+
+    def slot_share(self, meal_type):
+        """Fraction of the daily targets a single slot of this type should cover"""
+        total = sum(MEAL_TYPE_SHARES[t] for t in self.meal_types)
+        return MEAL_TYPE_SHARES[meal_type] / total
+
+
+class RecipeFeatures:
+    """Column arrays of the timing and nutrition data of candidate recipes"""
+
+    def __init__(self, rows):
+        self.ids = array('q')
+        self.minutes = array('l')
+        self.nutrients = {name: array('d') for name in NUTRIENTS}
+        for recipe_id, minutes, *values in rows:
+            self.ids.append(recipe_id)
+            self.minutes.append(minutes)
+            for name, value in zip(NUTRIENTS, values):
+                self.nutrients[name].append(float(value or 0))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def candidate_recipes(user, constraints):
+    """Return feature rows of the recipes the user may be planned with"""
+    queryset = Recipe.active.filter(Q(is_public=True) | Q(author=user))
+
+    if constraints.use_dietary_preferences:
+        tag_ids = list(user.dietary_preferences.values_list('id', flat=True))
+        if tag_ids:
+            # Recipe must carry every one of the user's dietary tags
+            queryset = queryset.annotate(
+                matching_tags=Count('dietary_tags', filter=Q(dietary_tags__in=tag_ids), distinct=True)
+            ).filter(matching_tags=len(tag_ids))
+
+    for name in constraints.targets:
+        queryset = queryset.filter(**{f'{name}__isnull': False})
+
+    queryset = queryset.annotate(total_minutes=F('prep_time') + F('cook_time'))
+    if len(constraints.max_minutes) == len(constraints.meal_types):
+        # Every slot has a limit, so nothing above the loosest one can be used
+        queryset = queryset.filter(total_minutes__lte=max(constraints.max_minutes.values()))
+
+    return queryset.order_by().values_list('id', 'total_minutes', *NUTRIENTS)
+
+
+class MealPlanGenerator:
+    """Fill the open slots of a meal plan with recipes matching the constraints"""
+
+    # Candidates considered on each side of a slot's calorie target
+    window = 32
+    local_search_passes = 2
+
+    def __init__(self, meal_plan, user, constraints, seed=None):
+        self.meal_plan = meal_plan
+        self.user = user
+        self.constraints = constraints
+        self.random = random.Random(seed)
+        self.features = None
+        self.pools = {}
+
+    def generate(self):
+        """Choose and save recipes for every open slot; return the created meals"""
+        if not self.constraints.meal_types:
+            return []
+        self.features = RecipeFeatures(candidate_recipes(self.user, self.constraints))
+        self._build_pools()
+
+        days = min(PLAN_DAYS, (self.meal_plan.end_date - self.meal_plan.start_date).days + 1)
+        existing = self._existing_meals(days)
+        slots = [
+            (day, meal_type)
+            for day in range(days)
+            for meal_type in self.constraints.meal_types
+            if (day, meal_type) not in existing and self.pools[meal_type][0]
+        ]
+
+        # Recipe id -> days it is eaten on, for the no-repeat window
+        uses = {}
+        day_totals = [dict.fromkeys(NUTRIENTS, 0.0) for _ in range(days)]
+        for (day, _), (recipe_id, servings, values) in existing.items():
+            uses.setdefault(recipe_id, []).append(day)
+            for name, value in zip(NUTRIENTS, values):
+                day_totals[day][name] += float(value or 0) * servings
+
+        assignment = {}
+        for day, meal_type in slots:
+            index = self._choose(day, meal_type, uses)
+            self._assign(assignment, day_totals, uses, day, meal_type, index)
+
+        for _ in range(self.local_search_passes):
+            if not self._improve(assignment, day_totals, uses):
+                break
+
+        return self._save(assignment, days)
+
+    def _build_pools(self):
+        """Per meal type, candidate indices sorted by calories plus the sort keys"""
+        features = self.features
+        calories = features.nutrients['calories']
+        for meal_type in self.constraints.meal_types:
+            limit = self.constraints.max_minutes.get(meal_type)
+            indices = [
+                i for i in range(len(features))
+                if limit is None or features.minutes[i] <= limit
+            ]
+            indices.sort(key=calories.__getitem__)
+            self.pools[meal_type] = (indices, [calories[i] for i in indices])
+
+    def _existing_meals(self, days):
+        """Map (day, meal type) -> (recipe id, servings, nutrients) for slots kept as they are"""
+        if self.constraints.replace_existing:
+            meals = self.meal_plan.meals.exclude(meal_type__in=self.constraints.meal_types)
+        else:
+            meals = self.meal_plan.meals.all()
+        existing = {}
+        rows = meals.filter(day_of_week__lt=days).order_by('id').values_list(
+            'day_of_week', 'meal_type', 'recipe_id', 'servings',
+            *(f'recipe__{name}' for name in NUTRIENTS)
+        )
+        for day, meal_type, recipe_id, servings, *values in rows:
+            existing.setdefault((day, meal_type), (recipe_id, servings, values))
+        return existing
+
+    def _slot_targets(self, meal_type):
+        share = self.constraints.slot_share(meal_type)
+        return {name: target * share for name, target in self.constraints.targets.items()}
+
+    def _window(self, meal_type):
+        """Candidate indices around the calorie target of a slot"""
+        indices, keys = self.pools[meal_type]
+        target = self._slot_targets(meal_type).get('calories')
+        if target is None:
+            # Without a calorie target every candidate is equal, so sample for variety
+            size = min(len(indices), self.window * 2)
+            return self.random.sample(indices, size)
+        position = bisect.bisect_left(keys, target / self.constraints.servings)
+        return indices[max(0, position - self.window):position + self.window]
+
+    def _is_blocked(self, recipe_id, day, uses):
+        window = self.constraints.no_repeat_days
+        if not window:
+            return False
+        return any(abs(used_day - day) < window for used_day in uses.get(recipe_id, ()))
+
+    def _deviation(self, totals):
+        return sum(
+            ((totals[name] - target) / target) ** 2
+            for name, target in self.constraints.targets.items()
+        )
+
+    def _with_recipe(self, totals, index, sign=1):
+        servings = self.constraints.servings
+        return {
+            name: totals[name] + sign * self.features.nutrients[name][index] * servings
+            for name in NUTRIENTS
+        }
+
+    def _choose(self, day, meal_type, uses):
+        """Greedily pick the allowed candidate closest to the slot's share of the targets"""
+        ids = self.features.ids
+        candidates = self._window(meal_type)
+        allowed = [i for i in candidates if not self._is_blocked(ids[i], day, uses)]
+        if not allowed:
+            # Widen to the whole pool before giving up on the no-repeat window
+            allowed = [i for i in self.pools[meal_type][0] if not self._is_blocked(ids[i], day, uses)]
+        if not allowed:
+            allowed = candidates
+
+        slot_targets = self._slot_targets(meal_type)
+        return min(allowed, key=lambda index: self._slot_deviation(index, slot_targets))
+
+    def _slot_deviation(self, index, slot_targets):
+        servings = self.constraints.servings
+        return sum(
+            ((self.features.nutrients[name][index] * servings - target) / target) ** 2
+            for name, target in slot_targets.items()
+        )
+
+    def _assign(self, assignment, day_totals, uses, day, meal_type, index):
+        assignment[(day, meal_type)] = index
+        uses.setdefault(self.features.ids[index], []).append(day)
+        day_totals[day] = self._with_recipe(day_totals[day], index)
+
+    def _improve(self, assignment, day_totals, uses):
+        """One local-search pass of single-slot swaps; return whether anything changed"""
+        ids = self.features.ids
+        changed = False
+        for (day, meal_type), current in list(assignment.items()):
+            base = self._with_recipe(day_totals[day], current, sign=-1)
+            best, best_score = current, self._deviation(day_totals[day])
+            for index in self._window(meal_type):
+                if index == current or self._is_blocked(ids[index], day, uses):
+                    continue
+                score = self._deviation(self._with_recipe(base, index))
+                if score < best_score:
+                    best, best_score = index, score
+            if best != current:
+                uses[ids[current]].remove(day)
+                assignment[(day, meal_type)] = best
+                uses.setdefault(ids[best], []).append(day)
+                day_totals[day] = self._with_recipe(base, best)
+                changed = True
+        return changed
+
+    def _save(self, assignment, days):
+        start_date = self.meal_plan.start_date
+        meals = [
+            Meal(
+                meal_plan=self.meal_plan,
+                user_id=self.meal_plan.user_id,
+                recipe_id=self.features.ids[index],
+                meal_type=meal_type,
+                day_of_week=day,
+                date=start_date + timedelta(days=day),
+                servings=self.constraints.servings,
+            )
+            for (day, meal_type), index in sorted(assignment.items())
+        ]
+        with transaction.atomic():
+            if self.constraints.replace_existing:
+                self.meal_plan.meals.filter(
+                    day_of_week__lt=days,
+                    meal_type__in=self.constraints.meal_types,
+                ).delete()
+            return Meal.objects.bulk_create(meals)
+
+
+def generate_meal_plan(meal_plan, user, constraints, seed=None):
+    """Fill a meal plan with generated meals and return the created meals"""
+    return MealPlanGenerator(meal_plan, user, constraints, seed=seed).generate()
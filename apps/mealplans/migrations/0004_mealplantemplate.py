@@ -0,0 +1,54 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplans', '0003_initial'),
+        ('recipes', '0005_review_reply_delete_comment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealPlanTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan_templates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Meal Plan Template',
+                'verbose_name_plural': 'Meal Plan Templates',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TemplateMeal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('meal_type', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('snack', 'Snack')], max_length=20)),
+                ('day_of_week', models.IntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('servings', models.PositiveIntegerField(default=1)),
+                ('notes', models.TextField(blank=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='template_meals', to='recipes.recipe')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meals', to='mealplans.mealplantemplate')),
+            ],
+            options={
+                'verbose_name': 'Template Meal',
+                'verbose_name_plural': 'Template Meals',
+                'ordering': ['day_of_week', 'meal_type'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mealplantemplate',
+            index=models.Index(fields=['user', 'name'], name='mealplans_m_user_id_19009d_idx'),
+        ),
+    ]
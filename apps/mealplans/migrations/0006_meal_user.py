@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_meal_user(apps, schema_editor):
+    Meal = apps.get_model('mealplans', 'Meal')
+    MealPlan = apps.get_model('mealplans', 'MealPlan')
+    Meal.objects.filter(user__isnull=True).update(
+        user_id=models.Subquery(
+            MealPlan.objects.filter(pk=models.OuterRef('meal_plan_id')).values('user_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplans', '0005_meal_updated_at_calendarfeed'),
+        ('recipes', '0005_review_reply_delete_comment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='meals', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['user', 'date'], name='mealplans_m_user_id_6fa81a_idx'),
+        ),
+        migrations.RunPython(backfill_meal_user, migrations.RunPython.noop),
+    ]
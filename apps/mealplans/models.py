@@ -2,9 +2,24 @@
 Meal Plan Models for MealMate
 """
 from django.db import models
+from django.db.models import Count, F, Max, Min, Window
+from django.db.models.functions import RowNumber
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
+import secrets
+
+
+class MealPlanQuerySet(models.QuerySet):
+    """QuerySet helpers for meal plans"""
+    
+    def with_summary(self):
+        """Annotate meal counts and the span of planned dates instead of loading meals"""
+        return self.annotate(
+            meal_count=Count('meals'),
+            first_meal_date=Min('meals__date'),
+            last_meal_date=Max('meals__date'),
+        )
 
 
 class MealPlan(models.Model):
@@ -28,6 +43,8 @@ class MealPlan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = MealPlanQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-start_date']
         verbose_name = 'Meal Plan'
@@ -48,6 +65,8 @@ class MealPlan(models.Model):
     @property
     def total_recipes(self):
         """Return the total number of recipes in this meal plan"""
+        if hasattr(self, 'meal_count'):
+            return self.meal_count
         return self.meals.count()
     
     @property
@@ -82,6 +101,14 @@ class Meal(models.Model):
         on_delete=models.CASCADE,
         related_name='meals'
     )
+    # Denormalized from meal_plan.user so date-range queries across plans
+    # are a single (user, date) index range scan
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='meals',
+        editable=False
+    )
     recipe = models.ForeignKey(
         'recipes.Recipe',
         on_delete=models.CASCADE,
@@ -106,6 +133,7 @@ class Meal(models.Model):
     is_completed = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['date', 'meal_type']
@@ -113,14 +141,125 @@ class Meal(models.Model):
         verbose_name_plural = 'Meals'
         indexes = [
             models.Index(fields=['meal_plan', 'date']),
+            models.Index(fields=['user', 'date']),
         ]
     
     def __str__(self):
         return f"{self.get_meal_type_display()} - {self.recipe.title} ({self.date})"
     
+    def save(self, *args, **kwargs):
+        # Follow the plan's owner, including when the meal moves to another plan
+        self.user_id = self.meal_plan.user_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'meal_plan' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'user'}
+        super().save(*args, **kwargs)
+    
     @property
     def total_calories(self):
         """Calculate total calories for this meal based on servings"""
         if self.recipe.calories:
             return self.recipe.calories * self.servings
         return None
+
+
+def attach_recipe_previews(meal_plans, limit=3):
+    """Set ``recipe_preview`` on each plan to its first few recipe titles in one query"""
+    meal_plans = list(meal_plans)
+    previews = {meal_plan.pk: [] for meal_plan in meal_plans}
+    if previews:
+        rows = Meal.objects.filter(meal_plan_id__in=previews).annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F('meal_plan_id')],
+                order_by=[F('date').asc(), F('meal_type').asc(), F('id').asc()],
+            )
+        ).filter(position__lte=limit).order_by('meal_plan_id', 'position').values_list(
+            'meal_plan_id', 'recipe__title'
+        )
+        for meal_plan_id, title in rows:
+            previews[meal_plan_id].append(title)
+    for meal_plan in meal_plans:
+        meal_plan.recipe_preview = previews[meal_plan.pk]
+    return meal_plans
+
+
+class MealPlanTemplate(models.Model):
+    """Reusable week of meals that can be applied to new meal plans"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='meal_plan_templates'
+    )
+    name = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Meal Plan Template'
+        verbose_name_plural = 'Meal Plan Templates'
+        indexes = [
+            models.Index(fields=['user', 'name']),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+
+class TemplateMeal(models.Model):
+    """Meal slot within a meal plan template"""
+    template = models.ForeignKey(
+        MealPlanTemplate,
+        on_delete=models.CASCADE,
+        related_name='meals'
+    )
+    recipe = models.ForeignKey(
+        'recipes.Recipe',
+        on_delete=models.CASCADE,
+        related_name='template_meals'
+    )
+    
+    meal_type = models.CharField(max_length=20, choices=Meal.MEAL_TYPE_CHOICES)
+    day_of_week = models.IntegerField(choices=Meal.DAY_CHOICES)
+    servings = models.PositiveIntegerField(default=1)
+    notes = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['day_of_week', 'meal_type']
+        verbose_name = 'Template Meal'
+        verbose_name_plural = 'Template Meals'
+    
+    def __str__(self):
+        return f"{self.get_day_of_week_display()} {self.get_meal_type_display()} - {self.recipe.title}"
+
+
+class CalendarFeed(models.Model):
+    """Secret token for subscribing to a user's meal plans from a calendar app"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_feed'
+    )
+    token = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Calendar Feed'
+        verbose_name_plural = 'Calendar Feeds'
+    
+    def __str__(self):
+        return f"Calendar feed for {self.user}"
+    
+    def save(self, *args, **kwargs):
+        if not self.token:
+            self.token = secrets.token_urlsafe(32)
+        super().save(*args, **kwargs)
+    
+    def regenerate(self):
+        """Invalidate the current feed URL by issuing a new token"""
+        self.token = secrets.token_urlsafe(32)
+        self.save(update_fields=['token'])
@@ -3,8 +3,11 @@ REST API Serializers for Meal Plans App
 """
 from rest_framework import serializers
 from django.db import models
-from .models import MealPlan, Meal
+from datetime import timedelta
+from .models import MealPlan, Meal, MealPlanTemplate, TemplateMeal
+from .batch import OPERATIONS, MAX_OPERATIONS, plan_days
 from apps.recipes.serializers import RecipeListSerializer
+from apps.shopping.pricing import plan_cost
 
 
 class MealSerializer(serializers.ModelSerializer):
@@ -26,7 +29,7 @@ class MealSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         recipe_id = validated_data.pop('recipe', {}).get('id')
         from apps.recipes.models import Recipe
-        recipe = Recipe.objects.get(id=recipe_id)
+        recipe = Recipe.active.get(id=recipe_id)
         validated_data['recipe'] = recipe
         return super().create(validated_data)
 
@@ -34,13 +37,17 @@ class MealSerializer(serializers.ModelSerializer):
 class MealPlanListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for meal plan lists"""
     user_username = serializers.CharField(source='user.username', read_only=True)
+    first_meal_date = serializers.DateField(read_only=True, default=None)
+    last_meal_date = serializers.DateField(read_only=True, default=None)
+    recipe_preview = serializers.ListField(child=serializers.CharField(), read_only=True, default=list)
     
     class Meta:
         model = MealPlan
         fields = [
             'id', 'user', 'user_username', 'name', 'description',
             'start_date', 'end_date', 'is_active', 'is_current',
-            'total_recipes', 'created_at', 'updated_at'
+            'total_recipes', 'first_meal_date', 'last_meal_date', 'recipe_preview',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['user', 'created_at', 'updated_at']
 
@@ -49,15 +56,52 @@ class MealPlanDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for individual meal plan view"""
     user_username = serializers.CharField(source='user.username', read_only=True)
     meals = MealSerializer(many=True, read_only=True)
+    estimated_cost = serializers.SerializerMethodField()
     
     class Meta:
         model = MealPlan
         fields = [
             'id', 'user', 'user_username', 'name', 'description',
             'start_date', 'end_date', 'is_active', 'is_current',
-            'total_recipes', 'meals', 'created_at', 'updated_at'
+            'total_recipes', 'estimated_cost', 'meals', 'created_at', 'updated_at'
         ]
         read_only_fields = ['user', 'created_at', 'updated_at']
+    
+    def get_estimated_cost(self, obj):
+        return plan_cost(obj)
+
+
+class CompactMealSerializer(serializers.ModelSerializer):
+    """Meal that references its recipe by id only"""
+    
+    class Meta:
+        model = Meal
+        fields = [
+            'id', 'recipe_id', 'meal_type', 'day_of_week', 'date',
+            'servings', 'notes', 'is_completed'
+        ]
+
+
+class MealPlanCompactSerializer(serializers.ModelSerializer):
+    """Meal plan whose meals reference recipes sideloaded once in a ``recipes`` map"""
+    user_username = serializers.CharField(source='user.username', read_only=True)
+    meals = CompactMealSerializer(many=True, read_only=True)
+    recipes = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = MealPlan
+        fields = [
+            'id', 'user', 'user_username', 'name', 'description',
+            'start_date', 'end_date', 'is_active', 'is_current',
+            'total_recipes', 'meals', 'recipes', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+    
+    def get_recipes(self, obj):
+        # The view prefetches meals__recipe, so each recipe is one instance shared by its meals
+        recipes = {meal.recipe_id: meal.recipe for meal in obj.meals.all()}
+        serialized = RecipeListSerializer(list(recipes.values()), many=True, context=self.context).data
+        return {str(recipe['id']): recipe for recipe in serialized}
 
 
 class MealPlanCreateUpdateSerializer(serializers.ModelSerializer):
@@ -66,3 +110,111 @@ class MealPlanCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = MealPlan
         fields = ['name', 'description', 'start_date', 'end_date', 'is_active']
+
+
+class MealPlanGenerateSerializer(serializers.Serializer):
+    """Serializer for automatic meal plan generation options"""
+    meal_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=Meal.MEAL_TYPE_CHOICES),
+        required=False,
+        allow_empty=False
+    )
+    calorie_target = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    protein_target = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, allow_null=True, min_value=1)
+    carbohydrates_target = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, allow_null=True, min_value=1)
+    fat_target = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, allow_null=True, min_value=1)
+    max_breakfast_minutes = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    max_lunch_minutes = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    max_dinner_minutes = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    max_snack_minutes = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    no_repeat_days = serializers.IntegerField(default=3, min_value=0, max_value=7)
+    servings = serializers.IntegerField(default=1, min_value=1)
+    use_dietary_preferences = serializers.BooleanField(default=True)
+    replace_existing = serializers.BooleanField(default=False)
+    seed = serializers.IntegerField(required=False, allow_null=True)
+
+
+class MealOperationSerializer(serializers.Serializer):
+    """A single create, move, swap or delete operation in a meal batch"""
+    REQUIRED_FIELDS = {
+        'create': ('recipe_id', 'day_of_week', 'meal_type'),
+        'move': ('meal_id', 'day_of_week'),
+        'swap': ('meal_id', 'other_meal_id'),
+        'delete': ('meal_id',),
+    }
+    
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    meal_id = serializers.IntegerField(required=False)
+    other_meal_id = serializers.IntegerField(required=False)
+    recipe_id = serializers.IntegerField(required=False)
+    day_of_week = serializers.IntegerField(required=False, min_value=0, max_value=6)
+    meal_type = serializers.ChoiceField(choices=Meal.MEAL_TYPE_CHOICES, required=False)
+    servings = serializers.IntegerField(required=False, min_value=1)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate(self, data):
+        missing = [field for field in self.REQUIRED_FIELDS[data['op']] if field not in data]
+        if missing:
+            raise serializers.ValidationError(f"{data['op']} requires {', '.join(missing)}.")
+        meal_plan = self.context.get('meal_plan')
+        if meal_plan is not None and data.get('day_of_week', 0) >= plan_days(meal_plan):
+            raise serializers.ValidationError('day_of_week is outside the meal plan.')
+        return data
+
+
+class MealBatchSerializer(serializers.Serializer):
+    """Serializer for a batch of meal operations applied to one plan"""
+    operations = MealOperationSerializer(many=True, allow_empty=False, max_length=MAX_OPERATIONS)
+
+
+class MealPlanCloneSerializer(serializers.Serializer):
+    """Serializer for copying a meal plan to a new start date"""
+    start_date = serializers.DateField()
+    name = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+
+class TemplateMealSerializer(serializers.ModelSerializer):
+    """Serializer for TemplateMeal model"""
+    recipe_title = serializers.CharField(source='recipe.title', read_only=True)
+    meal_type_display = serializers.CharField(source='get_meal_type_display', read_only=True)
+    day_display = serializers.CharField(source='get_day_of_week_display', read_only=True)
+    
+    class Meta:
+        model = TemplateMeal
+        fields = [
+            'id', 'recipe', 'recipe_title', 'meal_type', 'meal_type_display',
+            'day_of_week', 'day_display', 'servings', 'notes'
+        ]
+
+
+class MealPlanTemplateSerializer(serializers.ModelSerializer):
+    """Serializer for MealPlanTemplate model"""
+    meals = TemplateMealSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = MealPlanTemplate
+        fields = ['id', 'name', 'description', 'meals', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+
+class MealPlanTemplateApplySerializer(serializers.Serializer):
+    """Serializer for creating weekly meal plans from a template"""
+    start_date = serializers.DateField()
+    weeks = serializers.IntegerField(default=1, min_value=1, max_value=52)
+    name = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+
+class MealDateRangeSerializer(serializers.Serializer):
+    """Validates the date range of a meal query across plans"""
+    MAX_DAYS = 366
+    
+    start = serializers.DateField()
+    end = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        data.setdefault('end', data['start'] + timedelta(days=6))
+        if data['end'] < data['start']:
+            raise serializers.ValidationError('end must not be before start.')
+        if (data['end'] - data['start']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {self.MAX_DAYS} days.')
+        return data
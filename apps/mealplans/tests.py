@@ -0,0 +1,319 @@
+"""
+Tests for the mealplans app
+Run with: python manage.py test apps.mealplans.tests
+"""
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.recipes.models import Recipe
+from .models import CalendarFeed, Meal, MealPlan, MealPlanTemplate, TemplateMeal
+
+
+class MealOwnerTests(TestCase):
+    """Meal.user mirrors the owner of the meal's plan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'secret-pass-1')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'secret-pass-1')
+        cls.recipe = Recipe.objects.create(
+            author=cls.alice, title='Omelette', description='Eggs', prep_time=5, cook_time=5, servings=1,
+        )
+        cls.alice_plan = MealPlan.objects.create(user=cls.alice, name='Alice week', start_date=date(2026, 1, 5))
+        cls.bob_plan = MealPlan.objects.create(user=cls.bob, name='Bob week', start_date=date(2026, 1, 5))
+
+    def test_moving_a_meal_changes_its_user(self):
+        meal = Meal.objects.create(
+            meal_plan=self.alice_plan, recipe=self.recipe, meal_type='breakfast', day_of_week=0,
+            date=date(2026, 1, 5),
+        )
+        self.assertEqual(meal.user_id, self.alice.pk)
+
+        meal.meal_plan = self.bob_plan
+        meal.save()
+        self.assertEqual(Meal.objects.get(pk=meal.pk).user_id, self.bob.pk)
+
+        meal.meal_plan = self.alice_plan
+        meal.save(update_fields=['meal_plan'])
+        self.assertEqual(Meal.objects.get(pk=meal.pk).user_id, self.alice.pk)
+        self.assertEqual(list(Meal.objects.filter(user=self.bob)), [])
+
+
+class ApplyTemplateTests(TestCase):
+    """POST /api/meal-plans/templates/<id>/apply/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('carol', 'carol@example.com', 'secret-pass-1')
+        recipe = Recipe.objects.create(
+            author=cls.user, title='Porridge', description='Oats', prep_time=2, cook_time=5, servings=1,
+        )
+        cls.template = MealPlanTemplate.objects.create(user=cls.user, name='Routine')
+        TemplateMeal.objects.bulk_create([
+            TemplateMeal(template=cls.template, recipe=recipe, meal_type='breakfast', day_of_week=day)
+            for day in range(5)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def apply(self, weeks):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/meal-plans/templates/{self.template.pk}/apply/',
+                {'start_date': '2026-03-02', 'weeks': weeks},
+            )
+        self.assertEqual(response.status_code, 201)
+        return response.json(), len(queries)
+
+    def test_response_is_annotated_without_a_query_per_plan(self):
+        one, one_queries = self.apply(1)
+        many, many_queries = self.apply(6)
+        self.assertEqual(many_queries, one_queries)
+
+        self.assertEqual([plan['total_recipes'] for plan in many], [5] * 6)
+        self.assertEqual(many[0]['first_meal_date'], '2026-03-02')
+        self.assertEqual(many[5]['last_meal_date'], '2026-04-10')
+        self.assertEqual(one[0]['recipe_preview'], ['Porridge'] * 3)
+
+
+class CompactPlanTests(TestCase):
+    """GET /api/meal-plans/meal-plans/<id>/?compact=1"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('pat', 'pat@example.com', 'secret-pass-1')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, title=f'Dish {number}', description='Dish', prep_time=5, cook_time=5, servings=1,
+            )
+            for number in range(4)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def plan_with(self, recipes):
+        plan = MealPlan.objects.create(user=self.user, name='Week', start_date=date(2026, 3, 2))
+        for day, recipe in enumerate(recipes + recipes):
+            Meal.objects.create(
+                meal_plan=plan, recipe=recipe, meal_type='dinner', day_of_week=day % 7, date=date(2026, 3, 2 + day),
+            )
+        return plan
+
+    def fetch(self, plan):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/meal-plans/meal-plans/{plan.pk}/', {'compact': '1'})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_recipes_are_sideloaded_once_in_constant_queries(self):
+        one, one_queries = self.fetch(self.plan_with(self.recipes[:1]))
+        many, many_queries = self.fetch(self.plan_with(self.recipes))
+        self.assertEqual(many_queries, one_queries)
+
+        self.assertEqual(len(many['meals']), 8)
+        self.assertEqual(sorted(many['recipes']), sorted(str(recipe.pk) for recipe in self.recipes))
+        self.assertEqual(one['recipes'][str(self.recipes[0].pk)]['title'], 'Dish 0')
+
+
+class GenerateMealPlanTests(TestCase):
+    """POST /api/meal-plans/meal-plans/<id>/generate/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('quentin', 'quentin@example.com', 'secret-pass-1')
+        other = User.objects.create_user('rhoda', 'rhoda@example.com', 'secret-pass-1')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, title=f'Dish {number}', description='Dish', prep_time=minutes, cook_time=5,
+                servings=1, calories=calories, is_public=True,
+            )
+            for number, (minutes, calories) in enumerate(
+                [(5, 300), (5, 450), (10, 550), (40, 600), (40, 700), (50, 800), (60, 900)]
+            )
+        ]
+        cls.private = Recipe.objects.create(
+            author=other, title='Private', description='Dish', prep_time=1, cook_time=1, servings=1, calories=500,
+            is_public=False,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def generate(self, **data):
+        plan = MealPlan.objects.create(user=self.user, name='Week', start_date=date(2026, 3, 2))
+        Meal.objects.create(
+            meal_plan=plan, recipe=self.recipes[6], meal_type='dinner', day_of_week=0, date=date(2026, 3, 2),
+        )
+        response = self.client.post(
+            f'/api/meal-plans/meal-plans/{plan.pk}/generate/',
+            {'meal_types': ['breakfast', 'dinner'], 'seed': 7, **data}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['generated_meals'], 13)
+        return list(plan.meals.order_by('day_of_week', 'meal_type').values_list(
+            'day_of_week', 'meal_type', 'recipe_id', 'recipe__prep_time'
+        ))
+
+    def test_fills_open_slots_within_the_constraints(self):
+        meals = self.generate(calorie_target=2000, max_breakfast_minutes=15, no_repeat_days=2)
+        self.assertEqual(len(meals), 14)
+        self.assertIn((0, 'dinner', self.recipes[6].pk, 60), meals)
+        self.assertNotIn(self.private.pk, {recipe_id for _, _, recipe_id, _ in meals})
+        self.assertTrue(all(minutes + 5 <= 15 for _, meal_type, _, minutes in meals if meal_type == 'breakfast'))
+
+        days = {}
+        for day, _, recipe_id, _ in meals:
+            days.setdefault(recipe_id, []).append(day)
+        for used in days.values():
+            self.assertTrue(all(later - earlier >= 2 for earlier, later in zip(sorted(used), sorted(used)[1:])))
+
+    def test_same_seed_gives_the_same_plan(self):
+        self.assertEqual(self.generate(no_repeat_days=1), self.generate(no_repeat_days=1))
+
+
+class MealPlanExportTests(TestCase):
+    """Streaming iCalendar/JSON exports and the calendar feed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('sybil', 'sybil@example.com', 'secret-pass-1')
+        recipe = Recipe.objects.create(
+            author=cls.user, title='Soup, hot', description='Soup', prep_time=5, cook_time=5, servings=1,
+        )
+        cls.plan = MealPlan.objects.create(user=cls.user, name='Week', start_date=date(2026, 3, 2))
+        other_plan = MealPlan.objects.create(user=cls.user, name='Next week', start_date=date(2026, 3, 9))
+        for plan, days in ((cls.plan, range(3)), (other_plan, range(2))):
+            for day in days:
+                Meal.objects.create(
+                    meal_plan=plan, recipe=recipe, meal_type='lunch', day_of_week=day,
+                    date=plan.start_date + timedelta(days=day),
+                )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_json_export_rows_and_headers(self):
+        response = self.client.get(f'/meal-plans/{self.plan.pk}/export.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="meal-plan-{self.plan.pk}.json"')
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        data = json.loads(self.body(response))
+        self.assertEqual(data['meal_plan']['name'], 'Week')
+        self.assertEqual([meal['date'] for meal in data['meals']], ['2026-03-02', '2026-03-03', '2026-03-04'])
+
+    def test_ical_export_has_one_event_per_meal(self):
+        response = self.client.get(f'/meal-plans/{self.plan.pk}/export.ics')
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = self.body(response)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:Lunch: Soup\\, hot\r\n', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_unchanged_export_is_not_modified(self):
+        url = f'/meal-plans/{self.plan.pk}/export.json'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Meal.objects.filter(meal_plan=self.plan).first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(self.body(response))['meals']), 2)
+
+    def test_calendar_feed_uses_its_token(self):
+        feed = CalendarFeed.objects.create(user=self.user)
+        self.client.logout()
+        response = self.client.get(f'/meal-plans/calendar/{feed.token}.ics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response).count('BEGIN:VEVENT'), 5)
+        self.assertEqual(self.client.get('/meal-plans/calendar/not-a-token.ics').status_code, 404)
+
+
+class BatchMealTests(TestCase):
+    """POST /api/meal-plans/meal-plans/<id>/batch/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('otto', 'otto@example.com', 'secret-pass-1')
+        other = User.objects.create_user('vera', 'vera@example.com', 'secret-pass-1')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, title='Risotto', description='Rice', prep_time=5, cook_time=20, servings=2,
+        )
+        cls.hidden = Recipe.objects.create(
+            author=other, title='Secret stew', description='Stew', prep_time=5, cook_time=60, servings=2,
+            is_public=False,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.plan = MealPlan.objects.create(user=self.user, name='Week', start_date=date(2026, 3, 2))
+        self.monday, self.tuesday = (
+            Meal.objects.create(
+                meal_plan=self.plan, recipe=self.recipe, meal_type=meal_type, day_of_week=day,
+                date=date(2026, 3, 2 + day),
+            )
+            for day, meal_type in ((0, 'lunch'), (1, 'dinner'))
+        )
+
+    def batch(self, operations):
+        return self.client.post(
+            f'/api/meal-plans/meal-plans/{self.plan.pk}/batch/', {'operations': operations},
+            content_type='application/json',
+        )
+
+    def slots(self):
+        return set(self.plan.meals.values_list('pk', 'day_of_week', 'meal_type', 'date'))
+
+    def test_operations_are_applied_together(self):
+        response = self.batch([
+            {'op': 'create', 'recipe_id': self.recipe.pk, 'day_of_week': 4, 'meal_type': 'breakfast', 'servings': 3},
+            {'op': 'swap', 'meal_id': self.monday.pk, 'other_meal_id': self.tuesday.pk},
+            {'op': 'move', 'meal_id': self.monday.pk, 'day_of_week': 2},
+            {'op': 'delete', 'meal_id': self.tuesday.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['batch'], {'created': 1, 'updated': 1, 'deleted': 1})
+
+        created = self.plan.meals.get(meal_type='breakfast')
+        self.assertEqual((created.date, created.servings, created.user_id), (date(2026, 3, 6), 3, self.user.pk))
+        self.assertEqual(
+            self.slots(),
+            {(self.monday.pk, 2, 'dinner', date(2026, 3, 4)), (created.pk, 4, 'breakfast', date(2026, 3, 6))},
+        )
+
+    def test_a_failing_operation_rolls_back_the_batch(self):
+        before = self.slots()
+        for operation in (
+            {'op': 'delete', 'meal_id': self.monday.pk + 1000},
+            {'op': 'create', 'recipe_id': self.hidden.pk, 'day_of_week': 3, 'meal_type': 'lunch'},
+            {'op': 'move', 'meal_id': self.monday.pk},
+            {'op': 'move', 'meal_id': self.monday.pk, 'day_of_week': 7},
+        ):
+            response = self.batch([{'op': 'move', 'meal_id': self.tuesday.pk, 'day_of_week': 5}, operation])
+            self.assertEqual(response.status_code, 400, operation)
+            self.assertEqual(self.slots(), before)
+
+    def test_meals_deleted_earlier_in_the_batch_cannot_be_used(self):
+        response = self.batch([
+            {'op': 'delete', 'meal_id': self.monday.pk},
+            {'op': 'swap', 'meal_id': self.tuesday.pk, 'other_meal_id': self.monday.pk},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('deleted earlier', response.json()['detail'])
+        self.assertEqual(self.plan.meals.count(), 2)
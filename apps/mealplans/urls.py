@@ -13,6 +13,20 @@ urlpatterns = [
     path('<int:pk>/', views.MealPlanDetailView.as_view(), name='mealplan_detail'),
     path('<int:pk>/edit/', views.MealPlanUpdateView.as_view(), name='mealplan_update'),
     path('<int:pk>/delete/', views.MealPlanDeleteView.as_view(), name='mealplan_delete'),
+    path('<int:pk>/generate/', views.MealPlanGenerateView.as_view(), name='mealplan_generate'),
+    path('<int:pk>/clone/', views.MealPlanCloneView.as_view(), name='mealplan_clone'),
+    path('<int:pk>/save-template/', views.MealPlanSaveTemplateView.as_view(), name='mealplan_save_template'),
+    
+    # Exports
+    path('<int:pk>/export.ics', views.export_meal_plan, {'fmt': 'ics'}, name='mealplan_export_ics'),
+    path('<int:pk>/export.json', views.export_meal_plan, {'fmt': 'json'}, name='mealplan_export_json'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('calendar/regenerate/', views.regenerate_calendar_feed, name='calendar_feed_regenerate'),
+    
+    # Templates
+    path('templates/', views.MealPlanTemplateListView.as_view(), name='template_list'),
+    path('templates/<int:pk>/apply/', views.MealPlanTemplateApplyView.as_view(), name='template_apply'),
+    path('templates/<int:pk>/delete/', views.delete_meal_plan_template, name='template_delete'),
     
     # Meal CRUD
     path('<int:meal_plan_id>/add-meal/', views.MealCreateView.as_view(), name='meal_create'),
@@ -3,13 +3,24 @@ Views for Meal Plans App
 """
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.contrib.auth.decorators import login_required
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from datetime import datetime, timedelta
+from django.db.models import Count
+from django.http import Http404, StreamingHttpResponse
+from django.views.decorators.http import condition, require_POST
+from datetime import date, datetime, timedelta
 
-from .models import MealPlan, Meal
-from .forms import MealPlanForm, MealForm
+from .models import MealPlan, Meal, MealPlanTemplate, CalendarFeed, attach_recipe_previews
+from .forms import (
+    MealPlanForm, MealForm, MealPlanGenerateForm,
+    MealPlanCloneForm, MealPlanTemplateForm, MealPlanTemplateApplyForm
+)
+from .generator import PlanConstraints, generate_meal_plan
+from .cloning import clone_meal_plan, save_as_template, apply_template
+from .exports import export_version, iter_ical, iter_json, user_meals
+from apps.shopping.regeneration import refresh_plan_lists
 
 
 class MealPlanListView(LoginRequiredMixin, ListView):
@@ -20,7 +31,21 @@ class MealPlanListView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return MealPlan.objects.filter(user=self.request.user).prefetch_related('meals__recipe')
+        return MealPlan.objects.filter(user=self.request.user).with_summary().order_by('-start_date')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Only the cards on this page need recipe titles
+        page = context['page_obj']
+        page.object_list = attach_recipe_previews(page.object_list)
+        context['meal_plans'] = page.object_list
+        
+        feed = CalendarFeed.objects.filter(user=self.request.user).first()
+        if feed:
+            context['calendar_feed_url'] = self.request.build_absolute_uri(
+                reverse_lazy('mealplans:calendar_feed', kwargs={'token': feed.token})
+            )
+        return context
 
 
 class MealPlanDetailView(LoginRequiredMixin, DetailView):
@@ -101,23 +126,184 @@ class MealPlanDeleteView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
+class MealPlanGenerateView(LoginRequiredMixin, FormView):
+    """Automatically fill a meal plan with recipes"""
+    form_class = MealPlanGenerateForm
+    template_name = 'mealplans/mealplan_generate.html'
+    
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.meal_plan = get_object_or_404(MealPlan, pk=self.kwargs.get('pk'), user=request.user)
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['meal_plan'] = self.meal_plan
+        return context
+    
+    def form_valid(self, form):
+        constraints = PlanConstraints.from_data(form.cleaned_data)
+        meals = generate_meal_plan(self.meal_plan, self.request.user, constraints)
+        # Replaced meals are gone, so the whole plan is summed again
+        refresh_plan_lists(
+            self.meal_plan.pk, None if constraints.replace_existing else {meal.recipe_id for meal in meals}
+        )
+        if meals:
+            messages.success(self.request, f'Generated {len(meals)} meal{"s" if len(meals) != 1 else ""}!')
+        else:
+            messages.warning(self.request, 'No matching recipes found for the open slots.')
+        return super().form_valid(form)
+    
+    def get_success_url(self):
+        return reverse_lazy('mealplans:mealplan_detail', kwargs={'pk': self.meal_plan.pk})
+
+
+class MealPlanCloneView(LoginRequiredMixin, FormView):
+    """Copy a meal plan and its meals to a new start date"""
+    form_class = MealPlanCloneForm
+    template_name = 'mealplans/mealplan_action_form.html'
+    
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.meal_plan = get_object_or_404(MealPlan, pk=self.kwargs.get('pk'), user=request.user)
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get_initial(self):
+        return {
+            'name': f"{self.meal_plan.name} (Copy)",
+            'start_date': self.meal_plan.end_date + timedelta(days=1),
+        }
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'meal_plan': self.meal_plan,
+            'title': 'Copy Meal Plan',
+            'icon': 'copy',
+            'subtitle': 'All meals will be copied and re-dated from the new start date',
+            'submit_label': 'Copy Meal Plan',
+        })
+        return context
+    
+    def form_valid(self, form):
+        self.clone = clone_meal_plan(
+            self.meal_plan,
+            form.cleaned_data['start_date'],
+            name=form.cleaned_data['name']
+        )
+        messages.success(self.request, 'Meal plan copied successfully!')
+        return super().form_valid(form)
+    
+    def get_success_url(self):
+        return reverse_lazy('mealplans:mealplan_detail', kwargs={'pk': self.clone.pk})
+
+
+class MealPlanSaveTemplateView(MealPlanCloneView):
+    """Save a meal plan as a reusable template"""
+    form_class = MealPlanTemplateForm
+    
+    def get_initial(self):
+        return {
+            'name': self.meal_plan.name,
+            'description': self.meal_plan.description,
+        }
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'title': 'Save as Template',
+            'icon': 'bookmark',
+            'subtitle': 'Reuse this week of meals for future meal plans',
+            'submit_label': 'Save Template',
+        })
+        return context
+    
+    def form_valid(self, form):
+        save_as_template(
+            self.meal_plan,
+            name=form.cleaned_data['name'],
+            description=form.cleaned_data['description']
+        )
+        messages.success(self.request, 'Template saved successfully!')
+        return redirect('mealplans:template_list')
+
+
+class MealPlanTemplateListView(LoginRequiredMixin, ListView):
+    """List user's meal plan templates"""
+    model = MealPlanTemplate
+    template_name = 'mealplans/mealplantemplate_list.html'
+    context_object_name = 'templates'
+    paginate_by = 10
+    
+    def get_queryset(self):
+        return MealPlanTemplate.objects.filter(user=self.request.user).annotate(
+            meal_count=Count('meals')
+        ).order_by('name')
+
+
+class MealPlanTemplateApplyView(LoginRequiredMixin, FormView):
+    """Create one or more weekly meal plans from a template"""
+    form_class = MealPlanTemplateApplyForm
+    template_name = 'mealplans/mealplan_action_form.html'
+    
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.template = get_object_or_404(MealPlanTemplate, pk=self.kwargs.get('pk'), user=request.user)
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get_initial(self):
+        return {'start_date': date.today()}
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'title': f'Use Template: {self.template.name}',
+            'icon': 'redo',
+            'subtitle': 'Create a meal plan for each week, starting from the chosen date',
+            'submit_label': 'Create Meal Plans',
+        })
+        return context
+    
+    def form_valid(self, form):
+        plans = apply_template(
+            self.template,
+            form.cleaned_data['start_date'],
+            weeks=form.cleaned_data['weeks'],
+            name=form.cleaned_data['name']
+        )
+        messages.success(self.request, f'Created {len(plans)} meal plan{"s" if len(plans) != 1 else ""} from template!')
+        if len(plans) == 1:
+            return redirect('mealplans:mealplan_detail', pk=plans[0].pk)
+        return redirect('mealplans:mealplan_list')
+
+
+@login_required
+def delete_meal_plan_template(request, pk):
+    """Delete a meal plan template"""
+    template = get_object_or_404(MealPlanTemplate, pk=pk, user=request.user)
+    
+    if request.method == 'POST':
+        template.delete()
+        messages.success(request, f'Template "{template.name}" deleted successfully!')
+    
+    return redirect('mealplans:template_list')
+
+
 class MealCreateView(LoginRequiredMixin, CreateView):
     """Add a meal to a meal plan"""
     model = Meal
     form_class = MealForm
     template_name = 'mealplans/meal_form.html'
     
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.meal_plan = get_object_or_404(MealPlan, pk=self.kwargs.get('meal_plan_id'), user=request.user)
+        return super().dispatch(request, *args, **kwargs)
+    
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['user'] = self.request.user
-        
-        # Get meal_plan and pass it to the form
-        meal_plan = get_object_or_404(
-            MealPlan,
-            pk=self.kwargs.get('meal_plan_id'),
-            user=self.request.user
-        )
-        kwargs['meal_plan'] = meal_plan
+        kwargs['meal_plan'] = self.meal_plan
         
         # Set initial values from query params if provided
         initial = kwargs.get('initial', {})
@@ -131,23 +317,15 @@ class MealCreateView(LoginRequiredMixin, CreateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        meal_plan = get_object_or_404(
-            MealPlan,
-            pk=self.kwargs.get('meal_plan_id'),
-            user=self.request.user
-        )
-        context['meal_plan'] = meal_plan
+        context['meal_plan'] = self.meal_plan
         return context
     
     def form_valid(self, form):
-        meal_plan = get_object_or_404(
-            MealPlan,
-            pk=self.kwargs.get('meal_plan_id'),
-            user=self.request.user
-        )
-        form.instance.meal_plan = meal_plan
+        form.instance.meal_plan = self.meal_plan
+        response = super().form_valid(form)
+        refresh_plan_lists(self.meal_plan.pk, [self.object.recipe_id])
         messages.success(self.request, 'Meal added successfully!')
-        return super().form_valid(form)
+        return response
     
     def get_success_url(self):
         return reverse_lazy('mealplans:mealplan_detail', kwargs={'pk': self.kwargs.get('meal_plan_id')})
@@ -160,19 +338,23 @@ class MealUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'mealplans/meal_form.html'
     
     def get_queryset(self):
-        return Meal.objects.filter(meal_plan__user=self.request.user)
+        return Meal.objects.filter(user=self.request.user).select_related('meal_plan')
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['user'] = self.request.user
+        kwargs['meal_plan'] = self.object.meal_plan
         return kwargs
     
     def get_success_url(self):
         return reverse_lazy('mealplans:mealplan_detail', kwargs={'pk': self.object.meal_plan.pk})
     
     def form_valid(self, form):
+        response = super().form_valid(form)
+        if {'recipe', 'servings'} & set(form.changed_data):
+            refresh_plan_lists(self.object.meal_plan_id, {form.initial['recipe'], self.object.recipe_id})
         messages.success(self.request, 'Meal updated successfully!')
-        return super().form_valid(form)
+        return response
 
 
 class MealDeleteView(LoginRequiredMixin, DeleteView):
@@ -189,3 +371,73 @@ class MealDeleteView(LoginRequiredMixin, DeleteView):
     def delete(self, request, *args, **kwargs):
         messages.success(request, 'Meal removed successfully!')
         return super().delete(request, *args, **kwargs)
+    
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        refresh_plan_lists(self.object.meal_plan_id, [self.object.recipe_id])
+        return response
+
+
+def _export_meals(request, **kwargs):
+    """Resolve the meals an export covers once per request, with their version"""
+    if not hasattr(request, '_meal_export'):
+        if 'token' in kwargs:
+            feed = CalendarFeed.objects.select_related('user').filter(token=kwargs['token']).first()
+            if feed is None:
+                raise Http404('Unknown calendar feed')
+            meal_plan, meals = None, user_meals(feed.user)
+        else:
+            meal_plan = get_object_or_404(MealPlan, pk=kwargs['pk'], user=request.user)
+            meals = meal_plan.meals.all()
+        request._meal_export = (meal_plan, meals, export_version(meals))
+    return request._meal_export
+
+
+def _export_etag(request, **kwargs):
+    return _export_meals(request, **kwargs)[2][0]
+
+
+def _export_last_modified(request, **kwargs):
+    return _export_meals(request, **kwargs)[2][1]
+
+
+def _export_response(request, meal_plan, meals, fmt, calendar_name):
+    if fmt == 'json':
+        return StreamingHttpResponse(iter_json(meals, meal_plan), content_type='application/json')
+    recipe_url_prefix = request.build_absolute_uri('/').rstrip('/')
+    return StreamingHttpResponse(
+        iter_ical(meals, calendar_name, recipe_url_prefix),
+        content_type='text/calendar; charset=utf-8'
+    )
+
+
+@login_required
+@condition(etag_func=_export_etag, last_modified_func=_export_last_modified)
+def export_meal_plan(request, pk, fmt):
+    """Download a meal plan as an iCalendar or JSON file"""
+    meal_plan, meals, _ = _export_meals(request, pk=pk)
+    response = _export_response(request, meal_plan, meals, fmt, meal_plan.name)
+    response['Content-Disposition'] = f'attachment; filename="meal-plan-{meal_plan.pk}.{fmt}"'
+    return response
+
+
+@condition(etag_func=_export_etag, last_modified_func=_export_last_modified)
+def calendar_feed(request, token):
+    """Token-authenticated iCalendar feed of all of a user's meals"""
+    _, meals, _ = _export_meals(request, token=token)
+    response = _export_response(request, None, meals, 'ics', 'MealMate Meal Plans')
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+@login_required
+@require_POST
+def regenerate_calendar_feed(request):
+    """Create the user's calendar feed, or replace its URL with a new one"""
+    feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+    if created:
+        messages.success(request, 'Calendar feed created! Add the URL to your calendar app.')
+    else:
+        feed.regenerate()
+        messages.success(request, 'Calendar feed URL changed. The old URL no longer works.')
+    return redirect('mealplans:mealplan_list')
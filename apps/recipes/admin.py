@@ -3,6 +3,7 @@ Admin Configuration for Recipes App
 """
 from django.contrib import admin
 from .models import Category, DietaryTag, Recipe, Ingredient, Instruction, Review
+from apps.shopping.pricing import update_recipe_costs
 
 
 @admin.register(Category)
@@ -42,10 +43,14 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ['category', 'difficulty', 'is_public', 'created_at', 'dietary_tags']
     search_fields = ['title', 'description', 'author__username']
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ['slug', 'views', 'created_at', 'updated_at']
+    readonly_fields = ['slug', 'views', 'cost_per_serving', 'created_at', 'updated_at']
     filter_horizontal = ['dietary_tags']
     inlines = [IngredientInline, InstructionInline]
     
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_recipe_costs([form.instance.pk])
+    
     fieldsets = (
         ('Basic Information', {
             'fields': ('title', 'slug', 'description', 'author', 'image')
@@ -54,7 +59,7 @@ class RecipeAdmin(admin.ModelAdmin):
             'fields': ('category', 'dietary_tags')
         }),
         ('Cooking Details', {
-            'fields': ('prep_time', 'cook_time', 'servings', 'difficulty')
+            'fields': ('prep_time', 'cook_time', 'servings', 'difficulty', 'cost_per_serving')
         }),
         ('Nutrition', {
             'fields': ('calories', 'protein', 'carbohydrates', 'fat', 'fiber'),
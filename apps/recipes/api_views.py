@@ -1,12 +1,15 @@
 """
 REST API Views for Recipes App
 """
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 
+from apps.users.deletion import delete_recipe_later
 from .models import Category, DietaryTag, Recipe, Review
 from .serializers import (
     CategorySerializer, DietaryTagSerializer,
@@ -35,11 +38,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'dietary_tags', 'difficulty']
     search_fields = ['title', 'description', 'ingredients__name']
-    ordering_fields = ['created_at', 'title', 'prep_time', 'calories']
+    ordering_fields = ['created_at', 'title', 'prep_time', 'calories', 'cost_per_serving']
     lookup_field = 'slug'
     
     def get_queryset(self):
-        queryset = Recipe.objects.select_related('author', 'category').prefetch_related('dietary_tags')
+        queryset = Recipe.active.select_related('author', 'category').prefetch_related('dietary_tags')
         
         if self.request.user.is_authenticated:
             # Show public recipes and user's own recipes
@@ -48,6 +51,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         else:
             queryset = queryset.filter(is_public=True)
         
+        max_cost = self.request.query_params.get('max_cost_per_serving')
+        if max_cost:
+            try:
+                max_cost = Decimal(max_cost)
+            except InvalidOperation:
+                max_cost = None
+            # NaN and Infinity parse but cannot be compared with a cost
+            if max_cost is not None and max_cost.is_finite():
+                queryset = queryset.filter(cost_per_serving__lte=max_cost)
+        
         return queryset
     
     def get_serializer_class(self):
@@ -60,6 +73,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
     
+    def perform_destroy(self, instance):
+        # Hidden now; the deletion worker removes it and its rows in chunks
+        delete_recipe_later(instance)
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def favorite(self, request, slug=None):
         """Toggle recipe favorite status"""
@@ -75,7 +92,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_recipes(self, request):
         """Get current user's recipes"""
-        queryset = Recipe.objects.filter(author=request.user)
+        queryset = Recipe.active.filter(author=request.user)
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
@@ -83,7 +100,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def favorites(self, request):
         """Get user's favorite recipes"""
-        queryset = request.user.favorite_recipes.all()
+        queryset = request.user.favorite_recipes.active()
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_review_reply_delete_comment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cost_per_serving',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Estimated ingredient cost per serving', max_digits=8, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cost_per_serving'], name='recipes_rec_cost_pe_2765a5_idx'),
+        ),
+    ]
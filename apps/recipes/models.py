@@ -57,6 +57,21 @@ class DietaryTag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for recipes"""
+    
+    def active(self):
+        """Leave out recipes waiting for background deletion"""
+        return self.filter(deleted_at__isnull=True)
+
+
+class ActiveRecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """Recipes not waiting for background deletion, for listings, search and pickers"""
+    
+    def get_queryset(self):
+        return super().get_queryset().active()
+
+
 class Recipe(models.Model):
     """Main Recipe model"""
     
@@ -144,6 +159,16 @@ class Recipe(models.Model):
         help_text="Fiber in grams"
     )
     
+    # Estimated from the shopping price catalog; kept current by apps.shopping.pricing
+    cost_per_serving = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Estimated ingredient cost per serving"
+    )
+    
     # Sharing & Visibility
     is_public = models.BooleanField(
         default=True,
@@ -157,6 +182,13 @@ class Recipe(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Set when the recipe is queued for deletion; hidden from then on
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    # The default manager sees every row, so admin and lookups through meals still find queued recipes
+    objects = RecipeQuerySet.as_manager()
+    active = ActiveRecipeManager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Recipe'
@@ -165,6 +197,7 @@ class Recipe(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['slug']),
             models.Index(fields=['is_public']),
+            models.Index(fields=['cost_per_serving']),
         ]
     
     def save(self, *args, **kwargs):
@@ -186,6 +219,8 @@ class Recipe(models.Model):
     @property
     def favorite_count(self):
         """Return the number of users who favorited this recipe"""
+        if hasattr(self, 'favorites_count'):
+            return self.favorites_count
         return self.favorited_by.count()
 
 
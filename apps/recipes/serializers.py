@@ -3,6 +3,7 @@ REST API Serializers for Recipes App
 """
 from rest_framework import serializers
 from .models import Category, DietaryTag, Recipe, Ingredient, Instruction, Review
+from apps.shopping.pricing import update_recipe_costs
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -15,7 +16,7 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at']
     
     def get_recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes.active().count()
 
 
 class DietaryTagSerializer(serializers.ModelSerializer):
@@ -65,7 +66,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'id', 'title', 'slug', 'description', 'author', 'author_username',
             'image', 'category', 'category_name', 'dietary_tags',
             'prep_time', 'cook_time', 'total_time', 'servings', 'difficulty',
-            'calories', 'is_public', 'views', 'favorite_count', 'created_at'
+            'calories', 'cost_per_serving', 'is_public', 'views', 'favorite_count', 'created_at'
         ]
         read_only_fields = ['slug', 'author', 'views', 'created_at']
 
@@ -85,7 +86,7 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             'id', 'title', 'slug', 'description', 'author', 'author_username',
             'image', 'category', 'category_name', 'dietary_tags',
             'prep_time', 'cook_time', 'total_time', 'servings', 'difficulty',
-            'calories', 'protein', 'carbohydrates', 'fat', 'fiber',
+            'calories', 'protein', 'carbohydrates', 'fat', 'fiber', 'cost_per_serving',
             'is_public', 'views', 'favorite_count',
             'ingredients', 'instructions', 'reviews',
             'created_at', 'updated_at'
@@ -123,6 +124,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         for instruction_data in instructions_data:
             Instruction.objects.create(recipe=recipe, **instruction_data)
         
+        update_recipe_costs([recipe.pk])
         return recipe
     
     def update(self, instance, validated_data):
@@ -151,4 +153,5 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             for instruction_data in instructions_data:
                 Instruction.objects.create(recipe=instance, **instruction_data)
         
+        update_recipe_costs([instance.pk])
         return instance
@@ -0,0 +1,83 @@
+"""
+Tests for the recipes app
+Run with: python manage.py test apps.recipes.tests
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from apps.mealplans.models import Meal, MealPlan
+from apps.users.deletion import delete_recipe_later
+from .models import Recipe
+
+
+class MaxCostFilterTests(TestCase):
+    """The max cost filter on the recipe list page and API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('cook', 'cook@example.com', 'secret-pass-1')
+        for title, cost in (('Cheap Soup', Decimal('1.50')), ('Steak Dinner', Decimal('12.00'))):
+            Recipe.objects.create(
+                author=cls.user, title=title, description='Tasty', prep_time=5, cook_time=10,
+                servings=2, is_public=True, cost_per_serving=cost,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def titles(self, max_cost):
+        page = self.client.get(reverse('recipes:recipe_list'), {'max_cost': max_cost})
+        api = self.client.get('/api/recipes/recipes/', {'max_cost_per_serving': max_cost})
+        self.assertEqual((page.status_code, api.status_code), (200, 200))
+        return (
+            sorted(recipe.title for recipe in page.context['recipes']),
+            sorted(recipe['title'] for recipe in api.json()['results']),
+        )
+
+    def test_filters_by_cost(self):
+        self.assertEqual(self.titles('5'), (['Cheap Soup'], ['Cheap Soup']))
+
+    def test_non_finite_values_are_ignored(self):
+        everything = ['Cheap Soup', 'Steak Dinner']
+        for value in ('NaN', 'sNaN', 'Infinity', '-Infinity', 'not-a-number'):
+            with self.subTest(value=value):
+                self.assertEqual(self.titles(value), (everything, everything))
+
+
+class QueuedRecipeTests(TestCase):
+    """Recipes waiting for background deletion"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create_superuser('chef', 'chef@example.com', 'secret-pass-1')
+        cls.planner = User.objects.create_user('diner', 'diner@example.com', 'secret-pass-1')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, title='Old Stew', description='Stew', prep_time=5, cook_time=10,
+            servings=2, is_public=True,
+        )
+        cls.plan = MealPlan.objects.create(user=cls.planner, name='Week', start_date=date(2026, 2, 2))
+        Meal.objects.create(
+            meal_plan=cls.plan, recipe=cls.recipe, meal_type='dinner', day_of_week=0, date=date(2026, 2, 2),
+        )
+        delete_recipe_later(cls.recipe)
+
+    def test_hidden_from_listings(self):
+        self.client.force_login(self.planner)
+        self.assertEqual(list(self.client.get(reverse('recipes:recipe_list')).context['recipes']), [])
+        self.assertEqual(self.client.get('/api/recipes/recipes/').json()['results'], [])
+        self.assertFalse(Recipe.active.filter(pk=self.recipe.pk).exists())
+
+    def test_still_found_through_meals_and_in_the_admin(self):
+        self.client.force_login(self.planner)
+        payload = self.client.get(f'/api/meal-plans/meal-plans/{self.plan.pk}/', {'compact': '1'}).json()
+        self.assertEqual(list(payload['recipes']), [str(self.recipe.pk)])
+
+        request = RequestFactory().get('/admin/recipes/recipe/')
+        request.user = self.author
+        self.assertEqual(list(admin.site._registry[Recipe].get_queryset(request)), [self.recipe])
@@ -6,11 +6,15 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q, Count, Avg
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q, Count, Avg, F
 from django.contrib import messages
 
 from .models import Recipe, Category, DietaryTag, Ingredient, Instruction, Review
 from .forms import RecipeForm, IngredientFormSet, InstructionFormSet, ReviewForm
+from apps.shopping.pricing import update_recipe_costs
+from apps.users.deletion import delete_recipe_later
 
 
 class DashboardView(LoginRequiredMixin, ListView):
@@ -20,14 +24,14 @@ class DashboardView(LoginRequiredMixin, ListView):
     context_object_name = 'user_recipes'
     
     def get_queryset(self):
-        return Recipe.objects.filter(author=self.request.user).select_related('category')[:6]
+        return Recipe.active.filter(author=self.request.user).select_related('category')[:6]
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
-        context['total_recipes'] = user.recipes.count()
+        context['total_recipes'] = user.recipes.active().count()
         context['total_meal_plans'] = user.meal_plans.count()
-        context['favorite_recipes'] = user.favorite_recipes.all()[:6]
+        context['favorite_recipes'] = user.favorite_recipes.active()[:6]
         return context
 
 
@@ -39,7 +43,7 @@ class RecipeListView(LoginRequiredMixin, ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        queryset = Recipe.objects.filter(is_public=True).select_related(
+        queryset = Recipe.active.filter(is_public=True).select_related(
             'author', 'category'
         ).prefetch_related('dietary_tags')
         
@@ -72,8 +76,22 @@ class RecipeListView(LoginRequiredMixin, ListView):
         if max_calories:
             queryset = queryset.filter(calories__lte=int(max_calories))
         
-        # Sorting
+        # Filter by max estimated cost per serving
+        max_cost = self.request.GET.get('max_cost')
+        if max_cost:
+            try:
+                max_cost = Decimal(max_cost)
+            except InvalidOperation:
+                max_cost = None
+            # NaN and Infinity parse but cannot be compared with a cost
+            if max_cost is not None and max_cost.is_finite():
+                queryset = queryset.filter(cost_per_serving__lte=max_cost)
+        
+        # Sorting; recipes without a cost estimate go last
         sort = self.request.GET.get('sort', '-created_at')
+        if sort.lstrip('-') == 'cost_per_serving':
+            cost = F('cost_per_serving')
+            sort = cost.desc(nulls_last=True) if sort.startswith('-') else cost.asc(nulls_last=True)
         queryset = queryset.order_by(sort)
         
         return queryset
@@ -96,7 +114,7 @@ class RecipeDetailView(LoginRequiredMixin, DetailView):
     
     def get_queryset(self):
         # Show public recipes or user's own recipes
-        queryset = Recipe.objects.select_related('author', 'category').prefetch_related(
+        queryset = Recipe.active.select_related('author', 'category').prefetch_related(
             'dietary_tags', 'ingredients', 'instructions', 'reviews__user'
         )
         if self.request.user.is_authenticated:
@@ -160,6 +178,7 @@ class RecipeCreateView(LoginRequiredMixin, CreateView):
             # Save instructions
             instruction_formset.instance = self.object
             instruction_formset.save()
+            update_recipe_costs([self.object.pk])
             
             messages.success(self.request, 'Recipe created successfully!')
             return redirect(self.object.get_absolute_url())
@@ -177,7 +196,7 @@ class RecipeUpdateView(LoginRequiredMixin, UpdateView):
     
     def get_queryset(self):
         # Only allow users to edit their own recipes
-        return Recipe.objects.filter(author=self.request.user)
+        return Recipe.active.filter(author=self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -207,6 +226,7 @@ class RecipeUpdateView(LoginRequiredMixin, UpdateView):
             self.object = form.save()
             ingredient_formset.save()
             instruction_formset.save()
+            update_recipe_costs([self.object.pk])
             messages.success(self.request, 'Recipe updated successfully!')
             return redirect(self.object.get_absolute_url())
         else:
@@ -223,11 +243,13 @@ class RecipeDeleteView(LoginRequiredMixin, DeleteView):
     
     def get_queryset(self):
         # Only allow users to delete their own recipes
-        return Recipe.objects.filter(author=self.request.user)
+        return Recipe.active.filter(author=self.request.user)
     
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Recipe deleted successfully!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # Hidden now; the deletion worker removes it and its rows in chunks
+        delete_recipe_later(self.object)
+        messages.success(self.request, 'Recipe deleted successfully!')
+        return redirect(self.get_success_url())
 
 
 @login_required
@@ -339,7 +361,7 @@ class MyRecipesView(LoginRequiredMixin, ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        return Recipe.objects.filter(author=self.request.user).select_related('category')
+        return Recipe.active.filter(author=self.request.user).select_related('category')
 
 
 class FavoriteRecipesView(LoginRequiredMixin, ListView):
@@ -350,4 +372,4 @@ class FavoriteRecipesView(LoginRequiredMixin, ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        return self.request.user.favorite_recipes.all().select_related('author', 'category')
+        return self.request.user.favorite_recipes.active().select_related('author', 'category')
@@ -0,0 +1,40 @@
+"""
+Access to Owned and Shared Shopping Lists
+
+The owner and every user a list is shared with each hold one membership row,
+unique on (user, list), so "lists I can access" is a single indexed lookup
+instead of an OR across the owner column and a join. A user's memberships are
+read once per request and cached on it for every later check.
+"""
+from django.http import Http404
+
+from .models import ShoppingList, ShoppingListItem, ShoppingListMember
+
+
+def list_roles(request):
+    """Map of list id -> role for every list the request's user can access"""
+    # DRF wraps the Django request; cache on the underlying one so both share it
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_shopping_list_roles'):
+        request._shopping_list_roles = dict(
+            ShoppingListMember.objects.filter(user=request.user).values_list('shopping_list_id', 'role')
+        )
+    return request._shopping_list_roles
+
+
+def list_role_or_404(request, pk):
+    """The user's role on a list, or 404 when they cannot access it"""
+    role = list_roles(request).get(int(pk))
+    if role is None:
+        raise Http404('No shopping list found.')
+    return role
+
+
+def accessible_lists(user):
+    """Lists the user owns or is a member of"""
+    return ShoppingList.objects.filter(memberships__user=user)
+
+
+def accessible_items(user):
+    """Items of every list the user owns or is a member of"""
+    return ShoppingListItem.objects.filter(shopping_list__memberships__user=user)
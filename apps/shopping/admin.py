@@ -1,14 +1,47 @@
 """
 Admin Configuration for Shopping App
 """
-from django.contrib import admin
-from .models import ShoppingList, ShoppingListItem
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .models import (
+    ShoppingList, ShoppingListItem, ShoppingListMember, CategoryOverride, Store, StoreAisle, Pantry, PantryItem,
+    IngredientPrice
+)
+from .pricing import catalog_changed, import_prices_csv, update_recipe_costs
 
 
 class ShoppingListItemInline(admin.TabularInline):
     """Inline admin for shopping list items"""
     model = ShoppingListItem
     extra = 3
+    raw_id_fields = ['recipes', 'meal_plan']
+
+
+class ShoppingListMemberFormSet(forms.BaseInlineFormSet):
+    """Memberships of a list; the owner row follows the list's user and cannot be edited here"""
+    
+    def clean(self):
+        super().clean()
+        for form in self.forms:
+            deleted = self._should_delete_form(form)
+            was_owner = form.instance.pk is not None and form.initial.get('role') == ShoppingListMember.OWNER
+            if was_owner and (deleted or form.has_changed()):
+                raise forms.ValidationError(
+                    'The owner membership cannot be edited or deleted; change the list\'s user instead.'
+                )
+            if not was_owner and not deleted and form.cleaned_data.get('role') == ShoppingListMember.OWNER:
+                raise forms.ValidationError('Only the list\'s user can be its owner; add other users as members.')
+
+
+class ShoppingListMemberInline(admin.TabularInline):
+    """Inline admin for the users who can access a shopping list"""
+    model = ShoppingListMember
+    formset = ShoppingListMemberFormSet
+    extra = 0
+    raw_id_fields = ['user']
 
 
 @admin.register(ShoppingList)
@@ -19,11 +52,15 @@ class ShoppingListAdmin(admin.ModelAdmin):
     search_fields = ['name', 'user__username', 'notes']
     readonly_fields = ['created_at', 'updated_at']
     autocomplete_fields = ['meal_plan']
-    inlines = [ShoppingListItemInline]
+    raw_id_fields = ['store']
+    inlines = [ShoppingListMemberInline, ShoppingListItemInline]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'meal_plan')
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('user', 'meal_plan', 'name', 'notes')
+            'fields': ('user', 'meal_plan', 'store', 'name', 'notes')
         }),
         ('Status', {
             'fields': ('is_completed',)
@@ -33,3 +70,105 @@ class ShoppingListAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(CategoryOverride)
+class CategoryOverrideAdmin(admin.ModelAdmin):
+    """Admin configuration for CategoryOverride model"""
+    list_display = ['name_key', 'category', 'user', 'updated_at']
+    list_filter = ['category']
+    search_fields = ['name_key', 'user__username']
+    raw_id_fields = ['user']
+
+
+class StoreAisleInline(admin.TabularInline):
+    """Inline admin for store aisles"""
+    model = StoreAisle
+    extra = 0
+
+
+@admin.register(Store)
+class StoreAdmin(admin.ModelAdmin):
+    """Admin configuration for Store model"""
+    list_display = ['name', 'user', 'updated_at']
+    search_fields = ['name', 'user__username']
+    raw_id_fields = ['user']
+    inlines = [StoreAisleInline]
+
+
+class PantryItemInline(admin.TabularInline):
+    """Inline admin for pantry items"""
+    model = PantryItem
+    extra = 0
+    readonly_fields = ['amount', 'dimension']
+
+
+@admin.register(Pantry)
+class PantryAdmin(admin.ModelAdmin):
+    """Admin configuration for Pantry model"""
+    list_display = ['user', 'updated_at']
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
+    inlines = [PantryItemInline]
+
+
+class PriceImportForm(forms.Form):
+    """Upload form for loading the price catalog from CSV"""
+    csv_file = forms.FileField(
+        label='CSV file',
+        help_text='Columns: name, price and optionally per (e.g. "1 kg", "500g", "1 can"; defaults to one piece)'
+    )
+
+
+@admin.register(IngredientPrice)
+class IngredientPriceAdmin(admin.ModelAdmin):
+    """Admin configuration for the ingredient price catalog"""
+    list_display = ['name', 'price', 'per', 'dimension', 'updated_at']
+    list_filter = ['dimension']
+    search_fields = ['name', 'name_key']
+    readonly_fields = ['name_key', 'dimension', 'unit_price', 'updated_at']
+    change_list_template = 'admin/shopping/ingredientprice/change_list.html'
+    
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_csv), name='shopping_ingredientprice_import'),
+        ] + super().get_urls()
+    
+    def import_csv(self, request):
+        """Load prices from an uploaded CSV file, then reprice recipes"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:shopping_ingredientprice_changelist')
+        form = PriceImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            created, updated, errors = import_prices_csv(form.cleaned_data['csv_file'])
+            repriced = update_recipe_costs() if created or updated else 0
+            self.message_user(
+                request, f'Imported prices: {created} new, {updated} updated; {repriced} recipes repriced.'
+            )
+            for error in errors[:20]:
+                self.message_user(request, error, messages.WARNING)
+            if len(errors) > 20:
+                self.message_user(request, f'... and {len(errors) - 20} more rows skipped.', messages.WARNING)
+            return redirect('admin:shopping_ingredientprice_changelist')
+        return TemplateResponse(request, 'admin/shopping/ingredientprice/import_csv.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import prices from CSV',
+            'form': form,
+        })
+    
+    def _catalog_changed(self):
+        catalog_changed()
+        update_recipe_costs()
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._catalog_changed()
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._catalog_changed()
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        self._catalog_changed()
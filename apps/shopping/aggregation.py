@@ -0,0 +1,299 @@
+"""
+Unit-Aware Ingredient Aggregation for Shopping Lists
+
+Free-text ingredient amounts ("1 1/2 cups, chopped", "400g", "2 cans") are
+parsed into a value, a dimension and a unit, scaled by the planned servings,
+and summed per ingredient in base units (grams, millilitres, pieces) before
+being formatted back into a readable quantity.
+"""
+import math
+import re
+from fractions import Fraction
+
+from apps.recipes.models import Ingredient
+
+
+# alias -> (dimension, display unit, size of the unit in the dimension's base)
+UNITS = {}
+
+
+def _plural(unit):
+    return unit + ('es' if unit.endswith(('ch', 'sh', 'x')) else 's')
+
+
+def _register(dimension, display, factor, *aliases):
+    for alias in (display,) + aliases:
+        UNITS[alias] = (dimension, display, factor)
+
+
+_register('mass', 'g', 1, 'gr', 'gram', 'grams', 'gramme', 'grammes')
+_register('mass', 'kg', 1000, 'kilo', 'kilos', 'kilogram', 'kilograms')
+_register('mass', 'mg', 0.001, 'milligram', 'milligrams')
+_register('mass', 'oz', 28.3495, 'ounce', 'ounces')
+_register('mass', 'lb', 453.592, 'lbs', 'pound', 'pounds')
+_register('volume', 'ml', 1, 'milliliter', 'milliliters', 'millilitre', 'millilitres')
+_register('volume', 'cl', 10, 'centiliter', 'centiliters', 'centilitre', 'centilitres')
+_register('volume', 'dl', 100, 'deciliter', 'deciliters', 'decilitre', 'decilitres')
+_register('volume', 'l', 1000, 'liter', 'liters', 'litre', 'litres')
+_register('volume', 'tsp', 4.92892, 'teaspoon', 'teaspoons', 'tsps')
+_register('volume', 'tbsp', 14.7868, 'tablespoon', 'tablespoons', 'tbsps', 'tbs', 'tbl')
+_register('volume', 'fl oz', 29.5735, 'floz', 'fluid ounce', 'fluid ounces')
+_register('volume', 'cup', 236.588, 'cups')
+_register('volume', 'pint', 473.176, 'pints', 'pt')
+_register('volume', 'quart', 946.353, 'quarts', 'qt')
+_register('volume', 'gallon', 3785.41, 'gallons', 'gal')
+
+# Named containers and pieces; each is counted separately from plain counts
+CONTAINERS = (
+    'can', 'tin', 'jar', 'bottle', 'package', 'pack', 'packet', 'bag', 'box',
+    'bunch', 'clove', 'slice', 'sprig', 'stalk', 'head', 'piece', 'pinch', 'dash',
+    'stick', 'sheet', 'fillet', 'handful',
+)
+for _name in CONTAINERS:
+    _register(f'count:{_name}', _name, 1, _plural(_name))
+
+# Units written as words are pluralized when the amount is not one
+WORD_UNITS = {'cup', 'pint', 'quart', 'gallon'} | set(CONTAINERS)
+
+# Metric units totals are shown in when recipes mix units of one dimension
+BASE_DISPLAY = {
+    'mass': (('kg', 1000), ('g', 1)),
+    'volume': (('l', 1000), ('ml', 1)),
+}
+
+DIMENSION_ORDER = {'mass': 0, 'volume': 1, 'count': 2}
+DIMENSION_ORDER.update((f'count:{name}', 3 + i) for i, name in enumerate(CONTAINERS))
+
+UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4',
+    '⅕': '1/5', '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8',
+}
+
+_NUMBER = r'\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?'
+AMOUNT_RE = re.compile(
+    rf'^\s*(?:about\s+|approx\.?\s+)?(?P<low>{_NUMBER})(?:\s*(?:-|–|to)\s*(?P<high>{_NUMBER}))?\s*(?P<rest>.*)$',
+    re.IGNORECASE,
+)
+
+# Comma-grouped thousands ("1,000 g"); a comma before one or two digits stays a decimal comma
+THOUSANDS_RE = re.compile(r'\b\d{1,3}(?:,\d{3})+(?!,?\d)')
+
+
+class Quantity:
+    """A parsed amount: value in the dimension's base unit plus the unit it was written in"""
+    __slots__ = ('value', 'dimension', 'unit')
+
+    def __init__(self, value, dimension, unit):
+        self.value = value
+        self.dimension = dimension
+        self.unit = unit
+
+    def __repr__(self):
+        return f'Quantity({self.value!r}, {self.dimension!r}, {self.unit!r})'
+
+
+def _number(text):
+    """Value of a matched number, or None when a fraction has a zero denominator"""
+    text = text.replace(',', '.')
+    try:
+        return float(sum(Fraction(part) for part in text.split()))
+    except ZeroDivisionError:
+        return None
+
+
+def parse_amount(amount):
+    """Parse a free-text amount into a Quantity, or None when it has no usable number"""
+    text = amount or ''
+    for char, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(char, f' {fraction}')
+    text = THOUSANDS_RE.sub(lambda match: match[0].replace(',', ''), text)
+    match = AMOUNT_RE.match(text)
+    if not match:
+        return None
+
+    # Buy for the top of a range
+    value = _number(match['high'] or match['low'])
+    if value is None:
+        return None
+    head = match['rest'].split(',', 1)[0].strip().lower()
+    words = head.replace('.', ' ').split()
+
+    for size in (2, 1):
+        unit = UNITS.get(' '.join(words[:size]))
+        if unit and len(words) >= size:
+            dimension, display, factor = unit
+            return Quantity(value * factor, dimension, display)
+    return Quantity(value, 'count', None)
+
+
+def normalize_name(name):
+    """Key ingredient names so case, spacing and simple plurals merge"""
+    key = ' '.join(name.lower().split())
+    if key.endswith('oes'):
+        return key[:-2]
+    if key.endswith('ies') and len(key) > 4:
+        return key[:-3] + 'y'
+    if key.endswith('s') and not key.endswith(('ss', 'us', 'is')):
+        return key[:-1]
+    return key
+
+
+def format_number(value):
+    text = f'{round(value, 2):.2f}'.rstrip('0').rstrip('.')
+    return text or '0'
+
+
+def _unit_label(unit, value):
+    if unit in WORD_UNITS and value != 1:
+        return _plural(unit)
+    return unit
+
+
+def format_quantity(dimension, total, units):
+    """Render a summed base-unit total, in the recipes' own unit when they agree"""
+    if dimension == 'count':
+        return format_number(math.ceil(total - 1e-9))
+    if dimension.startswith('count:'):
+        unit = dimension.split(':', 1)[1]
+        value = math.ceil(total - 1e-9)
+        return f'{value} {_unit_label(unit, value)}'
+
+    if len(units) == 1:
+        unit = next(iter(units))
+        value = total / UNITS[unit][2]
+    else:
+        unit, factor = next(
+            (unit, factor) for unit, factor in BASE_DISPLAY[dimension]
+            if total >= factor or factor == 1
+        )
+        value = total / factor
+    separator = '' if unit in ('g', 'kg', 'mg', 'ml', 'l', 'cl', 'dl') else ' '
+    return f'{format_number(value)}{separator}{_unit_label(unit, round(value, 2))}'
+
+
+class AggregatedIngredient:
+    """Running total of one ingredient across recipes"""
+
+    def __init__(self, name):
+        self.name = name
+        self.totals = {}
+        self.units = {}
+        self.unparsed = []
+        self.recipe_ids = set()
+
+    def add(self, amount, factor=1, recipe_id=None):
+        if recipe_id is not None:
+            self.recipe_ids.add(recipe_id)
+        quantity = parse_amount(amount)
+        if quantity is None:
+            text = (amount or '').strip()
+            if text and text.lower() not in (u.lower() for u in self.unparsed):
+                self.unparsed.append(text)
+            return
+        self.totals[quantity.dimension] = self.totals.get(quantity.dimension, 0) + quantity.value * factor
+        if quantity.unit:
+            self.units.setdefault(quantity.dimension, set()).add(quantity.unit)
+
+    def merge(self, other):
+        """Add another ingredient's totals into this one"""
+        for dimension, total in other.totals.items():
+            self.totals[dimension] = self.totals.get(dimension, 0) + total
+        for dimension, units in other.units.items():
+            self.units.setdefault(dimension, set()).update(units)
+        for text in other.unparsed:
+            self.add(text)
+        self.recipe_ids |= other.recipe_ids
+
+    def subtract(self, dimension, value):
+        """Take an amount in base units off a total, dropping totals that are used up"""
+        remaining = self.totals.get(dimension, 0) - value
+        if remaining > 1e-9:
+            self.totals[dimension] = remaining
+        else:
+            self.totals.pop(dimension, None)
+            self.units.pop(dimension, None)
+
+    def add_quantity(self, quantity):
+        """Add a formatted quantity such as "1.5kg + 2 cans + to taste" back in"""
+        for part in (quantity or '').split(' + '):
+            self.add(part)
+
+    @property
+    def quantity(self):
+        parts = [
+            format_quantity(dimension, self.totals[dimension], self.units.get(dimension, ()))
+            for dimension in sorted(self.totals, key=DIMENSION_ORDER.get)
+        ]
+        return ' + '.join(parts + self.unparsed)
+
+
+def accounted_parts(ingredient, quantities):
+    """Split an ingredient over formatted quantities in order; return the part of each it accounts for
+
+    Each part is capped at its quantity, so an amount added on top of the
+    ingredient is never counted as part of it.
+    """
+    remaining = AggregatedIngredient(ingredient.name)
+    remaining.merge(ingredient)
+    parts = []
+    for quantity in quantities:
+        have = AggregatedIngredient(ingredient.name)
+        have.add_quantity(quantity)
+        part = AggregatedIngredient(ingredient.name)
+        for dimension, value in have.totals.items():
+            taken = min(value, remaining.totals.get(dimension, 0))
+            if taken > 1e-9:
+                part.totals[dimension] = taken
+                part.units[dimension] = set(have.units.get(dimension, ()))
+                remaining.subtract(dimension, taken)
+        for text in have.unparsed:
+            if text.lower() in (other.lower() for other in remaining.unparsed):
+                part.unparsed.append(text)
+                remaining.unparsed = [other for other in remaining.unparsed if other.lower() != text.lower()]
+        parts.append(part.quantity[:50])
+    return parts
+
+
+def aggregate_ingredients(rows, stock=None):
+    """Sum (name, amount, factor, recipe_id) rows into AggregatedIngredients, in name order
+
+    When a pantry stock is given, what it holds is netted out of the totals
+    and ingredients it fully covers are left out.
+    """
+    aggregated = {}
+    for name, amount, factor, recipe_id in rows:
+        key = normalize_name(name)
+        if key not in aggregated:
+            aggregated[key] = AggregatedIngredient(name.strip())
+        aggregated[key].add(amount, factor, recipe_id)
+    if stock is not None:
+        aggregated = {key: item for key, item in aggregated.items() if not stock.net(key, item)}
+    return sorted(aggregated.values(), key=lambda item: item.name.lower())
+
+
+def combined_ingredients(meals=None, recipes=()):
+    """Ingredient rows of meals and (recipe, servings) pairs, scaled, in at most two queries
+
+    A recipe reached several times (two meals, or a meal and an ad-hoc entry)
+    gets one summed factor, so its ingredients are fetched and listed once.
+    """
+    factors = {}
+    if meals is not None:
+        for recipe_id, meal_servings, recipe_servings in meals.values_list(
+            'recipe_id', 'servings', 'recipe__servings'
+        ):
+            factor = meal_servings / (recipe_servings or meal_servings or 1)
+            factors[recipe_id] = factors.get(recipe_id, 0) + factor
+    for recipe, servings in recipes:
+        factor = servings / recipe.servings if servings and recipe.servings else 1
+        factors[recipe.pk] = factors.get(recipe.pk, 0) + factor
+
+    if not factors:
+        return []
+    rows = Ingredient.objects.filter(recipe_id__in=factors).values_list('recipe_id', 'name', 'amount')
+    return [(name, amount, factors[recipe_id], recipe_id) for recipe_id, name, amount in rows]
+
+
+def meal_plan_ingredients(meal_plan):
+    """Ingredient rows of a meal plan scaled by each meal's servings, in two queries"""
+    return combined_ingredients(meal_plan.meals.all())
@@ -8,6 +8,7 @@ from . import api_views
 router = DefaultRouter()
 router.register(r'shopping-lists', api_views.ShoppingListViewSet, basename='shoppinglist')
 router.register(r'items', api_views.ShoppingListItemViewSet, basename='shoppinglistitem')
+router.register(r'pantry-items', api_views.PantryItemViewSet, basename='pantryitem')
 
 urlpatterns = [
     path('', include(router.urls)),
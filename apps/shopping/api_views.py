@@ -1,13 +1,30 @@
 """
 REST API Views for Shopping App
 """
-from rest_framework import viewsets
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from .models import ShoppingList, ShoppingListItem
-from .serializers import ShoppingListSerializer, ShoppingListCreateSerializer, ShoppingListItemSerializer
+from django.db.models import Prefetch, Q
+
+from apps.mealplans.models import MealPlan
+from apps.recipes.models import Recipe
+from .models import ShoppingList, ShoppingListItem, Pantry, PantryItem
+from .serializers import (
+    ShoppingListSerializer, ShoppingListCreateSerializer, ShoppingListItemSerializer,
+    AddRecipesSerializer, CombineListsSerializer, CheckItemsSerializer, ShoppingListSyncSerializer,
+    ShoppingListChangesSerializer,
+    PantryItemSerializer
+)
+from .access import accessible_items, accessible_lists
+from .categories import classify_item, learn_override
+from .checkoff import list_progress, set_items_purchased
+from .merging import add_recipes_to_list, combine_into_list, selected_meals
+from .pantry import restock_pantry
+from .realtime import publish_list_event
+from .sync import changes_since, apply_offline_changes
 
 
 class ShoppingListViewSet(viewsets.ModelViewSet):
@@ -15,15 +32,157 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return ShoppingList.objects.filter(user=self.request.user).prefetch_related('items')
+        # Members can read and work with a list's items; only the owner can change or delete it
+        if self.action in ['update', 'partial_update', 'destroy']:
+            lists = ShoppingList.objects.filter(user=self.request.user)
+        else:
+            lists = accessible_lists(self.request.user)
+        return lists.select_related('user').prefetch_related(
+            'items', Prefetch('items__recipes', queryset=Recipe.objects.only('id'))
+        )
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return ShoppingListCreateSerializer
+        elif self.action == 'add_recipes':
+            return AddRecipesSerializer
+        elif self.action == 'combine':
+            return CombineListsSerializer
+        elif self.action == 'check_items':
+            return CheckItemsSerializer
+        elif self.action == 'sync':
+            return ShoppingListSyncSerializer
         return ShoppingListSerializer
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def add_recipes(self, request, pk=None):
+        """Merge the ingredients of one or more recipes into the list"""
+        shopping_list = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        recipe_ids = set(serializer.validated_data['recipe_ids'])
+        recipes = list(Recipe.active.filter(Q(is_public=True) | Q(author=request.user), id__in=recipe_ids))
+        missing = recipe_ids - {recipe.pk for recipe in recipes}
+        if missing:
+            return Response(
+                {'detail': f'Recipes not available: {", ".join(map(str, sorted(missing)))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        created, updated = add_recipes_to_list(
+            shopping_list, recipes, servings=serializer.validated_data.get('servings')
+        )
+        shopping_list = self.get_queryset().get(pk=shopping_list.pk)
+        data = ShoppingListSerializer(shopping_list, context=self.get_serializer_context()).data
+        data['merged'] = {'created': len(created), 'updated': len(updated)}
+        return Response(data)
+    
+    @action(detail=False, methods=['post'])
+    def combine(self, request):
+        """Aggregate meal plans, date ranges and recipes into a new or existing list
+        
+        With ``dry_run`` the items that would be added and merged are returned
+        and nothing is saved.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        meal_plans = list(MealPlan.objects.filter(user=request.user, id__in=data['meal_plan_ids']))
+        recipes = Recipe.active.filter(
+            Q(is_public=True) | Q(author=request.user), id__in={entry['id'] for entry in data['recipes']}
+        ).in_bulk()
+        missing_plans = set(data['meal_plan_ids']) - {meal_plan.pk for meal_plan in meal_plans}
+        missing_recipes = {entry['id'] for entry in data['recipes']} - set(recipes)
+        errors = {}
+        if missing_plans:
+            errors['meal_plan_ids'] = f'Meal plans not available: {", ".join(map(str, sorted(missing_plans)))}'
+        if missing_recipes:
+            errors['recipes'] = f'Recipes not available: {", ".join(map(str, sorted(missing_recipes)))}'
+        shopping_list = None
+        if data['shopping_list'] is not None:
+            shopping_list = accessible_lists(request.user).filter(pk=data['shopping_list']).first()
+            if shopping_list is None:
+                errors['shopping_list'] = 'Shopping list not found.'
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        date_ranges = [(date_range['start'], date_range['end']) for date_range in data['date_ranges']]
+        # Items keep a link to their plan only when they all come from one
+        meal_plan = meal_plans[0] if len(meal_plans) == 1 and not (date_ranges or data['recipes']) else None
+        adding = shopping_list is None
+        shopping_list, created, updated, stock = combine_into_list(
+            request.user,
+            meals=selected_meals(request.user, meal_plans, date_ranges),
+            recipes=[(recipes[entry['id']], entry.get('servings')) for entry in data['recipes']],
+            shopping_list=shopping_list,
+            name=data['name'] or (f'Shopping for {meal_plan.name}' if meal_plan else 'Combined shopping list'),
+            meal_plan=meal_plan,
+            dry_run=data['dry_run'],
+        )
+        
+        if data['dry_run']:
+            return Response({
+                'shopping_list': shopping_list.pk if shopping_list else None,
+                'created': [
+                    {'name': item.name, 'quantity': item.quantity, 'category': item.category}
+                    for item in created
+                ],
+                'updated': [
+                    {'id': item.pk, 'name': item.name, 'quantity': item.quantity,
+                     'previous_quantity': item.previous_quantity}
+                    for item in updated
+                ],
+                'netted': stock.netted,
+            })
+        shopping_list = self.get_queryset().get(pk=shopping_list.pk)
+        response = ShoppingListSerializer(shopping_list, context=self.get_serializer_context()).data
+        response['merged'] = {'created': len(created), 'updated': len(updated), 'netted': len(stock.netted)}
+        return Response(response, status=status.HTTP_201_CREATED if adding else status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['post'])
+    def check_items(self, request, pk=None):
+        """Check off, uncheck or toggle several items in one update"""
+        shopping_list = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        items, shopping_list = set_items_purchased(
+            shopping_list.pk, serializer.validated_data['item_ids'], serializer.validated_data['purchased']
+        )
+        data = {
+            'items': [{'id': item.pk, 'is_purchased': item.is_purchased} for item in items],
+            'list': list_progress(shopping_list),
+        }
+        if serializer.validated_data['restock']:
+            created, updated = restock_pantry(request.user, [item for item in items if item.is_purchased])
+            data['restocked'] = len(created) + len(updated)
+        return Response(data)
+    
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        """Items changed and item ids deleted since ?since=<version>"""
+        shopping_list = self.get_object()
+        params = ShoppingListChangesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(changes_since(shopping_list, params.validated_data['since']))
+    
+    @action(detail=True, methods=['post'])
+    def sync(self, request, pk=None):
+        """Apply queued offline edits and return every change since the client's version"""
+        shopping_list = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        id_map, conflicts = apply_offline_changes(shopping_list, serializer.validated_data['operations'])
+        data = changes_since(shopping_list, serializer.validated_data['base_version'])
+        data['id_map'] = id_map
+        data['conflicts'] = conflicts
+        return Response(data)
 
 
 class ShoppingListItemViewSet(viewsets.ModelViewSet):
@@ -32,13 +191,53 @@ class ShoppingListItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return ShoppingListItem.objects.filter(shopping_list__user=self.request.user)
+        return accessible_items(self.request.user).prefetch_related(
+            Prefetch('recipes', queryset=Recipe.objects.only('id'))
+        )
+    
+    def perform_create(self, serializer):
+        category = serializer.validated_data.get('category', 'other')
+        if category == 'other':
+            # Shared lists are categorised by their owner's overrides, as in the web views
+            category = classify_item(
+                serializer.validated_data['shopping_list'].user, serializer.validated_data['name']
+            )
+        item = serializer.save(category=category)
+        publish_list_event(item.shopping_list_id, 'items_added', [item])
+    
+    def perform_update(self, serializer):
+        previous = serializer.instance.category
+        item = serializer.save()
+        if item.category != previous:
+            learn_override(item.shopping_list.user, item.name, item.category)
+        publish_list_event(item.shopping_list_id, 'items_updated', [item])
+    
+    def perform_destroy(self, instance):
+        item_id, shopping_list_id = instance.pk, instance.shopping_list_id
+        instance.delete()
+        publish_list_event(shopping_list_id, 'items_deleted', item_ids=[item_id])
     
     @action(detail=True, methods=['post'])
     def toggle_purchased(self, request, pk=None):
         """Toggle item purchased status"""
         item = self.get_object()
-        item.is_purchased = not item.is_purchased
-        item.save()
+        changed, shopping_list = set_items_purchased(item.shopping_list_id, [item.pk])
+        if not changed:
+            raise NotFound()
+        item.is_purchased = changed[0].is_purchased
+        item.version = shopping_list.version
         serializer = self.get_serializer(item)
         return Response(serializer.data)
+
+
+class PantryItemViewSet(viewsets.ModelViewSet):
+    """API endpoint for the user's pantry items"""
+    serializer_class = PantryItemSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return PantryItem.objects.filter(pantry__user=self.request.user)
+    
+    def perform_create(self, serializer):
+        pantry, _ = Pantry.objects.get_or_create(user=self.request.user)
+        serializer.save(pantry=pantry)
@@ -0,0 +1,194 @@
+"""
+Grocery Category Classification for Shopping List Items
+
+Item names are tokenized and matched against a bundled phrase dictionary
+compiled into a token trie; the longest phrase wins and, between phrases of
+equal length, the rightmost one (the head noun in "chicken stock" or
+"chocolate milk"). Per-user overrides learned from re-categorized items take
+precedence over the dictionary.
+"""
+import re
+from functools import lru_cache
+
+from .aggregation import normalize_name
+from .models import CategoryOverride
+
+
+CATEGORY_KEYWORDS = {
+    'produce': [
+        'apple', 'apricot', 'artichoke', 'arugula', 'asparagus', 'avocado', 'banana',
+        'basil', 'bean sprout', 'beet', 'bell pepper', 'berry', 'blackberry', 'blueberry',
+        'bok choy', 'broccoli', 'brussels sprout', 'cabbage', 'cantaloupe', 'carrot',
+        'cauliflower', 'celery', 'chard', 'cherry', 'chili pepper', 'chive', 'cilantro',
+        'clementine', 'collard green', 'coriander', 'corn on the cob', 'cranberry',
+        'cucumber', 'date', 'dill', 'eggplant', 'endive', 'fennel', 'fig', 'garlic',
+        'ginger', 'grape', 'grapefruit', 'green bean', 'green onion', 'herb', 'jalapeno',
+        'kale', 'kiwi', 'leek', 'lemon', 'lemongrass', 'lettuce', 'lime', 'mango',
+        'melon', 'mint', 'mushroom', 'nectarine', 'okra', 'onion', 'orange', 'oregano',
+        'papaya', 'parsley', 'parsnip', 'pea', 'peach', 'pear', 'pepper', 'persimmon',
+        'pineapple', 'plum', 'pomegranate', 'potato', 'pumpkin', 'radish', 'raspberry',
+        'rhubarb', 'romaine', 'rosemary', 'sage', 'scallion', 'shallot', 'snap pea',
+        'spinach', 'sprout', 'squash', 'strawberry', 'sweet potato', 'thyme', 'tomatillo',
+        'tomato', 'turnip', 'watercress', 'watermelon', 'yam', 'zucchini', 'salad',
+        'cherry tomato', 'fresh herb', 'lemon juice', 'lime juice', 'lemon zest',
+    ],
+    'meat': [
+        'anchovy', 'bacon', 'beef', 'brisket', 'chicken', 'chicken breast', 'chicken thigh',
+        'chorizo', 'clam', 'cod', 'crab', 'duck', 'fish', 'ground beef', 'ground turkey',
+        'haddock', 'halibut', 'ham', 'lamb', 'lobster', 'mahi mahi', 'meatball', 'mince',
+        'mussel', 'octopus', 'oyster', 'pancetta', 'pepperoni', 'pork', 'pork chop',
+        'prawn', 'prosciutto', 'salami', 'salmon', 'sausage', 'scallop', 'sea bass',
+        'seafood', 'shrimp', 'sirloin', 'squid', 'steak', 'tilapia', 'trout', 'tuna',
+        'turkey', 'veal', 'venison', 'rib', 'tenderloin', 'drumstick', 'wing',
+    ],
+    'dairy': [
+        'butter', 'buttermilk', 'cheddar', 'cheese', 'cottage cheese', 'cream',
+        'cream cheese', 'creme fraiche', 'egg', 'egg white', 'egg yolk', 'feta', 'ghee',
+        'goat cheese', 'gouda', 'gruyere', 'half and half', 'heavy cream', 'kefir',
+        'margarine', 'mascarpone', 'milk', 'mozzarella', 'parmesan', 'pecorino',
+        'provolone', 'ricotta', 'sour cream', 'swiss cheese', 'whipping cream',
+        'yogurt', 'yoghurt', 'greek yogurt', 'brie', 'halloumi', 'paneer',
+    ],
+    'bakery': [
+        'bagel', 'baguette', 'bread', 'bread crumb', 'breadcrumb', 'brioche', 'bun',
+        'ciabatta', 'croissant', 'english muffin', 'flatbread', 'focaccia', 'muffin',
+        'naan', 'pita', 'roll', 'sourdough', 'tortilla', 'wrap', 'corn tortilla',
+        'flour tortilla', 'hamburger bun', 'hot dog bun', 'pastry', 'pie crust', 'cake',
+    ],
+    'pantry': [
+        'baking powder', 'baking soda', 'barley', 'bay leaf', 'bean', 'black bean',
+        'black pepper', 'bouillon', 'broth', 'brown sugar', 'bulgur', 'canned tomato',
+        'capers', 'cayenne', 'cereal', 'chickpea', 'chili powder', 'cinnamon', 'cocoa',
+        'coconut milk', 'condensed milk', 'cornmeal', 'cornstarch', 'couscous', 'cumin',
+        'curry paste', 'curry powder', 'dijon', 'dried', 'dried basil', 'dried herb',
+        'dried oregano', 'dried parsley', 'dried rosemary', 'dried thyme', 'extract',
+        'flour', 'garlic powder',
+        'gelatin', 'honey', 'hot sauce', 'jam', 'kidney bean', 'ketchup', 'lentil',
+        'maple syrup', 'mayonnaise', 'molasses', 'mustard', 'noodle', 'nutmeg', 'nut',
+        'oat', 'oil', 'olive', 'olive oil', 'onion powder', 'paprika',
+        'pasta', 'peanut butter', 'pepper flake', 'pesto', 'pine nut', 'quinoa', 'rice',
+        'rice vinegar', 'salsa', 'salt', 'sauce', 'seasoning', 'sesame oil', 'sesame seed',
+        'soy sauce', 'spaghetti', 'spice', 'sriracha', 'stock', 'sugar', 'syrup', 'tahini',
+        'tomato paste', 'tomato sauce', 'turmeric', 'vanilla', 'vanilla extract',
+        'vegetable oil', 'vinegar', 'worcestershire sauce', 'yeast', 'almond', 'walnut',
+        'cashew', 'pecan', 'peanut', 'raisin', 'chia seed', 'flax seed', 'seed', 'lasagna',
+        'macaroni', 'penne', 'fusilli', 'ramen', 'canned', 'chicken stock',
+        'chicken broth', 'beef stock', 'beef broth', 'vegetable stock', 'vegetable broth',
+        'canola oil', 'coconut oil', 'balsamic vinegar', 'panko',
+        'chocolate chip', 'powdered sugar', 'icing sugar', 'evaporated milk', 'tofu',
+    ],
+    'frozen': [
+        'frozen', 'ice cream', 'frozen pea', 'frozen corn', 'frozen berry', 'frozen pizza',
+        'frozen vegetable', 'sorbet', 'gelato', 'popsicle', 'ice', 'frozen fruit',
+        'fish stick', 'puff pastry', 'frozen spinach',
+    ],
+    'beverages': [
+        'beer', 'coffee', 'cola', 'espresso', 'juice', 'kombucha', 'lemonade',
+        'mineral water', 'orange juice', 'apple juice', 'soda', 'sparkling water', 'tea',
+        'tonic', 'water', 'wine', 'red wine', 'white wine', 'sake', 'spirit', 'vodka',
+        'rum', 'whiskey', 'gin', 'almond milk', 'oat milk', 'soy milk', 'energy drink',
+        'sports drink', 'smoothie',
+    ],
+    'snacks': [
+        'biscuit', 'candy', 'chip', 'chocolate', 'cookie', 'cracker', 'granola',
+        'granola bar', 'gummy', 'jerky', 'nacho', 'popcorn', 'pretzel', 'protein bar',
+        'rice cake', 'snack', 'tortilla chip', 'trail mix', 'potato chip', 'dark chocolate',
+    ],
+}
+
+# Words that describe rather than identify an item and are skipped when matching
+STOP_WORDS = {
+    'a', 'an', 'and', 'the', 'of', 'fresh', 'large', 'small', 'medium', 'organic',
+    'chopped', 'diced', 'sliced', 'minced', 'grated', 'shredded', 'boneless',
+    'skinless', 'whole', 'ripe', 'raw', 'cooked', 'extra', 'virgin', 'unsalted',
+    'salted', 'low', 'fat', 'free', 'reduced', 'lean', 'finely', 'roughly', 'to', 'taste',
+}
+
+_TOKEN_RE = re.compile(r"[a-zà-ÿ]+")
+
+_END = object()
+
+
+def tokenize(name):
+    """Lowercase, singularized word tokens of an item name"""
+    return [normalize_name(token) for token in _TOKEN_RE.findall(name.lower())]
+
+
+def override_key(name):
+    """Key an item name for per-user category overrides"""
+    return ' '.join(tokenize(name))
+
+
+class GroceryClassifier:
+    """Token trie over keyword phrases mapping item names to grocery categories"""
+
+    def __init__(self, keywords=None, default='other'):
+        self.default = default
+        self.root = {}
+        for category, phrases in (keywords or CATEGORY_KEYWORDS).items():
+            for phrase in phrases:
+                self.add(phrase, category)
+
+    def add(self, phrase, category):
+        node = self.root
+        for token in tokenize(phrase):
+            if token not in STOP_WORDS:
+                node = node.setdefault(token, {})
+        node[_END] = category
+
+    def classify(self, name):
+        """Return the category of an item name, or the default when nothing matches"""
+        tokens = [token for token in tokenize(name) if token not in STOP_WORDS]
+        best, best_length, best_start = self.default, 0, -1
+        for start in range(len(tokens)):
+            node = self.root
+            for position in range(start, len(tokens)):
+                node = node.get(tokens[position])
+                if node is None:
+                    break
+                length = position - start + 1
+                if _END in node and (length > best_length or (length == best_length and start > best_start)):
+                    best, best_length, best_start = node[_END], length, start
+        return best
+
+    def classify_many(self, names):
+        """Classify names in batch, deduplicating repeated names"""
+        cache = {}
+        for name in names:
+            if name not in cache:
+                cache[name] = self.classify(name)
+        return [cache[name] for name in names]
+
+
+@lru_cache(maxsize=1)
+def get_classifier():
+    """Shared classifier compiled once per process"""
+    return GroceryClassifier()
+
+
+def classify_items(user, names):
+    """Categories for item names, honouring the user's learned overrides first"""
+    keys = [override_key(name) for name in names]
+    overrides = {}
+    if user is not None and keys:
+        overrides = dict(
+            CategoryOverride.objects.filter(user=user, name_key__in=set(keys))
+            .values_list('name_key', 'category')
+        )
+    defaults = get_classifier().classify_many(names)
+    return [overrides.get(key, default) for key, default in zip(keys, defaults)]
+
+
+def classify_item(user, name):
+    return classify_items(user, [name])[0]
+
+
+def learn_override(user, name, category):
+    """Remember a user's category for an item name, dropping it when it matches the dictionary"""
+    key = override_key(name)
+    if not key:
+        return
+    if get_classifier().classify(name) == category:
+        CategoryOverride.objects.filter(user=user, name_key=key).delete()
+    else:
+        CategoryOverride.objects.update_or_create(user=user, name_key=key, defaults={'category': category})
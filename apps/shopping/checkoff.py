@@ -0,0 +1,60 @@
+"""
+Atomic Check-Off of Shopping List Items
+
+Toggling or checking off items is a single UPDATE evaluated by the database
+(``NOT is_purchased`` via ``Case``), so concurrent taps from shared users each
+apply on top of the other instead of overwriting it. The list row is locked
+first, which keeps the version and the purchased counter in step with every
+other item writer.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .models import ShoppingList, ShoppingListItem
+from .realtime import ITEM_FIELDS, publish_list_event
+
+
+def list_progress(shopping_list):
+    """Counters a client needs to redraw a list's progress"""
+    return {
+        'id': shopping_list.pk,
+        'version': shopping_list.version,
+        'total_items': shopping_list.item_count,
+        'completed_items': shopping_list.purchased_count,
+        'completion_percentage': shopping_list.completion_percentage,
+    }
+
+
+@transaction.atomic
+def set_items_purchased(shopping_list_id, item_ids, purchased=None):
+    """Toggle items, or set them to purchased, in one UPDATE; return (changed items, list)
+
+    Items already in the requested state are left untouched and not returned.
+    """
+    shopping_list = ShoppingList.objects.select_for_update().only(
+        'version', 'item_count', 'purchased_count'
+    ).get(pk=shopping_list_id)
+    version = shopping_list.version + 1
+
+    items = ShoppingListItem.objects.filter(shopping_list_id=shopping_list_id, pk__in=item_ids)
+    if purchased is None:
+        value = Case(When(is_purchased=True, then=Value(False)), default=Value(True))
+    else:
+        items = items.exclude(is_purchased=purchased)
+        value = Value(purchased)
+    if not items.update(is_purchased=value, version=version):
+        return [], shopping_list
+
+    # The list lock makes this version unique to the rows just written
+    changed = list(
+        ShoppingListItem.objects.filter(shopping_list_id=shopping_list_id, version=version)
+        .only(*ITEM_FIELDS)
+    )
+    delta = sum(1 if item.is_purchased else -1 for item in changed)
+    ShoppingList.objects.filter(pk=shopping_list_id).update(
+        version=version, purchased_count=F('purchased_count') + delta
+    )
+    shopping_list.version = version
+    shopping_list.purchased_count += delta
+    publish_list_event(shopping_list_id, 'items_updated', changed)
+    return changed, shopping_list
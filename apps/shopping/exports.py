@@ -0,0 +1,148 @@
+"""
+Streaming Text, CSV and Printable Exports of Shopping Lists
+
+Items are read as value rows in category order with ``.iterator()`` and
+written out one row at a time. Every item write bumps the list's version, so
+the version (plus the list's own ``updated_at``) identifies an export: views
+use it as the ETag, and the finished document is cached under it so repeated
+downloads of an unchanged list never touch the items table.
+"""
+import csv
+from itertools import groupby
+
+from django.core.cache import cache
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .models import ShoppingListItem
+
+
+EXPORT_CHUNK_SIZE = 500
+
+# Seconds a finished export stays cached; a new version uses a new key
+EXPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+EXPORT_FIELDS = ('name', 'quantity', 'category', 'is_purchased', 'is_priority', 'notes')
+
+CATEGORY_LABELS = dict(ShoppingListItem.CATEGORY_CHOICES)
+
+
+def export_version(shopping_list):
+    """Version key of a list's exports; changes with every item or list edit"""
+    return f'{shopping_list.pk}-{shopping_list.version}-{shopping_list.updated_at.timestamp():.6f}'
+
+
+def _rows(shopping_list):
+    return shopping_list.items.in_category_order().values(*EXPORT_FIELDS).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+
+
+def _groups(shopping_list):
+    """(category label, rows) pairs; rows arrive in category order, so one pass groups them"""
+    for category, rows in groupby(_rows(shopping_list), lambda row: row['category']):
+        yield CATEGORY_LABELS.get(category, category), rows
+
+
+def _item_line(row):
+    line = f"{row['quantity']} {row['name']}".strip()
+    if row['notes']:
+        line += f" ({row['notes']})"
+    return line
+
+
+def iter_text(shopping_list):
+    """Yield the list as plain text with a checkbox per item"""
+    yield f'{shopping_list.name}\n{"=" * len(shopping_list.name)}\n'
+    if shopping_list.notes:
+        yield f'\n{shopping_list.notes}\n'
+    for label, rows in _groups(shopping_list):
+        yield f'\n{label}\n' + ''.join(
+            f"[{'x' if row['is_purchased'] else ' '}] {_item_line(row)}{' !' if row['is_priority'] else ''}\n"
+            for row in rows
+        )
+
+
+class _Echo:
+    """File-like object whose write returns the line, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(shopping_list):
+    """Yield the list as CSV, one row per item"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['Category', 'Item', 'Quantity', 'Purchased', 'Priority', 'Notes'])
+    for label, rows in _groups(shopping_list):
+        yield ''.join(
+            writer.writerow([
+                label, row['name'], row['quantity'],
+                'yes' if row['is_purchased'] else 'no', 'yes' if row['is_priority'] else 'no', row['notes'],
+            ])
+            for row in rows
+        )
+
+
+PRINT_STYLE = mark_safe("""
+body { font-family: -apple-system, "Segoe UI", Roboto, sans-serif; font-size: 11pt; margin: 1.5cm; color: #000; }
+h1 { font-size: 16pt; margin: 0 0 .25cm; }
+h2 { font-size: 12pt; margin: .5cm 0 .15cm; border-bottom: 1px solid #999; break-after: avoid; }
+ul { list-style: none; padding: 0; margin: 0; columns: 2; column-gap: 1cm; }
+li { padding: 2pt 0; break-inside: avoid; }
+li::before { content: "\\2610"; margin-right: 6pt; }
+li.purchased { color: #777; text-decoration: line-through; }
+li.purchased::before { content: "\\2611"; }
+.priority { font-weight: bold; }
+.notes { color: #555; font-size: 9pt; }
+.no-print { margin-bottom: .5cm; }
+@media print { .no-print { display: none; } body { margin: 0; } }
+@page { margin: 1.5cm; }
+""")
+
+
+def iter_print(shopping_list):
+    """Yield a self-contained, print-ready HTML page grouped by category"""
+    yield format_html(
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        '<title>{}</title>\n<style>{}</style>\n</head>\n<body>\n'
+        '<div class="no-print"><button onclick="window.print()">Print or save as PDF</button></div>\n'
+        '<h1>{}</h1>\n',
+        shopping_list.name, PRINT_STYLE, shopping_list.name
+    )
+    if shopping_list.notes:
+        yield format_html('<p>{}</p>\n', shopping_list.notes)
+    for label, rows in _groups(shopping_list):
+        yield format_html('<h2>{}</h2>\n<ul>\n', label) + ''.join(
+            format_html(
+                '<li class="{}"><span class="{}">{}</span>{}</li>\n',
+                'purchased' if row['is_purchased'] else '',
+                'priority' if row['is_priority'] else '',
+                f"{row['quantity']} {row['name']}".strip(),
+                format_html(' <span class="notes">{}</span>', row['notes']) if row['notes'] else '',
+            )
+            for row in rows
+        ) + '</ul>\n'
+    yield '</body>\n</html>\n'
+
+
+EXPORT_FORMATS = {
+    'txt': (iter_text, 'text/plain; charset=utf-8'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'print': (iter_print, 'text/html; charset=utf-8'),
+}
+
+
+def iter_export(shopping_list, fmt):
+    """Yield an export from cache, or stream it and cache it once it is complete"""
+    key = f'shopping-export:{fmt}:{export_version(shopping_list)}'
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    for chunk in EXPORT_FORMATS[fmt][0](shopping_list):
+        chunks.append(chunk)
+        yield chunk
+    # Only reached when the whole document was sent, so partial exports are never cached
+    cache.set(key, ''.join(chunks), EXPORT_CACHE_TIMEOUT)
@@ -2,8 +2,13 @@
 Forms for Shopping App
 """
 from django import forms
-from .models import ShoppingList, ShoppingListItem
+from django.db.models import Q
+from django.forms import inlineformset_factory
+from .access import accessible_lists
+from .aggregation import normalize_name
+from .models import ShoppingList, ShoppingListItem, Store, StoreAisle, PantryItem
 from apps.mealplans.models import MealPlan
+from apps.recipes.models import Recipe
 
 
 class ShoppingListForm(forms.ModelForm):
@@ -12,18 +17,21 @@ class ShoppingListForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        self.fields['store'].queryset = Store.objects.filter(user=user)
     
     class Meta:
         model = ShoppingList
-        fields = ['name', 'notes', 'is_completed']
+        fields = ['name', 'notes', 'store', 'is_completed']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Weekly Groceries'}),
             'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Optional notes'}),
+            'store': forms.Select(attrs={'class': 'form-select'}),
             'is_completed': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
         labels = {
             'name': 'List Name',
             'notes': 'Notes',
+            'store': 'Store',
             'is_completed': 'Mark as completed',
         }
 
@@ -41,3 +49,142 @@ class ShoppingListItemForm(forms.ModelForm):
             'is_priority': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 2, 'placeholder': 'Optional notes'}),
         }
+
+
+class StoreForm(forms.ModelForm):
+    """Form for creating and renaming stores"""
+    
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+    
+    def clean_name(self):
+        name = self.cleaned_data['name']
+        stores = Store.objects.filter(user=self.user, name=name).exclude(pk=self.instance.pk)
+        if stores.exists():
+            raise forms.ValidationError('You already have a store with this name.')
+        return name
+    
+    class Meta:
+        model = Store
+        fields = ['name']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Corner Market'}),
+        }
+        labels = {
+            'name': 'Store Name',
+        }
+
+
+class StoreAisleForm(forms.ModelForm):
+    """Form for one stop on a store's route"""
+    
+    class Meta:
+        model = StoreAisle
+        fields = ['position', 'category', 'name']
+        widgets = {
+            'position': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'category': forms.Select(attrs={'class': 'form-select'}),
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Aisle 4'}),
+        }
+
+
+# Formset for ordering a store's aisles
+StoreAisleFormSet = inlineformset_factory(
+    Store,
+    StoreAisle,
+    form=StoreAisleForm,
+    extra=1,
+    can_delete=True
+)
+
+
+class PantryItemForm(forms.ModelForm):
+    """Form for adding and updating pantry items"""
+    
+    def clean_name(self):
+        name = self.cleaned_data['name']
+        duplicates = PantryItem.objects.filter(
+            pantry_id=self.instance.pantry_id, name_key=normalize_name(name)
+        ).exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise forms.ValidationError('This item is already in your pantry.')
+        return name
+    
+    class Meta:
+        model = PantryItem
+        fields = ['name', 'quantity', 'expires_on']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Rice'}),
+            'quantity': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 2 kg'}),
+            'expires_on': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        }
+        labels = {
+            'expires_on': 'Best before',
+        }
+
+
+class CombineListForm(forms.Form):
+    """Form for combining meal plans, a date range and extra recipes into one list"""
+    
+    meal_plans = forms.ModelMultipleChoiceField(
+        queryset=MealPlan.objects.none(),
+        required=False,
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+        label='Meal plans'
+    )
+    start_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        label='Meals from'
+    )
+    end_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        label='Meals until'
+    )
+    recipes = forms.ModelMultipleChoiceField(
+        queryset=Recipe.objects.none(),
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 6}),
+        label='Extra recipes'
+    )
+    servings = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'As written'}),
+        label='Servings per extra recipe'
+    )
+    shopping_list = forms.ModelChoiceField(
+        queryset=ShoppingList.objects.none(),
+        required=False,
+        empty_label='Create a new list',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Add to'
+    )
+    name = forms.CharField(
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., This week and the party'}),
+        label='New list name'
+    )
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user')
+        super().__init__(*args, **kwargs)
+        self.fields['meal_plans'].queryset = MealPlan.objects.filter(user=user).order_by('-start_date')
+        self.fields['recipes'].queryset = Recipe.active.filter(
+            Q(author=user) | Q(is_public=True)
+        ).only('title').order_by('title')
+        self.fields['shopping_list'].queryset = accessible_lists(user).order_by('-created_at')
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if bool(start_date) != bool(end_date):
+            raise forms.ValidationError('Give both ends of the date range, or neither.')
+        if start_date and end_date < start_date:
+            raise forms.ValidationError('The date range ends before it starts.')
+        if not (cleaned_data.get('meal_plans') or start_date or cleaned_data.get('recipes')):
+            raise forms.ValidationError('Choose at least one meal plan, a date range or a recipe.')
+        return cleaned_data
@@ -0,0 +1,74 @@
+"""
+Management command to assign grocery categories to existing shopping list items
+Usage: python manage.py categorize_shopping_items [--all] [--batch-size 1000] [--dry-run]
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.shopping.models import ShoppingList, ShoppingListItem, CategoryOverride
+from apps.shopping.categories import get_classifier, override_key
+from apps.shopping.realtime import ITEM_FIELDS, publish_list_event
+
+
+class Command(BaseCommand):
+    help = 'Classify shopping list items into grocery categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reclassify every item, not only those in "other"')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Items read and updated per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without saving them')
+
+    def handle(self, *args, **options):
+        classifier = get_classifier()
+        batch_size = options['batch_size']
+        items = ShoppingListItem.objects.all()
+        if not options['all']:
+            items = items.filter(category='other')
+
+        # Overrides of the list owners, loaded lazily per owner
+        overrides = {}
+        last_pk, checked, changed = 0, 0, 0
+        while True:
+            batch = list(
+                items.filter(pk__gt=last_pk).order_by('pk')
+                .only(*ITEM_FIELDS, 'shopping_list__user_id')
+                .select_related('shopping_list')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            owners = {item.shopping_list.user_id for item in batch} - set(overrides)
+            for owner_id in owners:
+                overrides[owner_id] = {}
+            for owner_id, name_key, category in CategoryOverride.objects.filter(
+                user_id__in=owners
+            ).values_list('user_id', 'name_key', 'category'):
+                overrides[owner_id][name_key] = category
+
+            categories = classifier.classify_many([item.name for item in batch])
+            updates = defaultdict(list)
+            for item, category in zip(batch, categories):
+                category = overrides[item.shopping_list.user_id].get(override_key(item.name), category)
+                if category != item.category:
+                    item.category = category
+                    updates[item.shopping_list_id].append(item)
+
+            checked += len(batch)
+            changed += sum(len(list_items) for list_items in updates.values())
+            if updates and not options['dry_run']:
+                with transaction.atomic():
+                    # One version per list so delta-sync clients pick up the new categories
+                    for list_id, list_items in updates.items():
+                        version = ShoppingList.next_version(list_id)
+                        for item in list_items:
+                            item.version = version
+                        publish_list_event(list_id, 'items_updated', list_items)
+                    ShoppingListItem.objects.bulk_update(
+                        [item for list_items in updates.values() for item in list_items], ['category', 'version']
+                    )
+
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'✓ {verb} {changed} of {checked} items'))
@@ -0,0 +1,32 @@
+"""
+Management command to load the ingredient price catalog from CSV and reprice recipes
+Usage: python manage.py load_ingredient_prices prices.csv
+       python manage.py load_ingredient_prices --reprice-only
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.shopping.pricing import import_prices_csv, update_recipe_costs
+
+
+class Command(BaseCommand):
+    help = 'Create or update ingredient prices from a CSV file (name, price, per) and recompute recipe costs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', nargs='?', help='CSV file with name, price and optional per columns')
+        parser.add_argument('--reprice-only', action='store_true', help='Only recompute recipe costs')
+
+    def handle(self, *args, **options):
+        if not options['reprice_only']:
+            if not options['csv_file']:
+                raise CommandError('Give a CSV file, or --reprice-only.')
+            try:
+                with open(options['csv_file'], 'rb') as file:
+                    created, updated, errors = import_prices_csv(file)
+            except OSError as error:
+                raise CommandError(str(error))
+            for error in errors:
+                self.stdout.write(self.style.WARNING(f'  {error}'))
+            self.stdout.write(f'Prices: {created} new, {updated} updated, {len(errors)} rows skipped')
+
+        repriced = update_recipe_costs()
+        self.stdout.write(self.style.SUCCESS(f'✓ Repriced {repriced} recipes'))
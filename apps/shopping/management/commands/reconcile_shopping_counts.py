@@ -0,0 +1,54 @@
+"""
+Management command to repair the stored item counters of shopping lists
+Usage: python manage.py reconcile_shopping_counts [--batch-size 500] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from apps.shopping.models import ShoppingList
+
+
+class Command(BaseCommand):
+    help = 'Recount items of shopping lists and fix stored counters that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Lists checked per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted lists without fixing them')
+
+    def handle(self, *args, **options):
+        last_pk, checked, fixed = 0, 0, 0
+        while True:
+            pks = list(
+                ShoppingList.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+            checked += len(pks)
+
+            with transaction.atomic():
+                # Lock first, then count in a second query: FOR UPDATE is not allowed with GROUP BY
+                locked = list(
+                    ShoppingList.objects.select_for_update().filter(pk__in=pks).values_list('pk', flat=True)
+                )
+                drifted = list(
+                    ShoppingList.objects.filter(pk__in=locked).with_actual_counts()
+                    .filter(~Q(item_count=F('actual_item_count')) | ~Q(purchased_count=F('actual_purchased_count')))
+                    .only('pk', 'name', 'item_count', 'purchased_count')
+                )
+                for shopping_list in drifted:
+                    self.stdout.write(
+                        f'  {shopping_list.name} (#{shopping_list.pk}): '
+                        f'{shopping_list.item_count}/{shopping_list.purchased_count} -> '
+                        f'{shopping_list.actual_item_count}/{shopping_list.actual_purchased_count}'
+                    )
+                    shopping_list.item_count = shopping_list.actual_item_count
+                    shopping_list.purchased_count = shopping_list.actual_purchased_count
+                if drifted and not options['dry_run']:
+                    ShoppingList.objects.bulk_update(drifted, ['item_count', 'purchased_count'])
+            fixed += len(drifted)
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'✓ {verb} {fixed} drifted of {checked} lists'))
@@ -0,0 +1,161 @@
+"""
+Batch Merging of Recipe Ingredients into Existing Shopping Lists
+
+The list's items are loaded once into a map keyed by normalized name; new
+ingredient amounts are summed numerically into matching open items, and all
+changes are written with one bulk_update and one bulk_create. Meals of several
+plans, date ranges and ad-hoc recipes can be combined into one list the same
+way, or previewed without writing anything.
+"""
+import operator
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Q
+
+from apps.mealplans.models import Meal
+from .aggregation import AggregatedIngredient, aggregate_ingredients, combined_ingredients, normalize_name
+from .categories import classify_items
+from .models import ShoppingList, ShoppingListItem
+from .pantry import PantryStock
+from .realtime import publish_list_event
+
+
+def recipe_ingredients(recipes, servings=None):
+    """Ingredient rows for recipes, scaled to servings when given, in one query"""
+    return combined_ingredients(recipes=[(recipe, servings) for recipe in recipes])
+
+
+def selected_meals(user, meal_plans=(), date_ranges=()):
+    """The user's meals in any of the plans or dated within any of the (start, end) ranges"""
+    conditions = [Q(meal_plan__in=meal_plans)] if meal_plans else []
+    conditions += [Q(date__range=date_range) for date_range in date_ranges]
+    if not conditions:
+        return Meal.objects.none()
+    return Meal.objects.filter(reduce(operator.or_, conditions), user=user)
+
+
+def link_sources(pairs):
+    """Link (item, recipe ids) pairs to their source recipes in one insert"""
+    Source = ShoppingListItem.recipes.through
+    Source.objects.bulk_create([
+        Source(shoppinglistitem_id=item.pk, recipe_id=recipe_id)
+        for item, recipe_ids in pairs
+        for recipe_id in recipe_ids
+    ], ignore_conflicts=True)
+
+
+def _plan_merge(user, shopping_list, existing, ingredients, meal_plan=None, planned=False):
+    """Split aggregated ingredients into new items and updated open items; writes nothing
+
+    Returns (created, updated, sources) where sources pairs each item with the
+    ids of the recipes it came from. With ``planned`` the ingredients are the
+    list's own meal plan, so each item also records them as its planned share.
+    """
+    items = {}
+    for item in existing:
+        # Merge into an open item when there is one; purchased items are left alone
+        key = normalize_name(item.name)
+        if key not in items or (items[key].is_purchased and not item.is_purchased):
+            items[key] = item
+    next_order = max((item.order for item in items.values()), default=-1) + 1
+
+    created, updated, new_ingredients, sources = [], [], [], []
+    for ingredient in ingredients:
+        item = items.get(normalize_name(ingredient.name))
+        if item is None or item.is_purchased:
+            new_ingredients.append(ingredient)
+            continue
+        merged = AggregatedIngredient(item.name)
+        merged.add_quantity(item.quantity)
+        merged.merge(ingredient)
+        item.quantity = merged.quantity[:50]
+        if planned:
+            share = AggregatedIngredient(item.name)
+            share.add_quantity(item.planned_quantity)
+            share.merge(ingredient)
+            item.planned_quantity = share.quantity[:50]
+            item.meal_plan = meal_plan
+        updated.append(item)
+        sources.append((item, ingredient.recipe_ids))
+
+    categories = classify_items(user, [ingredient.name for ingredient in new_ingredients])
+    for order, (ingredient, category) in enumerate(zip(new_ingredients, categories), start=next_order):
+        created.append(ShoppingListItem(
+            shopping_list=shopping_list,
+            name=ingredient.name,
+            quantity=ingredient.quantity[:50],
+            category=category,
+            order=order,
+            meal_plan=meal_plan,
+            planned_quantity=ingredient.quantity[:50] if planned else '',
+        ))
+    sources.extend(zip(created, (ingredient.recipe_ids for ingredient in new_ingredients)))
+    return created, updated, sources
+
+
+@transaction.atomic
+def merge_into_list(shopping_list, rows, meal_plan=None, stock=None, planned=False):
+    """Merge (name, amount, factor, recipe_id) rows into a list; return (created, updated) items
+
+    Pantry stock, when given, is netted out of the rows before they are merged.
+    Pass ``planned`` when the rows are exactly the list's linked meal plan.
+    """
+    created, updated, sources = _plan_merge(
+        shopping_list.user, shopping_list,
+        shopping_list.items.select_for_update().order_by('is_purchased', 'pk'),
+        aggregate_ingredients(rows, stock), meal_plan, planned
+    )
+
+    if created or updated:
+        version = ShoppingList.next_version(shopping_list.pk, items=len(created))
+        for item in created + updated:
+            item.version = version
+    if updated:
+        ShoppingListItem.objects.bulk_update(updated, ['quantity', 'planned_quantity', 'meal_plan', 'version'])
+        publish_list_event(shopping_list.pk, 'items_updated', updated)
+    if created:
+        ShoppingListItem.objects.bulk_create(created)
+        publish_list_event(shopping_list.pk, 'items_added', created)
+    link_sources(sources)
+    return created, updated
+
+
+def add_recipes_to_list(shopping_list, recipes, servings=None, stock=None):
+    """Merge the ingredients of several recipes into a shopping list, less the owner's pantry stock"""
+    if stock is None:
+        stock = PantryStock.for_user(shopping_list.user)
+    return merge_into_list(shopping_list, recipe_ingredients(list(recipes), servings), stock=stock)
+
+
+def combine_into_list(user, meals=None, recipes=(), shopping_list=None, name='', meal_plan=None, dry_run=False):
+    """Aggregate meals and (recipe, servings) pairs into one list, less the list owner's pantry
+
+    Merges into ``shopping_list`` when given, otherwise creates a list called
+    ``name``. Returns (shopping_list, created, updated, stock); with
+    ``dry_run`` nothing is written, the items are unsaved and ``shopping_list``
+    stays None when no list was given. Updated items in a preview keep their
+    current quantity in ``previous_quantity``.
+    """
+    owner = shopping_list.user if shopping_list is not None else user
+    stock = PantryStock.for_user(owner)
+    rows = combined_ingredients(meals, recipes)
+
+    if dry_run:
+        items = list(shopping_list.items.order_by('is_purchased', 'pk')) if shopping_list is not None else []
+        for item in items:
+            item.previous_quantity = item.quantity
+        created, updated, _ = _plan_merge(
+            owner, shopping_list, items, aggregate_ingredients(rows, stock), meal_plan
+        )
+        return shopping_list, created, updated, stock
+
+    with transaction.atomic():
+        if shopping_list is None:
+            shopping_list = ShoppingList.objects.create(user=user, meal_plan=meal_plan, name=name)
+        # Amounts from the list's own plan are tracked so later plan edits can be applied as a diff
+        planned = meal_plan is not None and not recipes and shopping_list.meal_plan_id == meal_plan.pk
+        created, updated = merge_into_list(
+            shopping_list, rows, meal_plan=meal_plan, stock=stock, planned=planned
+        )
+    return shopping_list, created, updated, stock
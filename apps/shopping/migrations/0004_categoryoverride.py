@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0003_shoppinglist_shared_with'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name_key', models.CharField(help_text='Normalized item name', max_length=200)),
+                ('category', models.CharField(choices=[('produce', 'Produce'), ('meat', 'Meat & Seafood'), ('dairy', 'Dairy & Eggs'), ('bakery', 'Bakery'), ('pantry', 'Pantry'), ('frozen', 'Frozen'), ('beverages', 'Beverages'), ('snacks', 'Snacks'), ('other', 'Other')], max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_overrides', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Category Override',
+                'verbose_name_plural': 'Category Overrides',
+                'unique_together': {('user', 'name_key')},
+            },
+        ),
+    ]
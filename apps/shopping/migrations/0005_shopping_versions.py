@@ -0,0 +1,50 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0004_categoryoverride'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItemTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.PositiveBigIntegerField()),
+                ('version', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Shopping List Item Tombstone',
+                'verbose_name_plural': 'Shopping List Item Tombstones',
+            },
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglistitem',
+            index=models.Index(fields=['shopping_list', 'version'], name='shopping_sh_shoppin_2226f4_idx'),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitemtombstone',
+            name='shopping_list',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='shopping.shoppinglist'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglistitemtombstone',
+            index=models.Index(fields=['shopping_list', 'version'], name='shopping_sh_shoppin_b0f50d_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:19
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    ShoppingList = apps.get_model('shopping', 'ShoppingList')
+    ShoppingListItem = apps.get_model('shopping', 'ShoppingListItem')
+
+    def count(condition=Q()):
+        counts = ShoppingListItem.objects.filter(
+            condition, shopping_list=OuterRef('pk')
+        ).order_by().values('shopping_list').annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    ShoppingList.objects.update(item_count=count(), purchased_count=count(Q(is_purchased=True)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0005_shopping_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='purchased_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def notes_to_sources(apps, schema_editor):
+    """Link items whose notes read "From <recipe titles>" to those recipes"""
+    ShoppingListItem = apps.get_model('shopping', 'ShoppingListItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Source = ShoppingListItem.recipes.through
+
+    items = list(
+        ShoppingListItem.objects.filter(notes__startswith='From ')
+        .values_list('pk', 'notes', 'shopping_list__user_id')
+    )
+    titles = {}
+    for pk, notes, user_id in items:
+        label = notes[len('From '):].strip()
+        titles[pk] = [label] + [title.strip() for title in label.split(', ')]
+    recipes = {}
+    # Prefer the list owner's own recipe when several share a title
+    for recipe_id, title, author_id in Recipe.objects.filter(
+        title__in={title for names in titles.values() for title in names}
+    ).order_by('-pk').values_list('pk', 'title', 'author_id'):
+        recipes.setdefault(title, {})[author_id] = recipe_id
+
+    sources, cleared = [], []
+    for pk, notes, user_id in items:
+        label, *parts = titles[pk]
+        names = [label] if label in recipes else parts
+        recipe_ids = set()
+        for name in names:
+            by_author = recipes.get(name)
+            if by_author:
+                recipe_ids.add(by_author.get(user_id, min(by_author.values())))
+        if recipe_ids and len(recipe_ids) == len(names):
+            sources.extend(Source(shoppinglistitem_id=pk, recipe_id=recipe_id) for recipe_id in recipe_ids)
+            cleared.append(pk)
+    Source.objects.bulk_create(sources, ignore_conflicts=True)
+    ShoppingListItem.objects.filter(pk__in=cleared).update(notes='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplans', '0007_meal_user_not_null'),
+        ('recipes', '0005_review_reply_delete_comment'),
+        ('shopping', '0006_shoppinglist_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='meal_plan',
+            field=models.ForeignKey(blank=True, help_text='Meal plan this item was generated from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shopping_list_items', to='mealplans.mealplan'),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='recipes',
+            field=models.ManyToManyField(blank=True, related_name='shopping_list_items', to='recipes.recipe'),
+        ),
+        migrations.RunPython(notes_to_sources, migrations.RunPython.noop),
+    ]
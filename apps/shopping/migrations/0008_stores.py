@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0007_item_sources'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Store',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Store',
+                'verbose_name_plural': 'Stores',
+                'ordering': ['name'],
+                'unique_together': {('user', 'name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='store',
+            field=models.ForeignKey(blank=True, help_text="Optional: Walk the list in this store's aisle order", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shopping_lists', to='shopping.store'),
+        ),
+        migrations.CreateModel(
+            name='StoreAisle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('produce', 'Produce'), ('meat', 'Meat & Seafood'), ('dairy', 'Dairy & Eggs'), ('bakery', 'Bakery'), ('pantry', 'Pantry'), ('frozen', 'Frozen'), ('beverages', 'Beverages'), ('snacks', 'Snacks'), ('other', 'Other')], max_length=20)),
+                ('name', models.CharField(blank=True, help_text='e.g., Aisle 4', max_length=100)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aisles', to='shopping.store')),
+            ],
+            options={
+                'verbose_name': 'Store Aisle',
+                'verbose_name_plural': 'Store Aisles',
+                'ordering': ['position'],
+                'unique_together': {('store', 'category')},
+            },
+        ),
+    ]
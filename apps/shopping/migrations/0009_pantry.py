@@ -0,0 +1,49 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0008_stores'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pantry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pantry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pantry',
+                'verbose_name_plural': 'Pantries',
+            },
+        ),
+        migrations.CreateModel(
+            name='PantryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('name_key', models.CharField(editable=False, help_text='Normalized item name', max_length=200)),
+                ('quantity', models.CharField(blank=True, help_text='e.g., 500g, 2 cans; leave blank for staples', max_length=50)),
+                ('amount', models.FloatField(blank=True, editable=False, null=True)),
+                ('dimension', models.CharField(blank=True, editable=False, max_length=20)),
+                ('expires_on', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pantry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='shopping.pantry')),
+            ],
+            options={
+                'verbose_name': 'Pantry Item',
+                'verbose_name_plural': 'Pantry Items',
+                'ordering': ['name'],
+                'unique_together': {('pantry', 'name_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_memberships(apps, schema_editor):
+    """One owner membership per list plus one member row per user it was shared with"""
+    ShoppingList = apps.get_model('shopping', 'ShoppingList')
+    ShoppingListMember = apps.get_model('shopping', 'ShoppingListMember')
+    Shared = ShoppingList.shared_with.through
+
+    owners = ShoppingList.objects.values_list('pk', 'user_id')
+    ShoppingListMember.objects.bulk_create(
+        [ShoppingListMember(shopping_list_id=pk, user_id=user_id, role='owner') for pk, user_id in owners],
+        batch_size=1000,
+    )
+    shared = Shared.objects.exclude(user_id=models.F('shoppinglist__user_id')).values_list('shoppinglist_id', 'user_id')
+    ShoppingListMember.objects.bulk_create(
+        [ShoppingListMember(shopping_list_id=pk, user_id=user_id, role='member') for pk, user_id in shared],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0009_pantry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('owner', 'Owner'), ('member', 'Member')], default='member', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('shopping_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='shopping.shoppinglist')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Shopping List Member',
+                'verbose_name_plural': 'Shopping List Members',
+                'ordering': ['created_at'],
+                'unique_together': {('user', 'shopping_list')},
+            },
+        ),
+        migrations.RunPython(copy_memberships, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='shoppinglist',
+            name='shared_with',
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='members',
+            field=models.ManyToManyField(blank=True, related_name='member_shopping_lists', through='shopping.ShoppingListMember', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
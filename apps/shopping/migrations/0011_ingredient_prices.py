@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0010_list_members'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('name_key', models.CharField(editable=False, help_text='Normalized ingredient name', max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('per', models.CharField(default='1', help_text='Amount the price buys, e.g. 1 kg, 500g, 1 can, 1', max_length=50)),
+                ('dimension', models.CharField(editable=False, max_length=20)),
+                ('unit_price', models.FloatField(editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Ingredient Price',
+                'verbose_name_plural': 'Ingredient Prices',
+                'ordering': ['name'],
+                'unique_together': {('name_key', 'dimension')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+def mark_planned_quantities(apps, schema_editor):
+    """Treat items generated from their list's own meal plan as wholly planned"""
+    ShoppingListItem = apps.get_model('shopping', 'ShoppingListItem')
+    ShoppingListItem.objects.filter(
+        meal_plan__isnull=False, meal_plan=models.F('shopping_list__meal_plan')
+    ).update(planned_quantity=models.F('quantity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0011_ingredient_prices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='planned_quantity',
+            field=models.CharField(blank=True, editable=False, help_text="Part of the quantity that comes from the list's meal plan", max_length=50),
+        ),
+        migrations.RunPython(mark_planned_quantities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+
+from apps.shopping.aggregation import accounted_parts, aggregate_ingredients, normalize_name
+
+
+def plan_totals(apps, meal_plan_id):
+    """The plan's ingredients scaled by each meal's servings, keyed by normalized name"""
+    Meal = apps.get_model('mealplans', 'Meal')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    factors = {}
+    for recipe_id, meal_servings, recipe_servings in Meal.objects.filter(meal_plan_id=meal_plan_id).values_list(
+        'recipe_id', 'servings', 'recipe__servings'
+    ):
+        factors[recipe_id] = factors.get(recipe_id, 0) + meal_servings / (recipe_servings or meal_servings or 1)
+    rows = [
+        (name, amount, factors[recipe_id], recipe_id)
+        for recipe_id, name, amount in Ingredient.objects.filter(recipe_id__in=factors).values_list(
+            'recipe_id', 'name', 'amount'
+        )
+    ]
+    return {normalize_name(ingredient.name): ingredient for ingredient in aggregate_ingredients(rows)}
+
+
+def adopt_legacy_plan_lists(apps, schema_editor):
+    """Mark as planned only the part of each item on older plan lists that the plan accounts for
+
+    Lists generated before items recorded their planned share have nothing
+    marked, or, where 0012 found their items linked to the plan, every
+    linked item marked as wholly planned, amounts added by hand included.
+    Lists with a planned share that differs from its item's quantity were
+    already kept in step with plan edits and are left alone.
+    """
+    ShoppingList = apps.get_model('shopping', 'ShoppingList')
+    ShoppingListItem = apps.get_model('shopping', 'ShoppingListItem')
+    tracked = ShoppingListItem.objects.exclude(planned_quantity='').exclude(
+        planned_quantity=models.F('quantity')
+    ).values('shopping_list_id')
+    totals = {}
+    for list_id, meal_plan_id in ShoppingList.objects.filter(
+        meal_plan__isnull=False, is_completed=False
+    ).exclude(pk__in=tracked).values_list('pk', 'meal_plan_id'):
+        if meal_plan_id not in totals:
+            totals[meal_plan_id] = plan_totals(apps, meal_plan_id)
+        by_key = defaultdict(list)
+        for item in ShoppingListItem.objects.filter(shopping_list_id=list_id).order_by('pk'):
+            by_key[normalize_name(item.name)].append(item)
+
+        items = []
+        for key, key_items in by_key.items():
+            ingredient = totals[meal_plan_id].get(key)
+            parts = accounted_parts(ingredient, [item.quantity for item in key_items]) if ingredient else None
+            for item, part in zip(key_items, parts or [''] * len(key_items)):
+                item.planned_quantity = part
+                item.meal_plan_id = meal_plan_id if part else None
+                items.append(item)
+        ShoppingListItem.objects.bulk_update(items, ['planned_quantity', 'meal_plan'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplans', '0007_meal_user_not_null'),
+        ('recipes', '0007_recipe_deleted_at'),
+        ('shopping', '0012_item_planned_quantity'),
+    ]
+
+    operations = [
+        migrations.RunPython(adopt_legacy_plan_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0013_adopt_legacy_plan_lists'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='restocked',
+            field=models.BooleanField(default=False, editable=False, help_text="Checked off into the list owner's pantry, which then covers it"),
+        ),
+    ]
@@ -1,9 +1,24 @@
 """
 Shopping List Models for MealMate
 """
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
 from django.conf import settings
 
+from .aggregation import AggregatedIngredient, DIMENSION_ORDER, normalize_name, parse_amount
+
+
+class ShoppingListQuerySet(models.QuerySet):
+    """QuerySet helpers for shopping lists"""
+    
+    def with_actual_counts(self):
+        """Annotate counts recomputed from the items, to check the stored counters"""
+        return self.annotate(
+            actual_item_count=Count('items'),
+            actual_purchased_count=Count('items', filter=Q(items__is_purchased=True)),
+        )
+
 
 class ShoppingList(models.Model):
     """Shopping list for a user"""
@@ -24,21 +39,40 @@ class ShoppingList(models.Model):
     name = models.CharField(max_length=200)
     notes = models.TextField(blank=True)
     
-    # Sharing
-    shared_with = models.ManyToManyField(
+    # Access: the owner and the users the list is shared with, one membership each
+    members = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
-        related_name='shared_shopping_lists',
-        blank=True,
-        help_text="Users this shopping list is shared with"
+        through='ShoppingListMember',
+        related_name='member_shopping_lists',
+        blank=True
     )
     
     # Status
     is_completed = models.BooleanField(default=False)
     
+    # Store whose aisle order the list is shown in
+    store = models.ForeignKey(
+        'Store',
+        on_delete=models.SET_NULL,
+        related_name='shopping_lists',
+        null=True,
+        blank=True,
+        help_text="Optional: Walk the list in this store's aisle order"
+    )
+    
+    # Incremented on every item change so clients can fetch only what changed
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    
+    # Progress counters kept in step with every item write
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    purchased_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ShoppingListQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Shopping List'
@@ -47,22 +81,125 @@ class ShoppingList(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_user_id = instance.__dict__.get('user_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        owner_changed = not adding and getattr(self, '_saved_user_id', None) != self.user_id and (
+            update_fields is None or 'user' in update_fields
+        )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                ShoppingListMember.objects.create(
+                    shopping_list=self, user_id=self.user_id, role=ShoppingListMember.OWNER
+                )
+            elif owner_changed:
+                # Reassigned: the new user takes over the owner membership, even if already a member
+                ShoppingListMember.objects.filter(
+                    shopping_list=self, role=ShoppingListMember.OWNER
+                ).exclude(user_id=self.user_id).delete()
+                ShoppingListMember.objects.update_or_create(
+                    shopping_list=self, user_id=self.user_id, defaults={'role': ShoppingListMember.OWNER}
+                )
+        self._saved_user_id = self.user_id
+    
+    @property
+    def shared_members(self):
+        """Users the list is shared with; uses prefetched memberships when present"""
+        return [
+            membership.user for membership in self.memberships.all()
+            if membership.role == ShoppingListMember.MEMBER
+        ]
+    
+    @classmethod
+    def next_version(cls, pk, items=0, purchased=0):
+        """Increment and return a list's change version, applying item counter deltas
+        
+        Call inside a transaction; the update locks the list row until commit.
+        """
+        cls.objects.filter(pk=pk).update(
+            version=F('version') + 1,
+            item_count=F('item_count') + items,
+            purchased_count=F('purchased_count') + purchased,
+        )
+        return cls.objects.filter(pk=pk).values_list('version', flat=True).get()
+    
     @property
     def total_items(self):
         """Return total number of items"""
-        return self.items.count()
+        return self.item_count
     
     @property
     def completed_items(self):
         """Return number of completed items"""
-        return self.items.filter(is_purchased=True).count()
+        return self.purchased_count
     
     @property
     def completion_percentage(self):
         """Calculate completion percentage"""
-        if self.total_items == 0:
+        if self.item_count == 0:
             return 0
-        return int((self.completed_items / self.total_items) * 100)
+        return int((self.purchased_count / self.item_count) * 100)
+
+
+class ShoppingListMember(models.Model):
+    """A user's access to a shopping list"""
+    
+    OWNER = 'owner'
+    MEMBER = 'member'
+    ROLE_CHOICES = [
+        (OWNER, 'Owner'),
+        (MEMBER, 'Member'),
+    ]
+    
+    shopping_list = models.ForeignKey(
+        ShoppingList,
+        on_delete=models.CASCADE,
+        related_name='memberships'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_memberships'
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=MEMBER)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Shopping List Member'
+        verbose_name_plural = 'Shopping List Members'
+        # Leads with user: "lists I can access" is an index range scan
+        unique_together = ['user', 'shopping_list']
+    
+    def __str__(self):
+        return f"{self.user} ({self.get_role_display()}) on {self.shopping_list}"
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """QuerySet helpers for shopping list items"""
+    
+    def in_category_order(self):
+        """Order items by category in the order categories are declared, open items first"""
+        rank = Case(*[
+            When(category=category, then=Value(position))
+            for position, (category, label) in enumerate(ShoppingListItem.CATEGORY_CHOICES)
+        ])
+        return self.annotate(category_rank=rank).order_by('category_rank', 'is_purchased', 'order', 'name')
+    
+    def in_store_order(self, store):
+        """Order items along a store's route; categories the store has no aisle for come last"""
+        aisles = StoreAisle.objects.filter(store=store, category=OuterRef('category'))
+        return self.annotate(
+            aisle_position=Subquery(aisles.values('position')[:1]),
+            aisle_name=Subquery(aisles.values('name')[:1]),
+        ).order_by(F('aisle_position').asc(nulls_last=True), 'category', 'is_purchased', 'order', 'name')
 
 
 class ShoppingListItem(models.Model):
@@ -109,12 +246,297 @@ class ShoppingListItem(models.Model):
     # Order
     order = models.PositiveIntegerField(default=0)
     
+    # Source: the recipes whose ingredients were merged into this item
+    recipes = models.ManyToManyField(
+        'recipes.Recipe',
+        related_name='shopping_list_items',
+        blank=True
+    )
+    meal_plan = models.ForeignKey(
+        'mealplans.MealPlan',
+        on_delete=models.SET_NULL,
+        related_name='shopping_list_items',
+        null=True,
+        blank=True,
+        help_text="Meal plan this item was generated from"
+    )
+    planned_quantity = models.CharField(
+        max_length=50,
+        blank=True,
+        editable=False,
+        help_text="Part of the quantity that comes from the list's meal plan"
+    )
+    restocked = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Checked off into the list owner's pantry, which then covers it"
+    )
+    
+    # List version of the last change to this item
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = ShoppingListItemQuerySet.as_manager()
+    
     class Meta:
         ordering = ['is_purchased', 'category', 'order', 'name']
         verbose_name = 'Shopping List Item'
         verbose_name_plural = 'Shopping List Items'
+        indexes = [
+            models.Index(fields=['shopping_list', 'version']),
+        ]
     
     def __str__(self):
         return f"{self.quantity} {self.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_state = (instance.__dict__.get('shopping_list_id'), instance.__dict__.get('is_purchased'))
+        return instance
+    
+    def _previous_state(self):
+        """(list id, is_purchased) as last saved, or None for a new item"""
+        if self._state.adding:
+            return None
+        list_id, purchased = getattr(self, '_saved_state', (None, None))
+        if list_id is None or purchased is None:
+            list_id, purchased = ShoppingListItem.objects.filter(pk=self.pk).values_list(
+                'shopping_list_id', 'is_purchased'
+            ).get()
+        return list_id, purchased
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._previous_state()
+            if previous is None:
+                items, purchased = 1, int(self.is_purchased)
+            elif previous[0] != self.shopping_list_id:
+                # Moved between lists: the old list sees a delete
+                ShoppingListItemTombstone.objects.create(
+                    shopping_list_id=previous[0],
+                    item_id=self.pk,
+                    version=ShoppingList.next_version(previous[0], items=-1, purchased=-int(previous[1]))
+                )
+                items, purchased = 1, int(self.is_purchased)
+            else:
+                items, purchased = 0, int(self.is_purchased) - int(previous[1])
+            self.version = ShoppingList.next_version(self.shopping_list_id, items=items, purchased=purchased)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+            super().save(*args, **kwargs)
+            self._saved_state = (self.shopping_list_id, self.is_purchased)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            list_id, purchased = self._previous_state()
+            ShoppingListItemTombstone.objects.create(
+                shopping_list_id=list_id,
+                item_id=self.pk,
+                version=ShoppingList.next_version(list_id, items=-1, purchased=-int(purchased))
+            )
+            return super().delete(*args, **kwargs)
+
+
+class ShoppingListItemTombstone(models.Model):
+    """Record of a deleted item, so offline clients can drop it when syncing"""
+    shopping_list = models.ForeignKey(
+        ShoppingList,
+        on_delete=models.CASCADE,
+        related_name='tombstones'
+    )
+    item_id = models.PositiveBigIntegerField()
+    version = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Shopping List Item Tombstone'
+        verbose_name_plural = 'Shopping List Item Tombstones'
+        indexes = [
+            models.Index(fields=['shopping_list', 'version']),
+        ]
+    
+    def __str__(self):
+        return f"Item {self.item_id} deleted at version {self.version}"
+
+
+class CategoryOverride(models.Model):
+    """Grocery category a user has chosen for an item name"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='category_overrides'
+    )
+    name_key = models.CharField(max_length=200, help_text="Normalized item name")
+    category = models.CharField(max_length=20, choices=ShoppingListItem.CATEGORY_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Category Override'
+        verbose_name_plural = 'Category Overrides'
+        unique_together = ['user', 'name_key']
+    
+    def __str__(self):
+        return f"{self.name_key} -> {self.category}"
+
+
+class Store(models.Model):
+    """A user's store, with the order its aisles are walked in"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='stores'
+    )
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Store'
+        verbose_name_plural = 'Stores'
+        unique_together = ['user', 'name']
+    
+    def __str__(self):
+        return self.name
+    
+    def add_default_aisles(self):
+        """Give the store one aisle per grocery category, in the default order"""
+        StoreAisle.objects.bulk_create([
+            StoreAisle(store=self, category=category, position=position)
+            for position, (category, label) in enumerate(ShoppingListItem.CATEGORY_CHOICES)
+        ])
+
+
+class StoreAisle(models.Model):
+    """Position of a grocery category on a store's route"""
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='aisles'
+    )
+    category = models.CharField(max_length=20, choices=ShoppingListItem.CATEGORY_CHOICES)
+    name = models.CharField(max_length=100, blank=True, help_text="e.g., Aisle 4")
+    position = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position']
+        verbose_name = 'Store Aisle'
+        verbose_name_plural = 'Store Aisles'
+        unique_together = ['store', 'category']
+    
+    def __str__(self):
+        return f"{self.store}: {self.name or self.get_category_display()}"
+
+
+class Pantry(models.Model):
+    """A user's stock of ingredients at home"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='pantry'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Pantry'
+        verbose_name_plural = 'Pantries'
+    
+    def __str__(self):
+        return f"{self.user}'s pantry"
+
+
+class PantryItem(models.Model):
+    """An ingredient in a pantry, with its amount parsed for netting against lists"""
+    pantry = models.ForeignKey(
+        Pantry,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    name = models.CharField(max_length=200)
+    name_key = models.CharField(max_length=200, editable=False, help_text="Normalized item name")
+    quantity = models.CharField(max_length=50, blank=True, help_text="e.g., 500g, 2 cans; leave blank for staples")
+    
+    # Parsed from quantity: amount in the dimension's base unit; no amount means always in stock
+    amount = models.FloatField(null=True, blank=True, editable=False)
+    dimension = models.CharField(max_length=20, blank=True, editable=False)
+    
+    expires_on = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Pantry Item'
+        verbose_name_plural = 'Pantry Items'
+        unique_together = ['pantry', 'name_key']
+    
+    def __str__(self):
+        return f"{self.quantity} {self.name}".strip()
+    
+    def set_quantity(self, quantity):
+        """Store a quantity and its parsed amount; mixed units keep the first one"""
+        parsed = AggregatedIngredient(self.name)
+        parsed.add_quantity(quantity)
+        text = parsed.quantity if parsed.totals else (quantity or '').strip()
+        # Drop whole trailing parts rather than cutting one in half
+        while len(text) > 50 and ' + ' in text:
+            text = text.rsplit(' + ', 1)[0]
+        self.quantity = text[:50]
+        dimension = min(parsed.totals, key=DIMENSION_ORDER.get, default='')
+        self.dimension = dimension
+        self.amount = parsed.totals[dimension] if dimension else None
+    
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_name(self.name)
+        self.set_quantity(self.quantity)
+        super().save(*args, **kwargs)
+
+
+class IngredientPrice(models.Model):
+    """Price of an ingredient in the local price catalog, per amount bought"""
+    name = models.CharField(max_length=200)
+    name_key = models.CharField(max_length=200, editable=False, help_text="Normalized ingredient name")
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    per = models.CharField(max_length=50, default='1', help_text="Amount the price buys, e.g. 1 kg, 500g, 1 can, 1")
+    
+    # Parsed from per: price of one base unit (gram, millilitre or piece) of the dimension
+    dimension = models.CharField(max_length=20, editable=False)
+    unit_price = models.FloatField(editable=False)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Ingredient Price'
+        verbose_name_plural = 'Ingredient Prices'
+        # One price per ingredient and kind of amount, e.g. flour by weight and eggs by the piece
+        unique_together = ['name_key', 'dimension']
+    
+    def __str__(self):
+        return f"{self.name}: {self.price} per {self.per}"
+    
+    def set_per(self, per):
+        """Store the amount a price buys and the resulting price per base unit"""
+        quantity = parse_amount(per)
+        if quantity is None or quantity.value <= 0:
+            raise ValueError(f'Cannot read an amount from "{per}".')
+        self.per = per.strip()
+        self.dimension = quantity.dimension
+        self.unit_price = float(self.price) / quantity.value
+    
+    def clean(self):
+        try:
+            self.set_per(self.per)
+        except (TypeError, ValueError) as error:
+            raise ValidationError({'per': str(error)})
+        self.name_key = normalize_name(self.name)
+        duplicates = IngredientPrice.objects.filter(name_key=self.name_key, dimension=self.dimension)
+        if duplicates.exclude(pk=self.pk).exists():
+            raise ValidationError('This ingredient already has a price for this kind of amount.')
+    
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_name(self.name)
+        self.set_per(self.per)
+        super().save(*args, **kwargs)
@@ -0,0 +1,95 @@
+"""
+Pantry Stock for Shopping List Generation
+
+A user's unexpired pantry is loaded once per generation into a map keyed by
+normalized ingredient name, and netted out of the aggregated totals in the
+same pass that sums them. Items checked off a list can be added back to the
+pantry with one bulk_update and one bulk_create.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .aggregation import AggregatedIngredient, normalize_name
+from .models import Pantry, PantryItem, ShoppingListItem
+
+
+class PantryStock:
+    """Normalized name -> (dimension, base amount) of what a pantry holds"""
+
+    def __init__(self, items=()):
+        self.stock = {key: (dimension, amount) for key, dimension, amount in items}
+        self.netted = []
+
+    @classmethod
+    def for_user(cls, user):
+        """Unexpired stock of the user's pantry, in one query"""
+        return cls(
+            PantryItem.objects.filter(pantry__user=user)
+            .exclude(expires_on__lt=timezone.localdate())
+            .values_list('name_key', 'dimension', 'amount')
+        )
+
+    def net(self, key, ingredient):
+        """Subtract stock from an aggregated ingredient; return True when nothing is left to buy"""
+        if key not in self.stock:
+            return False
+        dimension, amount = self.stock[key]
+        # Amounts such as "to taste" are covered by having any at all
+        changed = bool(ingredient.unparsed)
+        ingredient.unparsed = []
+        if amount is None:
+            changed = changed or bool(ingredient.totals)
+            ingredient.totals.clear()
+            ingredient.units.clear()
+        elif dimension in ingredient.totals:
+            ingredient.subtract(dimension, amount)
+            changed = True
+        if changed:
+            self.netted.append(ingredient.name)
+        return not ingredient.totals
+
+
+@transaction.atomic
+def restock_pantry(user, items):
+    """Add the quantities of shopping list items to the user's pantry; return (created, updated)
+
+    Items on the user's own lists are marked as restocked, so plan refreshes
+    count them through the pantry rather than a second time as bought.
+    """
+    pantry, _ = Pantry.objects.get_or_create(user=user)
+    ShoppingListItem.objects.filter(pk__in=[item.pk for item in items], shopping_list__user=user).update(
+        restocked=True
+    )
+    bought = {}
+    for item in items:
+        key = normalize_name(item.name)
+        if key not in bought:
+            bought[key] = AggregatedIngredient(item.name.strip())
+        bought[key].add_quantity(item.quantity)
+
+    existing = {
+        pantry_item.name_key: pantry_item
+        for pantry_item in pantry.items.select_for_update().filter(name_key__in=bought)
+    }
+    created, updated = [], []
+    now = timezone.now()
+    for key, ingredient in bought.items():
+        pantry_item = existing.get(key)
+        if pantry_item is None:
+            pantry_item = PantryItem(pantry=pantry, name=ingredient.name, name_key=key)
+            pantry_item.set_quantity(ingredient.quantity)
+            created.append(pantry_item)
+            continue
+        if pantry_item.amount is None and not pantry_item.quantity:
+            # Staples are kept without an amount
+            continue
+        ingredient.add_quantity(pantry_item.quantity)
+        pantry_item.set_quantity(ingredient.quantity)
+        pantry_item.updated_at = now
+        updated.append(pantry_item)
+
+    if updated:
+        PantryItem.objects.bulk_update(updated, ['quantity', 'amount', 'dimension', 'updated_at'])
+    if created:
+        PantryItem.objects.bulk_create(created)
+    return created, updated
@@ -0,0 +1,216 @@
+"""
+Cost Estimates from the Local Price Catalog
+
+Each catalog entry stores its price per base unit (gram, millilitre or
+piece) of one dimension, so an ingredient's parsed totals are priced with one
+multiplication per dimension. A list, plan or batch of recipes loads the
+prices it needs in one query and is priced in a single pass over its
+ingredients. List and plan estimates are cached under the list version or
+the plan's export version together with the catalog version, so they are
+only recomputed after an edit.
+"""
+import csv
+import io
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from apps.mealplans.exports import export_version
+from apps.recipes.models import Ingredient, Recipe
+from .aggregation import AggregatedIngredient, aggregate_ingredients, meal_plan_ingredients, normalize_name
+from .models import IngredientPrice
+
+
+CATALOG_VERSION_KEY = 'shopping-price-catalog-version'
+
+# Seconds an estimate stays cached; any edit or price change uses a new key
+COST_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPE_BATCH_SIZE = 1000
+
+
+def price_catalog_version():
+    """Version of the price catalog, read from cache after the first call"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        summary = IngredientPrice.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        updated = summary['updated'].timestamp() if summary['updated'] else 0
+        version = f"{summary['count']}-{updated:.6f}"
+        cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def catalog_changed():
+    """Drop the cached catalog version so every estimate is recomputed"""
+    cache.delete(CATALOG_VERSION_KEY)
+
+
+def load_prices(name_keys):
+    """Map of name key -> {dimension: price per base unit} for the given keys, in one query"""
+    prices = defaultdict(dict)
+    for name_key, dimension, unit_price in IngredientPrice.objects.filter(
+        name_key__in=set(name_keys)
+    ).values_list('name_key', 'dimension', 'unit_price'):
+        prices[name_key][dimension] = unit_price
+    return prices
+
+
+def estimate_cost(ingredients, prices=None):
+    """Price AggregatedIngredients in one pass; return (total, priced count, unpriced count)
+
+    An ingredient counts as priced when the catalog has a price for at least
+    one of its dimensions; amounts in other dimensions add nothing.
+    """
+    keyed = [(normalize_name(ingredient.name), ingredient) for ingredient in ingredients]
+    if prices is None:
+        prices = load_prices(key for key, _ in keyed)
+    total, priced = 0.0, 0
+    for key, ingredient in keyed:
+        unit_prices = prices.get(key)
+        costs = [
+            value * unit_prices[dimension]
+            for dimension, value in ingredient.totals.items()
+            if unit_prices and dimension in unit_prices
+        ]
+        if costs:
+            total += sum(costs)
+            priced += 1
+    return total, priced, len(keyed) - priced
+
+
+def _cost_summary(total, priced, unpriced):
+    return {'total': round(total, 2), 'priced_items': priced, 'unpriced_items': unpriced}
+
+
+def list_cost(shopping_list, items=None):
+    """Estimated cost of a shopping list's items, cached per list version
+
+    Pass ``items`` to price prefetched items instead of querying them.
+    """
+    key = f'shopping-cost:list:{shopping_list.pk}:{shopping_list.version}:{price_catalog_version()}'
+    summary = cache.get(key)
+    if summary is None:
+        if items is None:
+            items = shopping_list.items.only('name', 'quantity')
+        ingredients = []
+        for item in items:
+            ingredient = AggregatedIngredient(item.name)
+            ingredient.add_quantity(item.quantity)
+            ingredients.append(ingredient)
+        summary = _cost_summary(*estimate_cost(ingredients))
+        cache.set(key, summary, COST_CACHE_TIMEOUT)
+    return summary
+
+
+def plan_cost(meal_plan):
+    """Estimated cost of every meal in a plan at its planned servings, cached per plan version"""
+    etag, _ = export_version(meal_plan.meals.all())
+    key = f'shopping-cost:plan:{meal_plan.pk}:{etag}:{price_catalog_version()}'
+    summary = cache.get(key)
+    if summary is None:
+        summary = _cost_summary(*estimate_cost(aggregate_ingredients(meal_plan_ingredients(meal_plan))))
+        cache.set(key, summary, COST_CACHE_TIMEOUT)
+    return summary
+
+
+def update_recipe_costs(recipe_ids=None, batch_size=RECIPE_BATCH_SIZE):
+    """Recompute Recipe.cost_per_serving in batches; return how many recipes changed
+
+    Each batch reads its recipes, their ingredients and the prices they need
+    in three queries and writes only the costs that changed.
+    """
+    recipes = Recipe.active.order_by('pk')
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+
+    changed_count, last_pk = 0, 0
+    while True:
+        batch = list(
+            recipes.filter(pk__gt=last_pk).values_list('pk', 'servings', 'cost_per_serving')[:batch_size]
+        )
+        if not batch:
+            return changed_count
+        last_pk = batch[-1][0]
+
+        servings = {pk: recipe_servings or 1 for pk, recipe_servings, _ in batch}
+        rows = defaultdict(list)
+        for recipe_id, name, amount in Ingredient.objects.filter(recipe_id__in=servings).values_list(
+            'recipe_id', 'name', 'amount'
+        ):
+            rows[recipe_id].append((name, amount, 1 / servings[recipe_id], recipe_id))
+        ingredients = {recipe_id: aggregate_ingredients(recipe_rows) for recipe_id, recipe_rows in rows.items()}
+        prices = load_prices(
+            normalize_name(ingredient.name) for recipe_ingredients in ingredients.values()
+            for ingredient in recipe_ingredients
+        )
+
+        changed = []
+        for pk, _, current in batch:
+            cost = None
+            if pk in ingredients:
+                total, priced, _ = estimate_cost(ingredients[pk], prices)
+                if priced:
+                    cost = Decimal(f'{total:.2f}')
+            if cost != current:
+                changed.append(Recipe(pk=pk, cost_per_serving=cost))
+        Recipe.objects.bulk_update(changed, ['cost_per_serving'])
+        changed_count += len(changed)
+
+
+@transaction.atomic
+def import_prices_csv(file):
+    """Create or update catalog prices from CSV with name, price and optional per columns
+
+    Returns (created, updated, errors) where errors lists "line N: reason"
+    strings for rows that were skipped. Rows match existing prices by
+    normalized name and kind of amount.
+    """
+    text = file.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None or not {'name', 'price'} <= {name.strip().lower() for name in reader.fieldnames}:
+        return 0, 0, ['The file needs a header row with "name" and "price" columns.']
+
+    entries, errors = {}, []
+    for line, row in enumerate(reader, start=2):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if isinstance(key, str)}
+        try:
+            price = Decimal(row['price'].lstrip('$€£'))
+        except InvalidOperation:
+            errors.append(f'line {line}: "{row["price"]}" is not a price.')
+            continue
+        if not row['name'] or not price.is_finite() or not 0 <= price < 1000000:
+            errors.append(f'line {line}: a name and a price from 0 to 999999.99 are required.')
+            continue
+        entry = IngredientPrice(name=row['name'][:200], price=price, per=(row.get('per') or '1')[:50])
+        try:
+            entry.set_per(entry.per)
+        except ValueError as error:
+            errors.append(f'line {line}: {error}')
+            continue
+        entry.name_key = normalize_name(entry.name)
+        # A later row for the same ingredient and kind of amount wins
+        entries[entry.name_key, entry.dimension] = entry
+
+    existing = {
+        (price.name_key, price.dimension): price
+        for price in IngredientPrice.objects.filter(name_key__in={key for key, _ in entries})
+    }
+    created, updated, now = [], [], timezone.now()
+    for key, entry in entries.items():
+        if key in existing:
+            price = existing[key]
+            price.name, price.price, price.per, price.unit_price = entry.name, entry.price, entry.per, entry.unit_price
+            price.updated_at = now
+            updated.append(price)
+        else:
+            created.append(entry)
+    IngredientPrice.objects.bulk_create(created)
+    IngredientPrice.objects.bulk_update(updated, ['name', 'price', 'per', 'unit_price', 'updated_at'])
+    transaction.on_commit(catalog_changed)
+    return len(created), len(updated), errors
@@ -0,0 +1,151 @@
+"""
+Real-Time Shopping List Events
+
+Item changes are published once per event to a pub/sub backend as a JSON
+string; every open event stream of that list receives the same string, so
+fan-out costs no database work per subscriber. The backend is chosen with the
+SHOPPING_REALTIME_BACKEND setting:
+
+- ``apps.shopping.realtime.LocalPubSub`` (default) keeps subscribers in
+  process memory, for development, tests and single-process servers.
+- ``apps.shopping.realtime.RedisPubSub`` relays through Redis channels so
+  every worker process sees every event; it needs the ``redis`` package.
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+# Events buffered per subscriber before it is told to resync instead
+SUBSCRIBER_BUFFER = 100
+
+ITEM_FIELDS = ('id', 'name', 'quantity', 'category', 'is_purchased', 'is_priority', 'notes', 'order')
+
+
+def list_channel(shopping_list_id):
+    return f'shopping-list:{shopping_list_id}'
+
+
+class LocalSubscription:
+    """Queue of messages for one subscriber of the local backend"""
+
+    def __init__(self, backend, channel):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+
+    def offer(self, message):
+        """Called on the subscriber's loop; a full buffer is replaced by a resync marker"""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = json.dumps({'type': 'resync'})
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Next message, or None when nothing arrives within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.backend.unsubscribe(self)
+
+
+class LocalPubSub:
+    """In-process pub/sub; publishing is thread-safe and never blocks"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.offer, message)
+
+    async def subscribe(self, channel):
+        subscription = LocalSubscription(self, channel)
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.channel]
+
+
+class RedisSubscription:
+    """One Redis pub/sub connection listening to a channel"""
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self, timeout=None):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        data = message['data']
+        return data.decode() if isinstance(data, bytes) else data
+
+    async def close(self):
+        await self.pubsub.unsubscribe()
+        await self.pubsub.aclose()
+
+
+class RedisPubSub:
+    """Pub/sub through Redis channels, shared by every worker process"""
+
+    def __init__(self, url=None):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured('RedisPubSub requires the "redis" package.')
+        self.url = url or getattr(settings, 'SHOPPING_REALTIME_REDIS_URL', 'redis://localhost:6379/0')
+        self.client = redis.Redis.from_url(self.url)
+        self.async_client = redis.asyncio.Redis.from_url(self.url)
+
+    def publish(self, channel, message):
+        self.client.publish(channel, message)
+
+    async def subscribe(self, channel):
+        pubsub = self.async_client.pubsub()
+        await pubsub.subscribe(channel)
+        return RedisSubscription(pubsub)
+
+
+@lru_cache(maxsize=1)
+def get_backend():
+    """The configured pub/sub backend, created once per process"""
+    path = getattr(settings, 'SHOPPING_REALTIME_BACKEND', 'apps.shopping.realtime.LocalPubSub')
+    return import_string(path)()
+
+
+def item_data(item):
+    return {field: getattr(item, field) for field in ITEM_FIELDS}
+
+
+def publish_list_event(shopping_list_id, event, items=(), item_ids=()):
+    """Broadcast an event about items of a list once the current transaction commits"""
+    message = json.dumps({
+        'type': event,
+        'list': shopping_list_id,
+        'items': [item_data(item) for item in items],
+        'item_ids': list(item_ids),
+    }, cls=DjangoJSONEncoder)
+    transaction.on_commit(lambda: get_backend().publish(list_channel(shopping_list_id), message))
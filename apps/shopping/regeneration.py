@@ -0,0 +1,233 @@
+"""
+Incremental Regeneration of Shopping Lists Linked to Meal Plans
+
+Items record the part of their quantity that came from their list's meal plan
+(``planned_quantity``). When meals are added, removed or re-served, only the
+ingredients of the recipes involved are summed again across the plan, and each
+open item swaps its old planned share for the new one in a single pass.
+Manual items, amounts added by hand and purchased items are left as they are;
+when the plan now needs more of something already bought, the difference goes
+on an open item. Lists generated before planned shares were recorded carry no
+marks; under the same lock, the part of each item that the plan accounts for
+is marked as planned and the list is compared with the whole plan, so the plan
+is never added on top of itself and amounts added by hand stay manual.
+"""
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from apps.mealplans.models import Meal
+from apps.recipes.models import Ingredient
+from .aggregation import (
+    AggregatedIngredient, accounted_parts, aggregate_ingredients, combined_ingredients, normalize_name
+)
+from .categories import classify_items
+from .merging import link_sources
+from .models import ShoppingList, ShoppingListItem, ShoppingListItemTombstone
+from .pantry import PantryStock
+from .realtime import publish_list_event
+
+
+def _parsed(name, quantity):
+    ingredient = AggregatedIngredient(name)
+    ingredient.add_quantity(quantity)
+    return ingredient
+
+
+def _without(ingredient, share):
+    """Take a share's totals and unparsed amounts off an ingredient, in place"""
+    for dimension, value in share.totals.items():
+        ingredient.subtract(dimension, value)
+    removed = {text.lower() for text in share.unparsed}
+    ingredient.unparsed = [text for text in ingredient.unparsed if text.lower() not in removed]
+    return ingredient
+
+
+def affected_keys(recipe_ids):
+    """Normalized names of the recipes' ingredients, in one query"""
+    return {
+        normalize_name(name)
+        for name in Ingredient.objects.filter(recipe_id__in=recipe_ids).values_list('name', flat=True)
+    }
+
+
+def _adopt(shopping_list, items, totals):
+    """Mark the part of each item that the plan's ``totals`` account for; return the items changed
+
+    Items of the same name take their part in the order they were added, and
+    only items holding a part stay linked to the plan.
+    """
+    by_key = defaultdict(list)
+    for item in sorted(items, key=lambda item: item.pk):
+        by_key[normalize_name(item.name)].append(item)
+    adopted = []
+    for key, key_items in by_key.items():
+        quantities = [item.quantity for item in key_items]
+        parts = accounted_parts(totals[key], quantities) if key in totals else [''] * len(key_items)
+        for item, part in zip(key_items, parts):
+            meal_plan_id = shopping_list.meal_plan_id if part else None
+            if (item.planned_quantity, item.meal_plan_id) != (part, meal_plan_id):
+                item.planned_quantity, item.meal_plan_id = part, meal_plan_id
+                adopted.append(item)
+    return adopted
+
+
+def _plan_refresh(shopping_list, items, planned, keys):
+    """Work out the item changes that bring planned shares in line with ``planned``; writes nothing
+
+    Returns (created, updated, deleted, sources) where deleted holds open items
+    left with nothing to buy and sources pairs items with their recipe ids.
+    """
+    by_key = defaultdict(list)
+    for item in items:
+        by_key[normalize_name(item.name)].append(item)
+    if keys is None:
+        keys = set(planned) | {
+            key for key, key_items in by_key.items() if any(item.planned_quantity for item in key_items)
+        }
+    next_order = max((item.order for item in items), default=-1) + 1
+
+    created, updated, new_shares, sources = [], {}, [], []
+    for key in sorted(keys):
+        key_items = by_key.get(key, [])
+        share = AggregatedIngredient(planned[key].name if key in planned else key)
+        if key in planned:
+            share.merge(planned[key])
+        # What was bought for the plan is already covered; restocked purchases are netted as pantry stock
+        for item in key_items:
+            if item.is_purchased and item.planned_quantity and not item.restocked:
+                _without(share, _parsed(item.name, item.planned_quantity))
+        new_share = share.quantity[:50]
+
+        holders = [item for item in key_items if not item.is_purchased and item.planned_quantity]
+        open_items = holders or [item for item in key_items if not item.is_purchased]
+        destination = open_items[0] if open_items else None
+        if [item.planned_quantity for item in holders] == ([new_share] if new_share else []):
+            continue
+
+        for item in holders:
+            item.quantity = _without(
+                _parsed(item.name, item.quantity), _parsed(item.name, item.planned_quantity)
+            ).quantity[:50]
+            item.planned_quantity = ''
+            # Whatever is left was added by hand; only items holding a planned share link to the plan
+            item.meal_plan_id = None
+            updated[item.pk] = item
+            sources.append((item, set()))
+        if not new_share:
+            continue
+        if destination is None:
+            new_shares.append(share)
+            continue
+        merged = _parsed(destination.name, destination.quantity)
+        merged.merge(share)
+        destination.quantity = merged.quantity[:50]
+        destination.planned_quantity = new_share
+        destination.meal_plan_id = shopping_list.meal_plan_id
+        updated[destination.pk] = destination
+        sources.append((destination, share.recipe_ids))
+
+    deleted = [item for item in updated.values() if not item.quantity]
+    for item in deleted:
+        del updated[item.pk]
+
+    categories = classify_items(shopping_list.user, [share.name for share in new_shares])
+    for order, (share, category) in enumerate(zip(new_shares, categories), start=next_order):
+        created.append(ShoppingListItem(
+            shopping_list=shopping_list,
+            name=share.name,
+            quantity=share.quantity[:50],
+            planned_quantity=share.quantity[:50],
+            category=category,
+            order=order,
+            meal_plan_id=shopping_list.meal_plan_id,
+        ))
+    sources.extend(zip(created, (share.recipe_ids for share in new_shares)))
+    return created, list(updated.values()), deleted, sources
+
+
+@transaction.atomic
+def refresh_list(shopping_list, planned, keys=None, recipe_ids=(), totals=None):
+    """Bring a list's planned shares in line with ``planned``; return (created, updated, deleted) items
+
+    ``planned`` maps normalized names to the plan's AggregatedIngredients;
+    only the names in ``keys`` are compared when it is given. Items stop
+    pointing at any of ``recipe_ids`` that no longer contribute to them.
+    With the plan's un-netted ``totals``, a list with no planned shares yet
+    is adopted first and then compared in full.
+    """
+    items = list(shopping_list.items.select_for_update().order_by('is_purchased', 'pk'))
+    adopted = []
+    if totals is not None and not any(item.planned_quantity for item in items):
+        adopted, keys = _adopt(shopping_list, items, totals), None
+    created, updated, deleted, sources = _plan_refresh(shopping_list, items, planned, keys)
+    deleted_pks = {item.pk for item in deleted}
+    updated = list({item.pk: item for item in adopted + updated if item.pk not in deleted_pks}.values())
+    if not (created or updated or deleted):
+        return created, updated, deleted
+
+    version = ShoppingList.next_version(shopping_list.pk, items=len(created) - len(deleted))
+    for item in created + updated:
+        item.version = version
+    if deleted:
+        ShoppingListItemTombstone.objects.bulk_create([
+            ShoppingListItemTombstone(shopping_list=shopping_list, item_id=item.pk, version=version)
+            for item in deleted
+        ])
+        ShoppingListItem.objects.filter(pk__in=[item.pk for item in deleted]).delete()
+        publish_list_event(shopping_list.pk, 'items_deleted', item_ids=sorted(item.pk for item in deleted))
+    if updated:
+        ShoppingListItem.objects.bulk_update(updated, ['quantity', 'planned_quantity', 'meal_plan', 'version'])
+        publish_list_event(shopping_list.pk, 'items_updated', updated)
+    if created:
+        ShoppingListItem.objects.bulk_create(created)
+        publish_list_event(shopping_list.pk, 'items_added', created)
+
+    stale = [
+        Q(shoppinglistitem_id=item.pk, recipe_id__in=set(recipe_ids) - recipe_ids_now)
+        for item, recipe_ids_now in sources
+        if set(recipe_ids) - recipe_ids_now
+    ]
+    if stale:
+        ShoppingListItem.recipes.through.objects.filter(reduce(operator.or_, stale)).delete()
+    link_sources(sources)
+    return created, updated, deleted
+
+
+def refresh_plan_lists(meal_plan_id, recipe_ids=None):
+    """Apply meal plan changes to its open linked lists; return how many lists changed
+
+    ``recipe_ids`` are the recipes of the meals that were added, removed or
+    re-served, and only items named like their ingredients are compared.
+    Without them the whole plan is.
+    """
+    # Only the plan owner's lists follow it; a list never takes in another user's plan
+    lists = list(
+        ShoppingList.objects.filter(
+            meal_plan_id=meal_plan_id, meal_plan__user_id=F('user_id'), is_completed=False
+        ).select_related('user')
+    )
+    if not lists:
+        return 0
+    keys = None if recipe_ids is None else affected_keys(recipe_ids)
+    if keys is not None and not keys:
+        return 0
+
+    rows = combined_ingredients(Meal.objects.filter(meal_plan_id=meal_plan_id))
+    # Lists with no planned shares yet are adopted against the whole plan, so all of it is summed
+    totals = {normalize_name(ingredient.name): ingredient for ingredient in aggregate_ingredients(rows)}
+    stocks, changed = {}, 0
+    for shopping_list in lists:
+        if shopping_list.user_id not in stocks:
+            stocks[shopping_list.user_id] = PantryStock.for_user(shopping_list.user)
+        # Netting changes the totals, so each list gets freshly summed ingredients
+        planned = {
+            normalize_name(ingredient.name): ingredient
+            for ingredient in aggregate_ingredients(rows, stocks[shopping_list.user_id])
+        }
+        if any(refresh_list(shopping_list, planned, keys, recipe_ids or (), totals)):
+            changed += 1
+    return changed
@@ -2,7 +2,10 @@
 REST API Serializers for Shopping App
 """
 from rest_framework import serializers
-from .models import ShoppingList, ShoppingListItem
+from .access import list_roles
+from .aggregation import normalize_name
+from .models import ShoppingList, ShoppingListItem, PantryItem
+from .pricing import list_cost
 
 
 class ShoppingListItemSerializer(serializers.ModelSerializer):
@@ -13,24 +16,33 @@ class ShoppingListItemSerializer(serializers.ModelSerializer):
         model = ShoppingListItem
         fields = [
             'id', 'shopping_list', 'name', 'quantity', 'category', 'category_display',
-            'is_purchased', 'is_priority', 'notes', 'order', 'created_at'
+            'is_purchased', 'is_priority', 'notes', 'order', 'recipes', 'meal_plan', 'version', 'created_at'
         ]
-        read_only_fields = ['created_at']
+        read_only_fields = ['recipes', 'meal_plan', 'version', 'created_at']
+    
+    def validate_shopping_list(self, shopping_list):
+        if shopping_list.pk not in list_roles(self.context['request']):
+            raise serializers.ValidationError('Shopping list not found.')
+        return shopping_list
 
 
 class ShoppingListSerializer(serializers.ModelSerializer):
     """Serializer for ShoppingList model"""
     user_username = serializers.CharField(source='user.username', read_only=True)
     items = ShoppingListItemSerializer(many=True, read_only=True)
+    estimated_cost = serializers.SerializerMethodField()
     
     class Meta:
         model = ShoppingList
         fields = [
-            'id', 'user', 'user_username', 'meal_plan', 'name', 'notes',
+            'id', 'user', 'user_username', 'meal_plan', 'store', 'name', 'notes',
             'is_completed', 'total_items', 'completed_items', 'completion_percentage',
-            'items', 'created_at', 'updated_at'
+            'version', 'estimated_cost', 'items', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'version', 'created_at', 'updated_at']
+    
+    def get_estimated_cost(self, obj):
+        return list_cost(obj, obj.items.all())
 
 
 class ShoppingListCreateSerializer(serializers.ModelSerializer):
@@ -38,4 +50,125 @@ class ShoppingListCreateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ShoppingList
-        fields = ['meal_plan', 'name', 'notes', 'is_completed']
+        fields = ['meal_plan', 'store', 'name', 'notes', 'is_completed']
+    
+    def validate_meal_plan(self, meal_plan):
+        if meal_plan is not None and meal_plan.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Meal plan not found.')
+        return meal_plan
+    
+    def validate_store(self, store):
+        if store is not None and store.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Store not found.')
+        return store
+
+
+class AddRecipesSerializer(serializers.Serializer):
+    """Serializer for merging the ingredients of several recipes into a list"""
+    recipe_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=50
+    )
+    servings = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+
+
+class DateRangeSerializer(serializers.Serializer):
+    """An inclusive range of meal dates"""
+    start = serializers.DateField()
+    end = serializers.DateField()
+    
+    def validate(self, data):
+        if data['end'] < data['start']:
+            raise serializers.ValidationError('end must not be before start.')
+        return data
+
+
+class RecipeServingsSerializer(serializers.Serializer):
+    """A recipe to add on its own, optionally scaled to a number of servings"""
+    id = serializers.IntegerField()
+    servings = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+
+
+class CombineListsSerializer(serializers.Serializer):
+    """Serializer for combining meal plans, date ranges and recipes into one list"""
+    meal_plan_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list, max_length=50
+    )
+    date_ranges = DateRangeSerializer(many=True, required=False, default=list, max_length=20)
+    recipes = RecipeServingsSerializer(many=True, required=False, default=list, max_length=50)
+    shopping_list = serializers.IntegerField(required=False, allow_null=True, default=None)
+    name = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    dry_run = serializers.BooleanField(required=False, default=False)
+    
+    def validate(self, data):
+        if not (data['meal_plan_ids'] or data['date_ranges'] or data['recipes']):
+            raise serializers.ValidationError('Give at least one meal plan, date range or recipe.')
+        return data
+
+
+class CheckItemsSerializer(serializers.Serializer):
+    """Serializer for checking off or unchecking several items at once"""
+    item_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+    purchased = serializers.BooleanField(required=False, allow_null=True, default=None)
+    restock = serializers.BooleanField(required=False, default=False)
+
+
+class SyncItemFieldsSerializer(serializers.Serializer):
+    """Item fields an offline client may set; only the fields it changed are sent"""
+    name = serializers.CharField(max_length=200, required=False)
+    quantity = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    category = serializers.ChoiceField(choices=ShoppingListItem.CATEGORY_CHOICES, required=False)
+    is_purchased = serializers.BooleanField(required=False)
+    is_priority = serializers.BooleanField(required=False)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    order = serializers.IntegerField(required=False, min_value=0)
+
+
+class SyncOperationSerializer(serializers.Serializer):
+    """A queued offline create, update or delete of one item"""
+    op = serializers.ChoiceField(choices=['create', 'update', 'delete'])
+    id = serializers.IntegerField(required=False)
+    client_id = serializers.CharField(max_length=64, required=False)
+    base_version = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    fields = SyncItemFieldsSerializer(required=False)
+    
+    def validate(self, data):
+        if data['op'] == 'create':
+            if 'client_id' not in data or 'name' not in data.get('fields', {}):
+                raise serializers.ValidationError('create requires client_id and fields.name.')
+        elif 'id' not in data:
+            raise serializers.ValidationError(f"{data['op']} requires id.")
+        elif data['op'] == 'update' and not data.get('fields'):
+            raise serializers.ValidationError('update requires fields.')
+        return data
+
+
+class ShoppingListSyncSerializer(serializers.Serializer):
+    """Serializer for uploading queued offline edits to a list"""
+    base_version = serializers.IntegerField(min_value=0)
+    operations = SyncOperationSerializer(many=True, max_length=500)
+
+
+class ShoppingListChangesSerializer(serializers.Serializer):
+    """Query parameters of the delta-sync changes endpoint"""
+    since = serializers.IntegerField(min_value=0, default=0)
+
+
+class PantryItemSerializer(serializers.ModelSerializer):
+    """Serializer for PantryItem model"""
+    
+    class Meta:
+        model = PantryItem
+        fields = ['id', 'name', 'quantity', 'amount', 'dimension', 'expires_on', 'updated_at']
+        read_only_fields = ['amount', 'dimension', 'updated_at']
+    
+    def validate_name(self, name):
+        duplicates = PantryItem.objects.filter(
+            pantry__user=self.context['request'].user, name_key=normalize_name(name)
+        )
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError('This item is already in your pantry.')
+        return name
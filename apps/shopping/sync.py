@@ -0,0 +1,104 @@
+"""
+Delta Sync of Shopping Lists for Offline Clients
+
+Every item write stamps the item with the list's next change version and
+every delete leaves a tombstone, so a client holding version N only needs the
+items and tombstones with a version above N. Queued offline edits are applied
+as one batch under a single new version.
+"""
+from django.db import transaction
+
+from .categories import classify_items
+from .models import ShoppingList, ShoppingListItem, ShoppingListItemTombstone
+from .realtime import publish_list_event
+
+
+SYNC_FIELDS = ('id', 'name', 'quantity', 'category', 'is_purchased', 'is_priority', 'notes', 'order', 'version')
+
+
+def changes_since(shopping_list, since):
+    """Items changed and item ids deleted after a list version"""
+    # Read the version first: rows committed meanwhile are sent again next time, never missed
+    version = ShoppingList.objects.filter(pk=shopping_list.pk).values_list('version', flat=True).get()
+    items = list(
+        shopping_list.items.filter(version__gt=since).order_by('version', 'pk').values(*SYNC_FIELDS)
+    )
+    deleted = []
+    if since:
+        deleted = list(
+            shopping_list.tombstones.filter(version__gt=since).order_by('version')
+            .values_list('item_id', flat=True)
+        )
+    return {'version': version, 'since': since, 'items': items, 'deleted': deleted}
+
+
+@transaction.atomic
+def apply_offline_changes(shopping_list, operations):
+    """Apply queued create/update/delete operations; return the id map and conflicts
+
+    Updates carry only the fields the client changed and are merged field by
+    field, so concurrent edits to other fields survive; for the same field the
+    last writer wins. Operations on items deleted on the server are reported
+    as conflicts and skipped.
+    """
+    ids = {op['id'] for op in operations if 'id' in op}
+    items = shopping_list.items.select_for_update().in_bulk(ids)
+    was_purchased = {pk: item.is_purchased for pk, item in items.items()}
+
+    created, updated, deleted = [], {}, set()
+    changed_fields, conflicts = set(), []
+    for op in operations:
+        if op['op'] == 'create':
+            item = ShoppingListItem(shopping_list=shopping_list, **op['fields'])
+            created.append((op['client_id'], item))
+            continue
+
+        item = items.get(op['id'])
+        if item is None or op['id'] in deleted:
+            conflicts.append({'id': op['id'], 'op': op['op'], 'reason': 'deleted'})
+            continue
+
+        if op['op'] == 'update':
+            if op.get('base_version') is not None and item.version > op['base_version']:
+                conflicts.append({'id': item.pk, 'op': 'update', 'reason': 'merged'})
+            for field, value in op['fields'].items():
+                setattr(item, field, value)
+            changed_fields.update(op['fields'])
+            updated[item.pk] = item
+        else:
+            deleted.add(item.pk)
+            updated.pop(item.pk, None)
+
+    if not (created or updated or deleted):
+        return {}, conflicts
+
+    purchased = (
+        sum(item.is_purchased for _, item in created)
+        + sum(item.is_purchased - was_purchased[pk] for pk, item in updated.items())
+        - sum(was_purchased[pk] for pk in deleted)
+    )
+    version = ShoppingList.next_version(
+        shopping_list.pk, items=len(created) - len(deleted), purchased=purchased
+    )
+    unclassified = [item for _, item in created if item.category == 'other']
+    categories = classify_items(shopping_list.user, [item.name for item in unclassified])
+    for item, category in zip(unclassified, categories):
+        item.category = category
+    for item in [item for _, item in created] + list(updated.values()):
+        item.version = version
+
+    if deleted:
+        ShoppingListItemTombstone.objects.bulk_create([
+            ShoppingListItemTombstone(shopping_list=shopping_list, item_id=item_id, version=version)
+            for item_id in deleted
+        ])
+        ShoppingListItem.objects.filter(pk__in=deleted).delete()
+        publish_list_event(shopping_list.pk, 'items_deleted', item_ids=sorted(deleted))
+    if updated:
+        ShoppingListItem.objects.bulk_update(updated.values(), sorted(changed_fields | {'version'}))
+        publish_list_event(shopping_list.pk, 'items_updated', updated.values())
+    if created:
+        ShoppingListItem.objects.bulk_create([item for _, item in created])
+        publish_list_event(shopping_list.pk, 'items_added', [item for _, item in created])
+
+    return {client_id: item.pk for client_id, item in created}, conflicts
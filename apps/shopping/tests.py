@@ -0,0 +1,634 @@
+"""
+Tests for the shopping app
+Run with: python manage.py test apps.shopping.tests
+"""
+import asyncio
+import csv
+import json
+from datetime import date
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.forms import inlineformset_factory
+from django.test import SimpleTestCase, TestCase
+
+from apps.mealplans.models import Meal, MealPlan
+from apps.recipes.models import Ingredient, Recipe
+from .access import accessible_lists
+from .admin import ShoppingListMemberFormSet
+from .aggregation import AggregatedIngredient, parse_amount
+from .merging import combine_into_list
+from .models import CategoryOverride, ShoppingList, ShoppingListItem, ShoppingListMember
+from .realtime import SUBSCRIBER_BUFFER, LocalPubSub, get_backend, list_channel, publish_list_event
+from .regeneration import refresh_plan_lists
+from .sync import changes_since
+
+
+class ParseAmountTests(SimpleTestCase):
+    """Free-text amounts users type into recipes"""
+
+    def test_zero_denominator_is_unparsed(self):
+        self.assertIsNone(parse_amount('1/0 cup'))
+        self.assertIsNone(parse_amount('1 - 1/0 tsp'))
+
+        ingredient = AggregatedIngredient('Sugar')
+        ingredient.add('1/0 cup')
+        ingredient.add('200 g')
+        self.assertEqual(ingredient.unparsed, ['1/0 cup'])
+        self.assertEqual(ingredient.totals, {'mass': 200})
+
+    def test_thousands_separator(self):
+        quantity = parse_amount('1,000 g')
+        self.assertEqual((quantity.value, quantity.dimension), (1000, 'mass'))
+        self.assertEqual(parse_amount('2,500,000 ml').value, 2500000)
+        self.assertEqual(parse_amount('1,000, diced').value, 1000)
+
+    def test_decimal_comma(self):
+        self.assertEqual(parse_amount('1,5 kg').value, 1500)
+        self.assertEqual(parse_amount('12,25 g').value, 12.25)
+
+
+class CategorizeCommandTests(TestCase):
+    """categorize_shopping_items and delta sync"""
+
+    def test_recategorized_items_reach_delta_sync(self):
+        user = get_user_model().objects.create_user('dave', 'dave@example.com', 'secret-pass-1')
+        shopping_list = ShoppingList.objects.create(user=user, name='Weekly')
+        for name in ('Milk', 'Apples', 'Xyzzy'):
+            ShoppingListItem.objects.create(shopping_list=shopping_list, name=name, category='other')
+        since = ShoppingList.objects.get(pk=shopping_list.pk).version
+
+        call_command('categorize_shopping_items', stdout=StringIO())
+
+        changes = changes_since(shopping_list, since)
+        self.assertEqual(changes['version'], since + 1)
+        self.assertEqual(
+            sorted((item['name'], item['category']) for item in changes['items']),
+            [('Apples', 'produce'), ('Milk', 'dairy')]
+        )
+
+
+class OwnerMembershipTests(TestCase):
+    """The OWNER membership follows ShoppingList.user"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.erin = User.objects.create_user('erin', 'erin@example.com', 'secret-pass-1')
+        cls.frank = User.objects.create_user('frank', 'frank@example.com', 'secret-pass-1')
+        cls.grace = User.objects.create_user('grace', 'grace@example.com', 'secret-pass-1')
+
+    def roles(self, shopping_list):
+        return dict(shopping_list.memberships.values_list('user__username', 'role'))
+
+    def test_reassigning_the_user_moves_the_owner_membership(self):
+        shopping_list = ShoppingList.objects.create(user=self.erin, name='Party')
+        ShoppingListMember.objects.create(shopping_list=shopping_list, user=self.grace)
+
+        shopping_list = ShoppingList.objects.get(pk=shopping_list.pk)
+        shopping_list.user = self.frank
+        shopping_list.save()
+        self.assertEqual(self.roles(shopping_list), {'frank': 'owner', 'grace': 'member'})
+        self.assertEqual(list(accessible_lists(self.erin)), [])
+        self.assertEqual(list(accessible_lists(self.frank)), [shopping_list])
+
+        # An existing member is promoted rather than duplicated
+        shopping_list.user = self.grace
+        shopping_list.save()
+        self.assertEqual(self.roles(shopping_list), {'grace': 'owner'})
+
+    def test_admin_inline_protects_the_owner_row(self):
+        shopping_list = ShoppingList.objects.create(user=self.erin, name='Party')
+        member = ShoppingListMember.objects.create(shopping_list=shopping_list, user=self.grace)
+        owner = shopping_list.memberships.get(role=ShoppingListMember.OWNER)
+        FormSet = inlineformset_factory(
+            ShoppingList, ShoppingListMember, formset=ShoppingListMemberFormSet, fields=['user', 'role'], extra=0
+        )
+
+        def submit(rows):
+            data = {
+                'memberships-TOTAL_FORMS': len(rows), 'memberships-INITIAL_FORMS': 2,
+                'memberships-MIN_NUM_FORMS': 0, 'memberships-MAX_NUM_FORMS': 1000,
+            }
+            for index, row in enumerate(rows):
+                data.update({f'memberships-{index}-{key}': value for key, value in row.items()})
+            return FormSet(data, instance=shopping_list, queryset=shopping_list.memberships.order_by('pk'))
+
+        owner_row = {'id': owner.pk, 'shopping_list': shopping_list.pk, 'user': self.erin.pk, 'role': 'owner'}
+        member_row = {'id': member.pk, 'shopping_list': shopping_list.pk, 'user': self.grace.pk, 'role': 'member'}
+        self.assertTrue(submit([owner_row, member_row]).is_valid())
+        self.assertFalse(submit([{**owner_row, 'DELETE': 'on'}, member_row]).is_valid())
+        self.assertFalse(submit([{**owner_row, 'role': 'member'}, member_row]).is_valid())
+        self.assertFalse(submit([owner_row, {**member_row, 'role': 'owner'}]).is_valid())
+        self.assertTrue(submit([owner_row, {**member_row, 'DELETE': 'on'}]).is_valid())
+
+
+class LegacyPlanListTests(TestCase):
+    """Editing the plan of a list generated before items recorded their planned share"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('heidi', 'heidi@example.com', 'secret-pass-1')
+        cls.carbonara = cls.recipe('Carbonara', [('Eggs', '4'), ('Spaghetti', '400 g')])
+        cls.toast = cls.recipe('Avocado toast', [('Avocado', '2')])
+        cls.omelette = cls.recipe('Omelette', [('Eggs', '2')])
+        cls.plan = MealPlan.objects.create(user=cls.user, name='Week', start_date=date(2026, 2, 2))
+        cls.add_meal(cls.carbonara)
+
+    @classmethod
+    def recipe(cls, title, ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.user, title=title, description=title, prep_time=5, cook_time=5, servings=2,
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(recipe=recipe, name=name, amount=amount, order=order)
+            for order, (name, amount) in enumerate(ingredients)
+        ])
+        return recipe
+
+    @classmethod
+    def add_meal(cls, recipe):
+        return Meal.objects.create(
+            meal_plan=cls.plan, recipe=recipe, meal_type='dinner', day_of_week=0, date=date(2026, 2, 2), servings=2,
+        )
+
+    def legacy_list(self, meal_plan=None):
+        """A generated list as older releases left it: no planned shares recorded"""
+        shopping_list = ShoppingList.objects.create(user=self.user, name='Shopping for Week', meal_plan=self.plan)
+        for name, quantity in (('Eggs', '4'), ('Spaghetti', '400g')):
+            ShoppingListItem.objects.create(
+                shopping_list=shopping_list, name=name, quantity=quantity, meal_plan=meal_plan
+            )
+        return shopping_list
+
+    def quantities(self, shopping_list):
+        return dict(shopping_list.items.values_list('name', 'quantity'))
+
+    def test_migrated_legacy_list_is_not_doubled(self):
+        shopping_list = self.legacy_list()
+        migration = import_module('apps.shopping.migrations.0013_adopt_legacy_plan_lists')
+        migration.adopt_legacy_plan_lists(django_apps, None)
+
+        self.add_meal(self.toast)
+        self.add_meal(self.omelette)
+        refresh_plan_lists(self.plan.pk, [self.toast.pk, self.omelette.pk])
+        self.assertEqual(self.quantities(shopping_list), {'Eggs': '6', 'Spaghetti': '400g', 'Avocado': '2'})
+
+    def test_unmarked_list_is_rebuilt_in_full(self):
+        shopping_list = self.legacy_list(meal_plan=self.plan)
+        ShoppingListItem.objects.create(shopping_list=shopping_list, name='Chickpeas', quantity='1 can')
+
+        self.add_meal(self.omelette)
+        refresh_plan_lists(self.plan.pk, [self.omelette.pk])
+        self.assertEqual(
+            self.quantities(shopping_list), {'Eggs': '6', 'Spaghetti': '400g', 'Chickpeas': '1 can'}
+        )
+        self.assertEqual(shopping_list.items.get(name='Eggs').planned_quantity, '6')
+        self.assertEqual(shopping_list.items.get(name='Chickpeas').planned_quantity, '')
+
+    def test_amounts_added_by_hand_stay_manual(self):
+        shopping_list = self.legacy_list(meal_plan=self.plan)
+        shopping_list.items.filter(name='Eggs').update(quantity='10')
+
+        # The list is adopted against the edited plan, whose six eggs the ten already cover
+        self.add_meal(self.omelette)
+        refresh_plan_lists(self.plan.pk, [self.omelette.pk])
+        eggs = shopping_list.items.get(name='Eggs')
+        self.assertEqual((eggs.quantity, eggs.planned_quantity), ('10', '6'))
+
+        # Dropping the plan's eggs leaves the ones added by hand
+        self.plan.meals.filter(recipe__in=[self.omelette, self.carbonara]).delete()
+        refresh_plan_lists(self.plan.pk, [self.omelette.pk, self.carbonara.pk])
+        self.assertEqual(self.quantities(shopping_list), {'Eggs': '4'})
+
+    def test_migration_marks_only_what_the_plan_accounts_for(self):
+        shopping_list = self.legacy_list(meal_plan=self.plan)
+        # As 0012 left it: every linked item wholly planned, hand edits included
+        shopping_list.items.filter(name='Eggs').update(quantity='10', planned_quantity='10')
+        shopping_list.items.filter(name='Spaghetti').update(planned_quantity='400g')
+        migration = import_module('apps.shopping.migrations.0013_adopt_legacy_plan_lists')
+        migration.adopt_legacy_plan_lists(django_apps, None)
+        self.assertEqual(shopping_list.items.get(name='Eggs').planned_quantity, '4')
+
+        self.add_meal(self.omelette)
+        refresh_plan_lists(self.plan.pk, [self.omelette.pk])
+        self.assertEqual(self.quantities(shopping_list), {'Eggs': '12', 'Spaghetti': '400g'})
+
+
+class PlanOwnershipTests(TestCase):
+    """A list only ever follows its owner's meal plan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user('ivy', 'ivy@example.com', 'secret-pass-1')
+        cls.other = User.objects.create_user('mallory', 'mallory@example.com', 'secret-pass-1')
+        cls.plan = MealPlan.objects.create(user=cls.owner, name='Private week', start_date=date(2026, 2, 2))
+        recipe = Recipe.objects.create(
+            author=cls.owner, title='Secret stew', description='Stew', prep_time=5, cook_time=5, servings=2,
+        )
+        Ingredient.objects.create(recipe=recipe, name='Saffron', amount='1 g')
+        cls.recipe = recipe
+
+    def test_api_rejects_another_users_plan(self):
+        self.client.force_login(self.other)
+        response = self.client.post(
+            '/api/shopping/shopping-lists/', {'name': 'Snooping', 'meal_plan': self.plan.pk}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('meal_plan', response.json())
+        self.assertFalse(ShoppingList.objects.filter(user=self.other).exists())
+
+    def test_refresh_skips_lists_owned_by_someone_else(self):
+        snooping = ShoppingList.objects.create(user=self.other, name='Snooping', meal_plan=self.plan)
+        Meal.objects.create(
+            meal_plan=self.plan, recipe=self.recipe, meal_type='dinner', day_of_week=0,
+            date=date(2026, 2, 2), servings=2,
+        )
+        self.assertEqual(refresh_plan_lists(self.plan.pk), 0)
+        self.assertFalse(snooping.items.exists())
+
+
+class ReconcileCountsTests(TestCase):
+    """reconcile_shopping_counts repairs drifted counters"""
+
+    def test_drifted_counters_are_fixed(self):
+        user = get_user_model().objects.create_user('niaj', 'niaj@example.com', 'secret-pass-1')
+        shopping_list = ShoppingList.objects.create(user=user, name='Weekly')
+        for name, purchased in (('Milk', True), ('Bread', False)):
+            ShoppingListItem.objects.create(shopping_list=shopping_list, name=name, is_purchased=purchased)
+        ShoppingList.objects.filter(pk=shopping_list.pk).update(item_count=7, purchased_count=0)
+
+        out = StringIO()
+        call_command('reconcile_shopping_counts', stdout=out)
+        shopping_list.refresh_from_db()
+        self.assertEqual((shopping_list.item_count, shopping_list.purchased_count), (2, 1))
+        self.assertIn('Fixed 1 drifted of 1 lists', out.getvalue())
+
+
+class RestockedPlanItemTests(TestCase):
+    """Plan refreshes after items were checked off into the pantry"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('olivia', 'olivia@example.com', 'secret-pass-1')
+        cls.carbonara = Recipe.objects.create(
+            author=cls.user, title='Carbonara', description='Pasta', prep_time=5, cook_time=5, servings=2,
+        )
+        Ingredient.objects.create(recipe=cls.carbonara, name='Eggs', amount='4')
+        cls.omelette = Recipe.objects.create(
+            author=cls.user, title='Omelette', description='Eggs', prep_time=5, cook_time=5, servings=2,
+        )
+        Ingredient.objects.create(recipe=cls.omelette, name='Eggs', amount='2')
+        cls.plan = MealPlan.objects.create(user=cls.user, name='Week', start_date=date(2026, 2, 2))
+
+    def add_meal(self, recipe):
+        Meal.objects.create(
+            meal_plan=self.plan, recipe=recipe, meal_type='dinner', day_of_week=0, date=date(2026, 2, 2), servings=2,
+        )
+
+    def open_eggs(self, shopping_list):
+        return list(shopping_list.items.filter(is_purchased=False).values_list('quantity', flat=True))
+
+    def check_off(self, shopping_list, restock):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            f'/api/shopping/shopping-lists/{shopping_list.pk}/check_items/',
+            {'item_ids': list(shopping_list.items.values_list('pk', flat=True)), 'purchased': True, 'restock': restock},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_restocked_purchase_is_not_counted_twice(self):
+        self.add_meal(self.carbonara)
+        shopping_list = combine_into_list(self.user, meals=self.plan.meals.all(), meal_plan=self.plan, name='Week')[0]
+        self.check_off(shopping_list, restock=True)
+
+        self.add_meal(self.omelette)
+        refresh_plan_lists(self.plan.pk, [self.omelette.pk])
+        self.assertEqual(self.open_eggs(shopping_list), ['2'])
+
+    def test_purchase_without_restock_is_counted_as_bought(self):
+        self.add_meal(self.carbonara)
+        shopping_list = combine_into_list(self.user, meals=self.plan.meals.all(), meal_plan=self.plan, name='Week')[0]
+        self.check_off(shopping_list, restock=False)
+
+        self.add_meal(self.omelette)
+        refresh_plan_lists(self.plan.pk, [self.omelette.pk])
+        self.assertEqual(self.open_eggs(shopping_list), ['2'])
+
+
+class SharedListCategoryTests(TestCase):
+    """Items on a shared list are categorised by the list owner's overrides"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user('quinn', 'quinn@example.com', 'secret-pass-1')
+        cls.member = User.objects.create_user('rupert', 'rupert@example.com', 'secret-pass-1')
+        cls.shopping_list = ShoppingList.objects.create(user=cls.owner, name='House')
+        ShoppingListMember.objects.create(shopping_list=cls.shopping_list, user=cls.member)
+        CategoryOverride.objects.create(user=cls.owner, name_key='tofu', category='frozen')
+
+    def test_member_api_writes_use_the_owner(self):
+        self.client.force_login(self.member)
+        response = self.client.post(
+            '/api/shopping/items/', {'shopping_list': self.shopping_list.pk, 'name': 'Tofu', 'quantity': '1 block'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['category'], 'frozen')
+
+        response = self.client.patch(
+            f"/api/shopping/items/{response.json()['id']}/", {'category': 'bakery'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(CategoryOverride.objects.values_list('user__username', 'category')), [('quinn', 'bakery')]
+        )
+
+
+class RealtimeEventTests(TestCase):
+    """Item events reach every subscriber of a list once the write commits"""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def test_event_is_published_on_commit_to_each_subscriber(self):
+        user = get_user_model().objects.create_user('sam', 'sam@example.com', 'secret-pass-1')
+        shopping_list = ShoppingList.objects.create(user=user, name='Weekly')
+        item = ShoppingListItem.objects.create(shopping_list=shopping_list, name='Milk', quantity='1 l')
+        channel = list_channel(shopping_list.pk)
+        first = self.loop.run_until_complete(get_backend().subscribe(channel))
+        second = self.loop.run_until_complete(get_backend().subscribe(channel))
+        self.addCleanup(lambda: [self.loop.run_until_complete(sub.close()) for sub in (first, second)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_list_event(shopping_list.pk, 'items_updated', [item])
+            self.assertIsNone(self.loop.run_until_complete(first.get(timeout=0.01)))
+
+        messages = [self.loop.run_until_complete(sub.get(timeout=1)) for sub in (first, second)]
+        self.assertEqual(messages[0], messages[1])
+        event = json.loads(messages[0])
+        self.assertEqual((event['type'], event['list']), ('items_updated', shopping_list.pk))
+        self.assertEqual((event['items'][0]['id'], event['items'][0]['quantity']), (item.pk, '1 l'))
+
+    def test_slow_subscriber_is_told_to_resync(self):
+        backend = LocalPubSub()
+        subscription = self.loop.run_until_complete(backend.subscribe('channel'))
+        for number in range(SUBSCRIBER_BUFFER + 1):
+            backend.publish('channel', str(number))
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+        self.assertEqual(json.loads(self.loop.run_until_complete(subscription.get(timeout=1))), {'type': 'resync'})
+        self.assertIsNone(self.loop.run_until_complete(subscription.get(timeout=0.01)))
+
+        self.loop.run_until_complete(subscription.close())
+        self.assertEqual(backend.subscribers, {})
+
+    async def test_event_stream_is_for_members_only(self):
+        User = get_user_model()
+        owner = await User.objects.acreate(username='tina', email='tina@example.com')
+        outsider = await User.objects.acreate(username='uma', email='uma@example.com')
+        shopping_list = await ShoppingList.objects.acreate(user=owner, name='Weekly')
+
+        await self.async_client.aforce_login(outsider)
+        response = await self.async_client.get(f'/shopping/{shopping_list.pk}/events/')
+        self.assertEqual(response.status_code, 404)
+
+        await self.async_client.aforce_login(owner)
+        response = await self.async_client.get(f'/shopping/{shopping_list.pk}/events/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(await anext(aiter(response.streaming_content)), b'retry: 3000\n\n')
+        subscribers = get_backend().subscribers.get(list_channel(shopping_list.pk), set())
+        self.assertEqual(len(subscribers), 1)
+        for subscription in list(subscribers):
+            await subscription.close()
+
+
+class DeltaSyncTests(TestCase):
+    """GET .../changes/?since=<version> and POST .../sync/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('vic', 'vic@example.com', 'secret-pass-1')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.shopping_list = ShoppingList.objects.create(user=self.user, name='Weekly')
+        self.milk, self.eggs, self.bread = (
+            ShoppingListItem.objects.create(shopping_list=self.shopping_list, name=name, quantity='1')
+            for name in ('Milk', 'Eggs', 'Bread')
+        )
+        self.url = f'/api/shopping/shopping-lists/{self.shopping_list.pk}'
+
+    def version(self):
+        return ShoppingList.objects.get(pk=self.shopping_list.pk).version
+
+    def sync(self, base_version, operations):
+        response = self.client.post(
+            f'{self.url}/sync/', {'base_version': base_version, 'operations': operations},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_since_a_version(self):
+        since = self.version()
+        self.eggs.quantity = '12'
+        self.eggs.save()
+        bread_id = self.bread.pk
+        self.bread.delete()
+
+        data = self.client.get(f'{self.url}/changes/', {'since': since}).json()
+        self.assertEqual((data['version'], data['since']), (since + 2, since))
+        self.assertEqual([(item['id'], item['quantity']) for item in data['items']], [(self.eggs.pk, '12')])
+        self.assertEqual(data['deleted'], [bread_id])
+
+        data = self.client.get(f'{self.url}/changes/').json()
+        self.assertEqual(sorted(item['name'] for item in data['items']), ['Eggs', 'Milk'])
+        self.assertEqual(data['deleted'], [])
+
+    def test_offline_edits_are_applied_under_one_version(self):
+        base = self.version()
+        self.eggs.notes = 'free range'
+        self.eggs.save()
+        bread_id = self.bread.pk
+        self.bread.delete()
+
+        data = self.sync(base, [
+            {'op': 'create', 'client_id': 'tmp-1', 'fields': {'name': 'Apples', 'quantity': '6'}},
+            {'op': 'update', 'id': self.milk.pk, 'fields': {'is_purchased': True}},
+            {'op': 'update', 'id': self.eggs.pk, 'base_version': base, 'fields': {'quantity': '6'}},
+            {'op': 'update', 'id': bread_id, 'fields': {'quantity': '2'}},
+        ])
+        apples = ShoppingListItem.objects.get(name='Apples')
+        self.assertEqual(data['id_map'], {'tmp-1': apples.pk})
+        self.assertEqual(data['conflicts'], [
+            {'id': self.eggs.pk, 'op': 'update', 'reason': 'merged'},
+            {'id': bread_id, 'op': 'update', 'reason': 'deleted'},
+        ])
+        self.assertEqual(data['version'], base + 3)
+        self.assertEqual(data['deleted'], [bread_id])
+        self.assertEqual(
+            {item['id']: item['version'] for item in data['items']},
+            {self.eggs.pk: base + 3, self.milk.pk: base + 3, apples.pk: base + 3},
+        )
+        # Fields the client did not send keep the server's edits
+        eggs = ShoppingListItem.objects.get(pk=self.eggs.pk)
+        self.assertEqual((eggs.quantity, eggs.notes), ('6', 'free range'))
+        self.assertEqual(apples.category, 'produce')
+
+        shopping_list = ShoppingList.objects.get(pk=self.shopping_list.pk)
+        self.assertEqual((shopping_list.item_count, shopping_list.purchased_count), (3, 1))
+
+    def test_invalid_operations_are_rejected(self):
+        response = self.client.post(
+            f'{self.url}/sync/', {'base_version': 0, 'operations': [{'op': 'update', 'id': self.milk.pk}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.version(), 3)
+
+
+class CheckOffTests(TestCase):
+    """Bulk check-off and toggling keep the version and purchased counter in step"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user('wes', 'wes@example.com', 'secret-pass-1')
+        cls.member = User.objects.create_user('xena', 'xena@example.com', 'secret-pass-1')
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create(user=self.owner, name='Weekly')
+        ShoppingListMember.objects.create(shopping_list=self.shopping_list, user=self.member)
+        self.items = [
+            ShoppingListItem.objects.create(shopping_list=self.shopping_list, name=name, quantity='1')
+            for name in ('Milk', 'Eggs', 'Bread')
+        ]
+        self.client.force_login(self.member)
+
+    def check(self, items, purchased=None):
+        response = self.client.post(
+            f'/api/shopping/shopping-lists/{self.shopping_list.pk}/check_items/',
+            {'item_ids': [item.pk for item in items], 'purchased': purchased}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_items_already_in_the_requested_state_are_left_alone(self):
+        version = ShoppingList.objects.get(pk=self.shopping_list.pk).version
+        data = self.check(self.items[:2], purchased=True)
+        self.assertEqual(sorted(item['id'] for item in data['items']), [item.pk for item in self.items[:2]])
+        self.assertEqual(
+            data['list'],
+            {'id': self.shopping_list.pk, 'version': version + 1, 'total_items': 3,
+             'completed_items': 2, 'completion_percentage': 66},
+        )
+
+        data = self.check(self.items, purchased=True)
+        self.assertEqual([item['id'] for item in data['items']], [self.items[2].pk])
+        self.assertEqual((data['list']['version'], data['list']['completed_items']), (version + 2, 3))
+
+        data = self.check(self.items[:1], purchased=True)
+        self.assertEqual((data['items'], data['list']['version']), ([], version + 2))
+
+    def test_toggles_apply_on_top_of_each_other(self):
+        data = self.check(self.items[:2])
+        self.assertTrue(all(item['is_purchased'] for item in data['items']))
+        data = self.check(self.items)
+        self.assertEqual(
+            {item['id']: item['is_purchased'] for item in data['items']},
+            {self.items[0].pk: False, self.items[1].pk: False, self.items[2].pk: True},
+        )
+
+        response = self.client.post(f'/api/shopping/items/{self.items[2].pk}/toggle_purchased/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['is_purchased'])
+        shopping_list = ShoppingList.objects.get(pk=self.shopping_list.pk)
+        self.assertEqual(response.json()['version'], shopping_list.version)
+        self.assertEqual(shopping_list.purchased_count, 0)
+
+    def test_items_of_other_lists_are_ignored(self):
+        other = ShoppingList.objects.create(user=self.owner, name='Party')
+        stranger = ShoppingListItem.objects.create(shopping_list=other, name='Cake', quantity='1')
+        data = self.check([stranger], purchased=True)
+        self.assertEqual(data['items'], [])
+        self.assertFalse(ShoppingListItem.objects.get(pk=stranger.pk).is_purchased)
+
+
+class ShoppingListExportTests(TestCase):
+    """Streaming text, CSV and print exports of a list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('yara', 'yara@example.com', 'secret-pass-1')
+        cls.stranger = User.objects.create_user('zack', 'zack@example.com', 'secret-pass-1')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.shopping_list = ShoppingList.objects.create(user=self.user, name='Weekly')
+        for name, quantity, category, purchased in (
+            ('Milk', '1 l', 'dairy', False), ('Apples', '6', 'produce', True),
+            ('Pears, ripe', '4', 'produce', False), ('Cheese', '200 g', 'dairy', False),
+        ):
+            ShoppingListItem.objects.create(
+                shopping_list=self.shopping_list, name=name, quantity=quantity, category=category,
+                is_purchased=purchased,
+            )
+        self.url = f'/shopping/{self.shopping_list.pk}/export.csv'
+
+    def body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_rows_and_headers(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            response['Content-Disposition'], f'attachment; filename="shopping-list-{self.shopping_list.pk}.csv"'
+        )
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertTrue(response.has_header('ETag'))
+
+        rows = list(csv.reader(self.body(response).splitlines()))
+        self.assertEqual(rows[0], ['Category', 'Item', 'Quantity', 'Purchased', 'Priority', 'Notes'])
+        self.assertEqual([row[:4] for row in rows[1:]], [
+            ['Produce', 'Pears, ripe', '4', 'no'], ['Produce', 'Apples', '6', 'yes'],
+            ['Dairy & Eggs', 'Cheese', '200 g', 'no'], ['Dairy & Eggs', 'Milk', '1 l', 'no'],
+        ])
+
+    def test_text_and_print_exports_group_by_category(self):
+        text = self.body(self.client.get(f'/shopping/{self.shopping_list.pk}/export.txt'))
+        self.assertEqual(text.count('['), 4)
+        self.assertIn('\nProduce\n[ ] 4 Pears, ripe\n[x] 6 Apples\n', text)
+
+        response = self.client.get(f'/shopping/{self.shopping_list.pk}/print/')
+        self.assertFalse(response.has_header('Content-Disposition'))
+        page = self.body(response)
+        self.assertEqual(page.count('<h2>'), 2)
+        self.assertEqual(page.count('<li '), 4)
+
+    def test_unchanged_export_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        ShoppingListItem.objects.create(shopping_list=self.shopping_list, name='Bread', quantity='1', category='bakery')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(self.body(response).splitlines()), 6)
+
+    def test_exports_are_for_members_only(self):
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
@@ -13,9 +13,14 @@ urlpatterns = [
     path('<int:pk>/', views.ShoppingListDetailView.as_view(), name='shoppinglist_detail'),
     path('<int:pk>/edit/', views.ShoppingListUpdateView.as_view(), name='shoppinglist_update'),
     path('<int:pk>/delete/', views.ShoppingListDeleteView.as_view(), name='shoppinglist_delete'),
+    path('<int:pk>/events/', views.shopping_list_events, name='shoppinglist_events'),
+    path('<int:pk>/export.txt', views.export_shopping_list, {'fmt': 'txt'}, name='shoppinglist_export_txt'),
+    path('<int:pk>/export.csv', views.export_shopping_list, {'fmt': 'csv'}, name='shoppinglist_export_csv'),
+    path('<int:pk>/print/', views.export_shopping_list, {'fmt': 'print'}, name='shoppinglist_print'),
     
     # Generate from meal plan
     path('generate/<int:meal_plan_id>/', views.generate_from_meal_plan, name='generate_from_meal_plan'),
+    path('combine/', views.combine_shopping_list, name='combine'),
     
     # Add recipe to shopping list
     path('add-recipe/<slug:recipe_slug>/', views.add_recipe_to_shopping_list, name='add_recipe_to_list'),
@@ -25,6 +30,20 @@ urlpatterns = [
     path('item/<int:pk>/edit/', views.ShoppingListItemUpdateView.as_view(), name='item_update'),
     path('item/<int:pk>/delete/', views.ShoppingListItemDeleteView.as_view(), name='item_delete'),
     path('item/<int:pk>/toggle/', views.toggle_item_purchased, name='toggle_item_purchased'),
+    path('item/<int:pk>/check/', views.check_item, name='item_check'),
+    path('<int:pk>/check-items/', views.check_items, name='check_items'),
+    
+    # Stores and aisle order
+    path('stores/', views.StoreListView.as_view(), name='store_list'),
+    path('stores/create/', views.StoreCreateView.as_view(), name='store_create'),
+    path('stores/<int:pk>/edit/', views.StoreUpdateView.as_view(), name='store_update'),
+    path('stores/<int:pk>/delete/', views.StoreDeleteView.as_view(), name='store_delete'),
+    path('<int:pk>/store/', views.set_list_store, name='set_list_store'),
+    
+    # Pantry
+    path('pantry/', views.pantry_detail, name='pantry'),
+    path('pantry/items/<int:pk>/edit/', views.PantryItemUpdateView.as_view(), name='pantryitem_update'),
+    path('pantry/items/<int:pk>/delete/', views.PantryItemDeleteView.as_view(), name='pantryitem_delete'),
     
     # Sharing
     path('<int:pk>/share/', views.share_shopping_list, name='share_list'),
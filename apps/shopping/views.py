@@ -1,15 +1,35 @@
 """
 Views for Shopping App
 """
+from datetime import timedelta
+from itertools import groupby
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import F, Min, Prefetch
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
+from django.views.decorators.http import condition, require_POST
 from django.contrib import messages
+from django.db import transaction
+from django.utils import timezone
 
-from .models import ShoppingList, ShoppingListItem
-from .forms import ShoppingListForm, ShoppingListItemForm
+from .models import ShoppingList, ShoppingListItem, ShoppingListMember, Store, Pantry, PantryItem
+from .forms import (
+    ShoppingListForm, ShoppingListItemForm, StoreForm, StoreAisleFormSet, PantryItemForm, CombineListForm
+)
+from .access import accessible_items, accessible_lists, list_role_or_404, list_roles
+from .categories import classify_item, learn_override
+from .checkoff import list_progress, set_items_purchased
+from .exports import EXPORT_FORMATS, export_version, iter_export
+from .merging import add_recipes_to_list, combine_into_list, selected_meals
+from .pantry import PantryStock, restock_pantry
+from .pricing import list_cost
+from .realtime import get_backend, list_channel, publish_list_event
+from .regeneration import refresh_plan_lists
 from apps.mealplans.models import MealPlan
 from apps.recipes.models import Recipe
 
@@ -25,14 +45,14 @@ class ShoppingListListView(LoginRequiredMixin, ListView):
         # Return only owned lists for pagination
         return ShoppingList.objects.filter(
             user=self.request.user
-        ).prefetch_related('items', 'shared_with')
+        ).select_related('user', 'meal_plan').prefetch_related('memberships__user').order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Add shared lists separately
         context['shared_shopping_lists'] = ShoppingList.objects.filter(
-            shared_with=self.request.user
-        ).exclude(user=self.request.user).prefetch_related('items', 'shared_with', 'user')
+            memberships__user=self.request.user, memberships__role=ShoppingListMember.MEMBER
+        ).select_related('user', 'meal_plan').order_by('-created_at')
         return context
 
 
@@ -43,30 +63,39 @@ class ShoppingListDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'shopping_list'
     
     def get_queryset(self):
-        from django.db.models import Q
         # Include both owned and shared lists
-        return ShoppingList.objects.filter(
-            Q(user=self.request.user) | Q(shared_with=self.request.user)
-        ).distinct().prefetch_related('items', 'shared_with')
+        return accessible_lists(self.request.user).select_related('store').prefetch_related('memberships__user')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        shopping_list = self.object
+        store = self.object.store
+        group_by = self.request.GET.get('group')
+        if group_by not in ('category', 'recipe', 'aisle') or (group_by == 'aisle' and store is None):
+            group_by = 'aisle' if store else 'category'
         
-        # Organize items by source (recipe name from notes) or category
-        items_by_category = {}
-        for item in shopping_list.items.all():
-            # If notes contain "From [Recipe Name]", use that as the category
-            if item.notes and item.notes.startswith('From '):
-                category = item.notes.replace('From ', '')
-            else:
-                category = item.get_category_display()
-            
-            if category not in items_by_category:
-                items_by_category[category] = []
-            items_by_category[category].append(item)
+        # The query returns items already in group order, so grouping is a single pass
+        items = self.object.items.prefetch_related(
+            Prefetch('recipes', queryset=Recipe.objects.only('title', 'slug').order_by('title'))
+        )
+        if group_by == 'recipe':
+            items = items.annotate(source=Min('recipes__title')).order_by(
+                F('source').asc(nulls_last=True), 'is_purchased', 'category', 'order', 'name'
+            )
+            key = lambda item: item.source or 'Other items'
+        elif group_by == 'aisle':
+            # Aisle positions are looked up in SQL, so the query returns items in route order
+            items = items.in_store_order(store)
+            key = lambda item: item.aisle_name or item.get_category_display()
+        else:
+            items = items.in_category_order()
+            key = ShoppingListItem.get_category_display
         
-        context['items_by_category'] = items_by_category
+        context['group_by'] = group_by
+        context['stores'] = Store.objects.filter(user=self.request.user).only('name')
+        context['item_groups'] = [(label, list(group)) for label, group in groupby(items, key)]
+        context['estimated_cost'] = list_cost(
+            self.object, [item for _, group in context['item_groups'] for item in group]
+        )
         return context
 
 
@@ -100,14 +129,8 @@ class ShoppingListUpdateView(LoginRequiredMixin, UpdateView):
     
     def get(self, request, *args, **kwargs):
         """Check if user is trying to edit a shared list"""
-        from django.db.models import Q
         pk = self.kwargs.get('pk')
-        shared_list = ShoppingList.objects.filter(
-            pk=pk,
-            shared_with=request.user
-        ).first()
-        
-        if shared_list:
+        if list_roles(request).get(pk) == ShoppingListMember.MEMBER:
             messages.error(request, 'You cannot edit this list. Only the owner can edit list details.')
             return redirect('shopping:shoppinglist_detail', pk=pk)
         
@@ -143,14 +166,8 @@ class ShoppingListDeleteView(LoginRequiredMixin, DeleteView):
     
     def get(self, request, *args, **kwargs):
         """Check if user is trying to delete a shared list"""
-        from django.db.models import Q
         pk = self.kwargs.get('pk')
-        shared_list = ShoppingList.objects.filter(
-            pk=pk,
-            shared_with=request.user
-        ).first()
-        
-        if shared_list:
+        if list_roles(request).get(pk) == ShoppingListMember.MEMBER:
             messages.error(request, 'You cannot delete a shared list. Only the owner can delete it.')
             return redirect('shopping:shoppinglist_detail', pk=pk)
         
@@ -166,40 +183,64 @@ def generate_from_meal_plan(request, meal_plan_id):
     """Generate a shopping list from a meal plan"""
     meal_plan = get_object_or_404(MealPlan, pk=meal_plan_id, user=request.user)
     
-    # Create shopping list
-    shopping_list = ShoppingList.objects.create(
-        user=request.user,
-        meal_plan=meal_plan,
-        name=f"Shopping for {meal_plan.name}"
+    # A plan keeps one open list; bring it up to date instead of starting another
+    linked = ShoppingList.objects.filter(
+        user=request.user, meal_plan=meal_plan, is_completed=False
+    ).order_by('-updated_at').first()
+    if linked is not None:
+        refresh_plan_lists(meal_plan.pk)
+        messages.success(request, f'"{linked.name}" is up to date with {meal_plan.name}.')
+        return redirect('shopping:shoppinglist_detail', pk=linked.pk)
+    
+    # Sum ingredient amounts across meals, scaled by servings and converted between units,
+    # less what the pantry already holds
+    shopping_list, created, _, stock = combine_into_list(
+        request.user, meals=meal_plan.meals.all(), meal_plan=meal_plan, name=f"Shopping for {meal_plan.name}"
     )
     
-    # Collect ingredients from all meals
-    ingredients_dict = {}
-    for meal in meal_plan.meals.select_related('recipe').prefetch_related('recipe__ingredients'):
-        for ingredient in meal.recipe.ingredients.all():
-            key = ingredient.name.lower()
-            if key in ingredients_dict:
-                # Ingredient already exists, could implement smart merging here
-                ingredients_dict[key]['count'] += 1
-            else:
-                ingredients_dict[key] = {
-                    'name': ingredient.name,
-                    'amount': ingredient.amount,
-                    'count': 1
-                }
-    
-    # Create shopping list items
-    for ingredient_data in ingredients_dict.values():
-        quantity = f"{ingredient_data['amount']} (x{ingredient_data['count']})" if ingredient_data['count'] > 1 else ingredient_data['amount']
-        ShoppingListItem.objects.create(
-            shopping_list=shopping_list,
-            name=ingredient_data['name'],
-            quantity=quantity,
-            category='other'  # Could implement smart categorization
+    netted = f' ({len(stock.netted)} netted against your pantry)' if stock.netted else ''
+    messages.success(request, f'Shopping list generated with {len(created)} items{netted}!')
+    return redirect('shopping:shoppinglist_detail', pk=shopping_list.pk)
+
+
+@login_required
+def combine_shopping_list(request):
+    """Combine meal plans, a date range and extra recipes into one new or existing list
+    
+    Submitting with ``preview`` shows what would be added and merged without
+    changing anything.
+    """
+    form = CombineListForm(
+        request.POST or None, user=request.user, initial={'meal_plans': request.GET.getlist('meal_plan')}
+    )
+    preview = None
+    if request.method == 'POST' and form.is_valid():
+        data = form.cleaned_data
+        meal_plans = list(data['meal_plans'])
+        date_ranges = [(data['start_date'], data['end_date'])] if data['start_date'] else []
+        # Items keep a link to their plan only when they all come from one
+        meal_plan = meal_plans[0] if len(meal_plans) == 1 and not (date_ranges or data['recipes']) else None
+        dry_run = 'preview' in request.POST
+        shopping_list, created, updated, stock = combine_into_list(
+            request.user,
+            meals=selected_meals(request.user, meal_plans, date_ranges),
+            recipes=[(recipe, data['servings']) for recipe in data['recipes']],
+            shopping_list=data['shopping_list'],
+            name=data['name'] or (f"Shopping for {meal_plan.name}" if meal_plan else 'Combined shopping list'),
+            meal_plan=meal_plan,
+            dry_run=dry_run,
         )
+        if dry_run:
+            preview = {'created': created, 'updated': updated, 'netted': stock.netted}
+        else:
+            netted = f', {len(stock.netted)} netted against the pantry' if stock.netted else ''
+            messages.success(
+                request,
+                f'Combined into "{shopping_list.name}": {len(created)} new, {len(updated)} merged{netted}.'
+            )
+            return redirect('shopping:shoppinglist_detail', pk=shopping_list.pk)
     
-    messages.success(request, f'Shopping list generated with {len(ingredients_dict)} items!')
-    return redirect('shopping:shoppinglist_detail', pk=shopping_list.pk)
+    return render(request, 'shopping/combine_form.html', {'form': form, 'preview': preview})
 
 
 @login_required
@@ -218,63 +259,112 @@ def add_recipe_to_shopping_list(request, recipe_slug):
             )
         else:
             # Use existing shopping list (allow shared lists too)
-            from django.db.models import Q
-            shopping_list = get_object_or_404(
-                ShoppingList.objects.filter(
-                    Q(user=request.user) | Q(shared_with=request.user)
-                ),
-                pk=shopping_list_id
-            )
+            shopping_list = get_object_or_404(accessible_lists(request.user), pk=shopping_list_id)
         
-        # Add ingredients to shopping list
-        ingredients_added = 0
-        for ingredient in recipe.ingredients.all():
-            # Check if item already exists
-            existing_item = shopping_list.items.filter(name__iexact=ingredient.name).first()
-            if existing_item:
-                # Update quantity if exists
-                existing_item.quantity = f"{existing_item.quantity} + {ingredient.amount}"
-                existing_item.save()
-            else:
-                # Create new item
-                ShoppingListItem.objects.create(
-                    shopping_list=shopping_list,
-                    name=ingredient.name,
-                    quantity=ingredient.amount,
-                    notes=f"From {recipe.title}",
-                    category='other'  # Could implement smart categorization
-                )
-            ingredients_added += 1
+        # Merge ingredients into matching items, adding the rest
+        stock = PantryStock.for_user(shopping_list.user)
+        created, updated = add_recipes_to_list(shopping_list, [recipe], stock=stock)
         
-        messages.success(request, f'Added {ingredients_added} ingredients from "{recipe.title}" to shopping list!')
+        netted = f', {len(stock.netted)} netted against the pantry' if stock.netted else ''
+        messages.success(
+            request,
+            f'Added {len(created) + len(updated)} ingredients from "{recipe.title}" to shopping list '
+            f'({len(created)} new, {len(updated)} merged{netted})!'
+        )
         return redirect('shopping:shoppinglist_detail', pk=shopping_list.pk)
     
     # GET request: show shopping list selection (include shared lists)
-    from django.db.models import Q
-    shopping_lists = ShoppingList.objects.filter(
-        Q(user=request.user) | Q(shared_with=request.user)
-    ).distinct().order_by('-created_at')
+    shopping_lists = accessible_lists(request.user).order_by('-created_at')
     return render(request, 'shopping/add_recipe_to_list.html', {
         'recipe': recipe,
         'shopping_lists': shopping_lists
     })
 
 
+def _item_list_id(user, pk):
+    """Id of the list holding an item the user owns or shares, or 404"""
+    list_id = accessible_items(user).filter(pk=pk).values_list('shopping_list_id', flat=True).first()
+    if list_id is None:
+        raise Http404('No shopping list item matches the given query.')
+    return list_id
+
+
+def _check_off_response(request, items, shopping_list):
+    data = {
+        'items': [{'id': item.pk, 'is_purchased': item.is_purchased} for item in items],
+        'list': list_progress(shopping_list),
+    }
+    if request.POST.get('restock') == 'true':
+        # Only items this request checked off, so repeated taps never restock twice
+        created, updated = restock_pantry(request.user, [item for item in items if item.is_purchased])
+        data['restocked'] = len(created) + len(updated)
+    return JsonResponse(data)
+
+
 @login_required
+@require_POST
 def toggle_item_purchased(request, pk):
     """Toggle shopping list item purchased status"""
-    from django.db.models import Q
     # Allow both owner and shared users to toggle items
-    item = get_object_or_404(
-        ShoppingListItem,
-        pk=pk,
-        shopping_list__in=ShoppingList.objects.filter(
-            Q(user=request.user) | Q(shared_with=request.user)
+    list_id = _item_list_id(request.user, pk)
+    set_items_purchased(list_id, [pk])
+    return redirect('shopping:shoppinglist_detail', pk=list_id)
+
+
+@login_required
+@require_POST
+def check_item(request, pk):
+    """Toggle an item's purchased status and return its new state as JSON"""
+    list_id = _item_list_id(request.user, pk)
+    return _check_off_response(request, *set_items_purchased(list_id, [pk]))
+
+
+@login_required
+@require_POST
+def check_items(request, pk):
+    """Check off or uncheck several items of a list at once and return JSON
+    
+    Expects ``items`` (repeated item ids) and ``purchased`` ("true" or "false";
+    omitted toggles each item). With ``restock=true`` the items checked off
+    are added to the user's pantry.
+    """
+    list_role_or_404(request, pk)
+    try:
+        item_ids = [int(item_id) for item_id in request.POST.getlist('items')]
+    except ValueError:
+        return JsonResponse({'detail': 'items must be item ids.'}, status=400)
+    purchased = request.POST.get('purchased')
+    if purchased not in (None, 'true', 'false'):
+        return JsonResponse({'detail': 'purchased must be "true" or "false".'}, status=400)
+    if purchased is not None:
+        purchased = purchased == 'true'
+    return _check_off_response(request, *set_items_purchased(pk, item_ids, purchased))
+
+
+def _export_list(request, pk):
+    """Resolve the list an export covers once per request"""
+    if not hasattr(request, '_shopping_export'):
+        request._shopping_export = get_object_or_404(
+            accessible_lists(request.user).only('name', 'notes', 'version', 'updated_at'), pk=pk
         )
-    )
-    item.is_purchased = not item.is_purchased
-    item.save()
-    return redirect('shopping:shoppinglist_detail', pk=item.shopping_list.pk)
+    return request._shopping_export
+
+
+def _export_etag(request, pk, fmt):
+    return f'{fmt}-{export_version(_export_list(request, pk))}'
+
+
+@login_required
+@condition(etag_func=_export_etag)
+def export_shopping_list(request, pk, fmt):
+    """Download a shopping list as text or CSV, or open a print-ready page"""
+    shopping_list = _export_list(request, pk)
+    content_type = EXPORT_FORMATS[fmt][1]
+    response = StreamingHttpResponse(iter_export(shopping_list, fmt), content_type=content_type)
+    if fmt != 'print':
+        response['Content-Disposition'] = f'attachment; filename="shopping-list-{shopping_list.pk}.{fmt}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 class ShoppingListItemCreateView(LoginRequiredMixin, CreateView):
@@ -284,17 +374,17 @@ class ShoppingListItemCreateView(LoginRequiredMixin, CreateView):
     template_name = 'shopping/shoppinglistitem_form.html'
     
     def form_valid(self, form):
-        from django.db.models import Q
         # Allow both owner and shared users to add items
         shopping_list = get_object_or_404(
-            ShoppingList.objects.filter(
-                Q(user=self.request.user) | Q(shared_with=self.request.user)
-            ),
-            pk=self.kwargs.get('shopping_list_id')
+            accessible_lists(self.request.user), pk=self.kwargs.get('shopping_list_id')
         )
         form.instance.shopping_list = shopping_list
+        if form.instance.category == 'other':
+            form.instance.category = classify_item(shopping_list.user, form.instance.name)
+        response = super().form_valid(form)
+        publish_list_event(shopping_list.pk, 'items_added', [self.object])
         messages.success(self.request, 'Item added successfully!')
-        return super().form_valid(form)
+        return response
     
     def get_success_url(self):
         return reverse_lazy('shopping:shoppinglist_detail', kwargs={'pk': self.kwargs.get('shopping_list_id')})
@@ -307,18 +397,19 @@ class ShoppingListItemUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'shopping/shoppinglistitem_form.html'
     
     def get_queryset(self):
-        from django.db.models import Q
         # Allow both owner and shared users to edit items
-        return ShoppingListItem.objects.filter(
-            Q(shopping_list__user=self.request.user) | Q(shopping_list__shared_with=self.request.user)
-        )
+        return accessible_items(self.request.user)
     
     def get_success_url(self):
         return reverse_lazy('shopping:shoppinglist_detail', kwargs={'pk': self.object.shopping_list.pk})
     
     def form_valid(self, form):
+        if 'category' in form.changed_data:
+            learn_override(form.instance.shopping_list.user, form.instance.name, form.instance.category)
+        response = super().form_valid(form)
+        publish_list_event(self.object.shopping_list_id, 'items_updated', [self.object])
         messages.success(self.request, 'Item updated successfully!')
-        return super().form_valid(form)
+        return response
 
 
 class ShoppingListItemDeleteView(LoginRequiredMixin, DeleteView):
@@ -327,18 +418,163 @@ class ShoppingListItemDeleteView(LoginRequiredMixin, DeleteView):
     template_name = 'shopping/shoppinglistitem_confirm_delete.html'
     
     def get_queryset(self):
-        from django.db.models import Q
         # Allow both owner and shared users to delete items
-        return ShoppingListItem.objects.filter(
-            Q(shopping_list__user=self.request.user) | Q(shopping_list__shared_with=self.request.user)
-        )
+        return accessible_items(self.request.user)
     
     def get_success_url(self):
         return reverse_lazy('shopping:shoppinglist_detail', kwargs={'pk': self.object.shopping_list.pk})
     
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Item removed successfully!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        item_id, shopping_list_id = self.object.pk, self.object.shopping_list_id
+        response = super().form_valid(form)
+        publish_list_event(shopping_list_id, 'items_deleted', item_ids=[item_id])
+        messages.success(self.request, 'Item removed successfully!')
+        return response
+
+
+@login_required
+@require_POST
+def set_list_store(request, pk):
+    """Switch the store whose aisle order a list is shown in"""
+    # Allow both owner and shared users to pick the store they are shopping at
+    shopping_list = get_object_or_404(accessible_lists(request.user), pk=pk)
+    store_id = request.POST.get('store')
+    shopping_list.store = get_object_or_404(Store, pk=store_id, user=request.user) if store_id else None
+    shopping_list.save(update_fields=['store', 'updated_at'])
+    return redirect('shopping:shoppinglist_detail', pk=pk)
+
+
+class StoreListView(LoginRequiredMixin, ListView):
+    """List the user's stores"""
+    model = Store
+    template_name = 'shopping/store_list.html'
+    context_object_name = 'stores'
+    
+    def get_queryset(self):
+        return Store.objects.filter(user=self.request.user).prefetch_related('aisles')
+
+
+class StoreCreateView(LoginRequiredMixin, CreateView):
+    """Create a store with one aisle per category, then order them"""
+    model = Store
+    form_class = StoreForm
+    template_name = 'shopping/store_form.html'
+    
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+    
+    def form_valid(self, form):
+        form.instance.user = self.request.user
+        with transaction.atomic():
+            response = super().form_valid(form)
+            self.object.add_default_aisles()
+        messages.success(self.request, 'Store created! Put its aisles in the order you walk them.')
+        return response
+    
+    def get_success_url(self):
+        return reverse_lazy('shopping:store_update', kwargs={'pk': self.object.pk})
+
+
+class StoreUpdateView(LoginRequiredMixin, UpdateView):
+    """Rename a store and order its aisles"""
+    model = Store
+    form_class = StoreForm
+    template_name = 'shopping/store_form.html'
+    success_url = reverse_lazy('shopping:store_list')
+    
+    def get_queryset(self):
+        return Store.objects.filter(user=self.request.user)
+    
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.POST:
+            context['aisle_formset'] = StoreAisleFormSet(self.request.POST, instance=self.object, prefix='aisles')
+        else:
+            context['aisle_formset'] = StoreAisleFormSet(instance=self.object, prefix='aisles')
+        return context
+    
+    def form_valid(self, form):
+        aisle_formset = self.get_context_data()['aisle_formset']
+        if not aisle_formset.is_valid():
+            return self.form_invalid(form)
+        with transaction.atomic():
+            self.object = form.save()
+            aisle_formset.save()
+        messages.success(self.request, 'Store updated successfully!')
+        return redirect(self.success_url)
+
+
+class StoreDeleteView(LoginRequiredMixin, DeleteView):
+    """Delete a store; lists using it fall back to category order"""
+    model = Store
+    template_name = 'shopping/store_confirm_delete.html'
+    success_url = reverse_lazy('shopping:store_list')
+    
+    def get_queryset(self):
+        return Store.objects.filter(user=self.request.user)
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Store deleted successfully!')
+        return super().form_valid(form)
+
+
+@login_required
+def pantry_detail(request):
+    """Show the user's pantry and add items to it"""
+    pantry, _ = Pantry.objects.get_or_create(user=request.user)
+    if request.method == 'POST':
+        form = PantryItemForm(request.POST, instance=PantryItem(pantry=pantry))
+        if form.is_valid():
+            form.save()
+            messages.success(request, f'{form.instance.name} added to your pantry!')
+            return redirect('shopping:pantry')
+    else:
+        form = PantryItemForm()
+    
+    today = timezone.localdate()
+    items = pantry.items.order_by(F('expires_on').asc(nulls_last=True), 'name')
+    return render(request, 'shopping/pantry_detail.html', {
+        'pantry_items': items,
+        'form': form,
+        'today': today,
+        'soon': today + timedelta(days=3),
+    })
+
+
+class PantryItemUpdateView(LoginRequiredMixin, UpdateView):
+    """Update a pantry item"""
+    model = PantryItem
+    form_class = PantryItemForm
+    template_name = 'shopping/pantryitem_form.html'
+    success_url = reverse_lazy('shopping:pantry')
+    
+    def get_queryset(self):
+        return PantryItem.objects.filter(pantry__user=self.request.user)
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Pantry item updated successfully!')
+        return super().form_valid(form)
+
+
+class PantryItemDeleteView(LoginRequiredMixin, DeleteView):
+    """Remove an item from the pantry"""
+    model = PantryItem
+    template_name = 'shopping/pantryitem_confirm_delete.html'
+    success_url = reverse_lazy('shopping:pantry')
+    
+    def get_queryset(self):
+        return PantryItem.objects.filter(pantry__user=self.request.user)
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Item removed from your pantry.')
+        return super().form_valid(form)
 
 
 @login_required
@@ -358,10 +594,12 @@ def share_shopping_list(request, pk):
                 
                 if user_to_share == request.user:
                     messages.error(request, 'You cannot share a list with yourself.')
-                elif shopping_list.shared_with.filter(id=user_to_share.id).exists():
+                elif shopping_list.memberships.filter(user=user_to_share).exists():
                     messages.warning(request, f'List is already shared with {username}.')
                 else:
-                    shopping_list.shared_with.add(user_to_share)
+                    ShoppingListMember.objects.create(
+                        shopping_list=shopping_list, user=user_to_share, role=ShoppingListMember.MEMBER
+                    )
                     messages.success(request, f'Shopping list shared with {username} successfully!')
             except User.DoesNotExist:
                 messages.error(request, f'User "{username}" not found.')
@@ -381,7 +619,7 @@ def unshare_shopping_list(request, pk, user_id):
         User = get_user_model()
         
         user_to_remove = get_object_or_404(User, id=user_id)
-        shopping_list.shared_with.remove(user_to_remove)
+        shopping_list.memberships.filter(user=user_to_remove, role=ShoppingListMember.MEMBER).delete()
         messages.success(request, f'Stopped sharing with {user_to_remove.username}.')
     
     return redirect('shopping:shoppinglist_detail', pk=pk)
@@ -390,11 +628,45 @@ def unshare_shopping_list(request, pk, user_id):
 @login_required
 def leave_shared_list(request, pk):
     """Allow a shared user to remove themselves from a shopping list"""
-    shopping_list = get_object_or_404(ShoppingList, pk=pk, shared_with=request.user)
+    membership = get_object_or_404(
+        ShoppingListMember.objects.select_related('shopping_list'),
+        shopping_list_id=pk, user=request.user, role=ShoppingListMember.MEMBER
+    )
+    shopping_list = membership.shopping_list
     
     if request.method == 'POST':
-        shopping_list.shared_with.remove(request.user)
+        membership.delete()
         messages.success(request, f'Shopping list "{shopping_list.name}" removed successfully!')
         return redirect('shopping:shoppinglist_list')
     
     return redirect('shopping:shoppinglist_detail', pk=pk)
+
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_HEARTBEAT = 15
+
+
+async def shopping_list_events(request, pk):
+    """Server-sent event stream of item changes to a shopping list (requires ASGI)"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    allowed = await ShoppingListMember.objects.filter(user=user, shopping_list_id=pk).aexists()
+    if not allowed:
+        raise Http404('No shopping list found.')
+    
+    subscription = await get_backend().subscribe(list_channel(pk))
+    
+    async def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                message = await subscription.get(timeout=EVENT_STREAM_HEARTBEAT)
+                yield ': keep-alive\n\n' if message is None else f'data: {message}\n\n'
+        finally:
+            await subscription.close()
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -3,7 +3,8 @@ Admin Configuration for Users App
 """
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, EmailVerificationOTP
+from django.utils import timezone
+from .models import User, EmailVerificationOTP, OutgoingEmail, DeletionJob
 
 
 @admin.register(User)
@@ -37,3 +38,48 @@ class EmailVerificationOTPAdmin(admin.ModelAdmin):
         return obj.is_expired()
     is_expired_status.boolean = True
     is_expired_status.short_description = 'Expired'
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    """Admin configuration for the email outbox"""
+    list_display = ['subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['to_email', 'subject']
+    readonly_fields = [
+        'to_email', 'from_email', 'subject', 'body', 'status', 'attempts',
+        'next_attempt_at', 'last_error', 'created_at', 'sent_at'
+    ]
+    ordering = ['-created_at']
+    actions = ['retry_now']
+    
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=OutgoingEmail.STATUS_SENT).update(
+            status=OutgoingEmail.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{count} emails queued for the next outbox run.')
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    """Admin configuration for background deletion jobs"""
+    list_display = ['label', 'kind', 'status', 'deleted_rows', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['label']
+    readonly_fields = [
+        'kind', 'object_id', 'label', 'status', 'progress', 'deleted_rows', 'attempts',
+        'last_error', 'created_at', 'updated_at', 'finished_at'
+    ]
+    ordering = ['-created_at']
+    actions = ['retry_now']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected failed jobs')
+    def retry_now(self, request, queryset):
+        count = queryset.filter(status=DeletionJob.STATUS_FAILED).update(
+            status=DeletionJob.STATUS_PENDING, attempts=0
+        )
+        self.message_user(request, f'{count} jobs queued for the next deletion run.')
@@ -0,0 +1,164 @@
+"""
+Chunked Background Deletion of Accounts and Recipes
+
+Deleting a user or a recipe in the request would cascade through every table
+below it in one transaction. Instead the object is deactivated at once and a
+DeletionJob is queued. The ``run_deletion_jobs`` worker walks the cascade
+children first and deletes each table in primary-key chunks, each in its own
+short transaction, so no lock is held for long and an interrupted job resumes
+where it stopped. Files of deleted rows are removed from storage once their
+chunk is committed, and the job records how many rows each table lost. When
+meals in other users' plans go with a recipe, the shopping lists linked to
+those plans are refreshed in the same transaction.
+"""
+from contextlib import suppress
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from apps.mealplans.models import Meal
+from apps.recipes.models import Recipe
+from apps.shopping.regeneration import refresh_plan_lists
+from .models import DeletionJob
+
+
+CHUNK_SIZE = 500
+
+# Queued recipes give up their slug so the title can be reused straight away
+_RELEASED_SLUG = Concat(Value('deleted-'), Cast('pk', CharField()))
+
+MAX_ATTEMPTS = 3
+
+# Seconds after which a running job with no progress is taken over by another worker
+STALE_AFTER = 600
+
+
+@transaction.atomic
+def delete_user_later(user):
+    """Deactivate an account and hide its recipes now; queue the rest for the worker"""
+    get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+    Recipe.active.filter(author=user).update(deleted_at=timezone.now(), slug=_RELEASED_SLUG)
+    return DeletionJob.objects.create(kind=DeletionJob.KIND_USER, object_id=user.pk, label=user.username)
+
+
+@transaction.atomic
+def delete_recipe_later(recipe):
+    """Hide a recipe now and queue its deletion for the worker"""
+    Recipe.objects.filter(pk=recipe.pk).update(deleted_at=timezone.now(), slug=_RELEASED_SLUG)
+    return DeletionJob.objects.create(kind=DeletionJob.KIND_RECIPE, object_id=recipe.pk, label=recipe.title[:200])
+
+
+def _job_target(job):
+    model = get_user_model() if job.kind == DeletionJob.KIND_USER else Recipe
+    return model._base_manager.filter(pk=job.object_id)
+
+
+def _cascade_relations(model):
+    """Reverse relations, including auto-created many-to-many tables, that cascade from model"""
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+        and field.on_delete is models.CASCADE
+    ]
+
+
+def _plans_losing_meals(job, model, pks):
+    """Meal plans, other than the deleted user's own, that lose meals with this chunk"""
+    if model is not Meal:
+        return set()
+    meals = Meal.objects.filter(pk__in=pks)
+    if job.kind == DeletionJob.KIND_USER:
+        meals = meals.exclude(meal_plan__user_id=job.object_id)
+    return set(meals.values_list('meal_plan_id', flat=True).distinct())
+
+
+def _delete_chunks(job, queryset, chunk_size):
+    """Delete queryset's rows chunk by chunk, removing their files after each commit"""
+    model = queryset.model
+    file_fields = [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        chunk = model._base_manager.filter(pk__in=pks)
+        files = [
+            (field, name)
+            for row in chunk.values_list(*(field.attname for field in file_fields))
+            for field, name in zip(file_fields, row) if name
+        ] if file_fields else []
+        plans = _plans_losing_meals(job, model, pks)
+        with transaction.atomic():
+            deleted, _ = chunk.delete()
+            # The recipe's ingredients may be gone already, so each plan is compared in full
+            for meal_plan_id in sorted(plans):
+                refresh_plan_lists(meal_plan_id)
+        for field, name in files:
+            with suppress(Exception):
+                field.storage.delete(name)
+
+        label = model._meta.label
+        job.progress[label] = job.progress.get(label, 0) + deleted
+        job.deleted_rows += deleted
+        job.save(update_fields=['progress', 'deleted_rows', 'updated_at'])
+
+
+def _cascade(job, queryset, chunk_size, path=()):
+    """Delete every row cascading from queryset, children first, then queryset itself"""
+    model = queryset.model
+    for relation in _cascade_relations(model):
+        child = relation.related_model
+        if child in path or child is model:
+            continue
+        _cascade(
+            job, child._base_manager.filter(**{f'{relation.field.name}__in': queryset.values('pk')}),
+            chunk_size, path + (model,)
+        )
+    _delete_chunks(job, queryset, chunk_size)
+
+
+def run_job(job, chunk_size=CHUNK_SIZE):
+    """Carry out a claimed job; safe to run again after an interruption"""
+    _cascade(job, _job_target(job), chunk_size)
+    job.status = DeletionJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.last_error = ''
+    job.save(update_fields=['status', 'finished_at', 'last_error', 'updated_at'])
+
+
+def claim_job():
+    """Mark the oldest waiting (or abandoned) job as running for this worker and return it"""
+    stale = timezone.now() - timedelta(seconds=STALE_AFTER)
+    with transaction.atomic():
+        job = (
+            DeletionJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=DeletionJob.STATUS_PENDING) | Q(status=DeletionJob.STATUS_RUNNING, updated_at__lt=stale))
+            .order_by('created_at', 'pk').first()
+        )
+        if job is not None:
+            job.status = DeletionJob.STATUS_RUNNING
+            job.attempts += 1
+            job.save(update_fields=['status', 'attempts', 'updated_at'])
+    return job
+
+
+def run_pending_jobs(chunk_size=CHUNK_SIZE):
+    """Run queued jobs until none are left; return (finished, failed) counts"""
+    finished = failed = 0
+    while True:
+        job = claim_job()
+        if job is None:
+            return finished, failed
+        try:
+            run_job(job, chunk_size)
+        except Exception as error:
+            job.last_error = f'{type(error).__name__}: {error}'[:1000]
+            # Deleted chunks stay deleted, so a retry picks up the remainder
+            job.status = DeletionJob.STATUS_FAILED if job.attempts >= MAX_ATTEMPTS else DeletionJob.STATUS_PENDING
+            job.save(update_fields=['status', 'last_error', 'updated_at'])
+            failed += 1
+        else:
+            finished += 1
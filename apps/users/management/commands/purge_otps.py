@@ -0,0 +1,18 @@
+"""
+Management command to delete expired and used email verification codes
+Usage: python manage.py purge_otps [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+
+from apps.users.otp import PURGE_BATCH_SIZE, purge_otps
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and used OTP rows in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Rows deleted per chunk')
+
+    def handle(self, *args, **options):
+        deleted = purge_otps(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted} expired or used codes'))
@@ -0,0 +1,34 @@
+"""
+Management command to carry out queued account and recipe deletions
+Usage: python manage.py run_deletion_jobs [--chunk-size 500] [--loop] [--interval 10]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.deletion import CHUNK_SIZE, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Delete deactivated accounts and recipes with their data, table by table in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows deleted per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs until interrupted')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between polls when no job is waiting')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            finished, failed = run_pending_jobs(options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'✓ Finished {finished} deletion jobs, {failed} failed'))
+            return
+
+        self.stdout.write(f'Watching for deletion jobs every {options["interval"]:g}s (Ctrl+C to stop)')
+        try:
+            while True:
+                finished, failed = run_pending_jobs(options['chunk_size'])
+                if finished or failed:
+                    self.stdout.write(f'  finished {finished}, failed {failed}')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('✓ Stopped'))
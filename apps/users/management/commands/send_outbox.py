@@ -0,0 +1,46 @@
+"""
+Management command to deliver queued emails from the outbox
+Usage: python manage.py send_outbox [--batch-size 50] [--loop] [--interval 5] [--purge-every 3600]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.otp import purge_otps
+from apps.users.outbox import BATCH_SIZE, send_pending
+
+
+class Command(BaseCommand):
+    help = 'Send due outbox emails in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Messages claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox until interrupted')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls of an empty outbox')
+        parser.add_argument(
+            '--purge-every', type=float, default=3600,
+            help='Seconds between purges of expired and used OTPs while looping (0 to disable)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            sent, failed = send_pending(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'✓ Sent {sent} emails, {failed} failed'))
+            return
+
+        self.stdout.write(f'Watching the outbox every {options["interval"]:g}s (Ctrl+C to stop)')
+        next_purge = time.monotonic()
+        try:
+            while True:
+                if options['purge_every'] and time.monotonic() >= next_purge:
+                    purged = purge_otps()
+                    if purged:
+                        self.stdout.write(f'  purged {purged} expired or used codes')
+                    next_purge = time.monotonic() + options['purge_every']
+                sent, failed = send_pending(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f'  sent {sent}, failed {failed}')
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('✓ Stopped'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-19 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailverificationotp',
+            index=models.Index(fields=['email', 'created_at'], name='users_email_email_8a0c2a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailverificationotp',
+            index=models.Index(fields=['expires_at'], name='users_email_expires_8d0820_idx'),
+        ),
+    ]
@@ -50,7 +50,7 @@ class User(AbstractUser):
     @property
     def recipe_count(self):
         """Return the number of recipes created by this user"""
-        return self.recipes.count()
+        return self.recipes.active().count()
     
     @property
     def meal_plan_count(self):
@@ -73,6 +73,11 @@ class EmailVerificationOTP(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Email Verification OTP'
         verbose_name_plural = 'Email Verification OTPs'
+        indexes = [
+            models.Index(fields=['email', 'created_at']),
+            # Lets the purge find expired codes without scanning the table
+            models.Index(fields=['expires_at']),
+        ]
     
     def __str__(self):
         return f"OTP for {self.email} - {self.otp}"
@@ -101,3 +106,86 @@ class EmailVerificationOTP(models.Model):
             self.save()
             return True, "Email verified successfully"
         return False, "Invalid OTP"
+
+
+class OutgoingEmail(models.Model):
+    """
+    Email waiting in the outbox; the send_outbox worker delivers it
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Outgoing Email'
+        verbose_name_plural = 'Outgoing Emails'
+        indexes = [
+            # The worker's queue scan: pending messages that are due, oldest first
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} to {self.to_email} ({self.status})"
+
+
+class DeletionJob(models.Model):
+    """
+    Background deletion of a deactivated account or recipe and everything under it
+    """
+    KIND_USER = 'user'
+    KIND_RECIPE = 'recipe'
+    KIND_CHOICES = [
+        (KIND_USER, 'User account'),
+        (KIND_RECIPE, 'Recipe'),
+    ]
+    
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    label = models.CharField(max_length=200, help_text="Name of what is being deleted, for the admin")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.JSONField(default=dict, blank=True, help_text="Rows deleted so far per table")
+    deleted_rows = models.PositiveBigIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Deletion Job'
+        verbose_name_plural = 'Deletion Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Delete {self.get_kind_display().lower()} {self.label} ({self.status})"
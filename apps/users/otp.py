@@ -0,0 +1,77 @@
+"""
+OTP Request Throttling and Cleanup
+
+Requests for a code are counted per email address and per client IP in
+fixed cache windows, so a throttled request costs one cache increment and
+never reaches the database or the outbox. Limits come from the
+OTP_THROTTLE_RATES setting; with several server processes, point CACHES at a
+shared backend so they all see the same counters. Expired and used codes
+are deleted in primary-key chunks so the table stays small without long locks.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from .models import EmailVerificationOTP
+
+
+# (requests, seconds) allowed per scope when OTP_THROTTLE_RATES is not set
+DEFAULT_RATES = {'email': (3, 600), 'ip': (20, 3600)}
+
+PURGE_BATCH_SIZE = 1000
+
+
+def client_ip(request):
+    """Client address, taken from X-Forwarded-For behind REST_FRAMEWORK['NUM_PROXIES'] proxies as DRF does"""
+    return BaseThrottle().get_ident(request) or ''
+
+
+def _hit(scope, value, limit, period):
+    """Count a request in the current window; return seconds until it resets when over the limit"""
+    window = int(time.time() // period)
+    digest = hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]
+    key = f'otp-throttle:{scope}:{digest}:{window}'
+    cache.add(key, 0, period)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # The window expired between add and incr
+        cache.set(key, 1, period)
+        count = 1
+    if count > limit:
+        return int((window + 1) * period - time.time()) + 1
+    return None
+
+
+def otp_throttle_wait(request, email):
+    """Seconds the client must wait before requesting another code for email, or None"""
+    rates = getattr(settings, 'OTP_THROTTLE_RATES', DEFAULT_RATES)
+    waits = [
+        _hit(scope, value, *rates[scope])
+        for scope, value in (('ip', client_ip(request)), ('email', email or ''))
+        if scope in rates
+    ]
+    waits = [wait for wait in waits if wait]
+    return max(waits) if waits else None
+
+
+def throttle_message(wait):
+    """User-facing message for a throttled code request"""
+    minutes = -(-wait // 60)
+    return f'Too many code requests. Please try again in {minutes} minute{"s" if minutes != 1 else ""}.'
+
+
+def purge_otps(batch_size=PURGE_BATCH_SIZE):
+    """Delete expired and used codes in chunks; return how many were deleted"""
+    stale = EmailVerificationOTP.objects.filter(Q(expires_at__lt=timezone.now()) | Q(is_verified=True))
+    deleted = 0
+    while True:
+        pks = list(stale.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += EmailVerificationOTP.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,126 @@
+"""
+Outbox for Transactional Email
+
+Views add messages to the OutgoingEmail table and return at once. The
+``send_outbox`` worker claims due messages in batches and sends them over one
+backend connection, reopened only after a failure, then records every outcome
+in a single bulk_update. A failed message is retried with exponential backoff
+until it runs out of attempts. Any EMAIL_BACKEND works, including the console
+and locmem backends used locally.
+"""
+from contextlib import suppress
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+BATCH_SIZE = 50
+
+MAX_ATTEMPTS = 5
+
+# Seconds before the first retry; each later retry waits twice as long
+RETRY_DELAY = 30
+
+# Seconds a claimed batch stays hidden from other workers while it is sent
+CLAIM_TIMEOUT = 300
+
+
+def enqueue_email(subject, body, to_email, from_email=None):
+    """Queue a plain-text email for the outbox worker and return it"""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def retry_delay(attempts):
+    """Wait before the next try after the given number of failed attempts"""
+    return timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """Lease up to batch_size due messages to this worker, oldest first
+
+    Rows locked by another worker are skipped, and claimed rows are pushed
+    past CLAIM_TIMEOUT so a worker that dies mid-batch only delays them.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        OutgoingEmail.objects.filter(pk__in=[message.pk for message in batch]).update(
+            next_attempt_at=now + timedelta(seconds=CLAIM_TIMEOUT)
+        )
+    return batch
+
+
+def _failed(message, error, now):
+    message.attempts += 1
+    message.last_error = f'{type(error).__name__}: {error}'[:1000]
+    if message.attempts >= MAX_ATTEMPTS:
+        message.status = OutgoingEmail.STATUS_FAILED
+    else:
+        message.next_attempt_at = now + retry_delay(message.attempts)
+
+
+def send_batch(connection, batch):
+    """Send claimed messages over an open connection; return (sent, failed) counts"""
+    now = timezone.now()
+    sent = 0
+    for message in batch:
+        try:
+            connection.send_messages([EmailMessage(
+                message.subject, message.body, message.from_email or None, [message.to_email],
+                connection=connection,
+            )])
+        except Exception as error:
+            _failed(message, error, now)
+            # Drop a broken connection; the next send opens a fresh one
+            with suppress(Exception):
+                connection.close()
+        else:
+            message.status = OutgoingEmail.STATUS_SENT
+            message.attempts += 1
+            message.sent_at = now
+            message.last_error = ''
+            sent += 1
+    OutgoingEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, len(batch) - sent
+
+
+def send_pending(batch_size=BATCH_SIZE):
+    """Send every due message, batch by batch over one connection; return (sent, failed) counts"""
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        now = timezone.now()
+        for message in batch:
+            _failed(message, error, now)
+        OutgoingEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+        return 0, len(batch)
+
+    sent = failed = 0
+    try:
+        while batch:
+            batch_sent, batch_failed = send_batch(connection, batch)
+            sent += batch_sent
+            failed += batch_failed
+            batch = claim_batch(batch_size)
+    finally:
+        with suppress(Exception):
+            connection.close()
+    return sent, failed
@@ -0,0 +1,237 @@
+"""
+Tests for the users app
+Run with: python manage.py test apps.users.tests
+"""
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from apps.mealplans.models import Meal, MealPlan
+from apps.recipes.models import Ingredient, Recipe
+from apps.shopping.merging import combine_into_list
+from . import deletion
+from .deletion import delete_recipe_later, delete_user_later, run_pending_jobs
+from .models import DeletionJob, OutgoingEmail
+from .otp import otp_throttle_wait
+from .outbox import MAX_ATTEMPTS, RETRY_DELAY, enqueue_email, send_pending
+
+
+class DeletionJobTests(TestCase):
+    """Background deletion keeps other users' plan shopping lists in step"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create_user('ivan', 'ivan@example.com', 'secret-pass-1')
+        cls.planner = User.objects.create_user('judy', 'judy@example.com', 'secret-pass-1')
+
+    def setUp(self):
+        self.shared = self.recipe(self.author, 'Shakshuka', [('Eggs', '4'), ('Tomatoes', '3')])
+        own = self.recipe(self.planner, 'Omelette', [('Eggs', '2')])
+        self.plan = MealPlan.objects.create(user=self.planner, name='Week', start_date=date(2026, 2, 2))
+        for day, recipe in enumerate((self.shared, own)):
+            Meal.objects.create(
+                meal_plan=self.plan, recipe=recipe, meal_type='dinner', day_of_week=day,
+                date=date(2026, 2, 2 + day), servings=2,
+            )
+        self.shopping_list = combine_into_list(
+            self.planner, meals=self.plan.meals.all(), meal_plan=self.plan, name='Shopping for Week'
+        )[0]
+
+    def recipe(self, author, title, ingredients):
+        recipe = Recipe.objects.create(
+            author=author, title=title, description=title, prep_time=5, cook_time=5, servings=2,
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(recipe=recipe, name=name, amount=amount) for name, amount in ingredients
+        ])
+        return recipe
+
+    def quantities(self):
+        return dict(self.shopping_list.items.values_list('name', 'quantity'))
+
+    def test_deleting_a_recipe_refreshes_plans_that_used_it(self):
+        self.assertEqual(self.quantities(), {'Eggs': '6', 'Tomatoes': '3'})
+
+        delete_recipe_later(self.shared)
+        self.assertEqual(run_pending_jobs(chunk_size=1), (1, 0))
+
+        self.assertFalse(Recipe.objects.filter(pk=self.shared.pk).exists())
+        self.assertEqual(self.plan.meals.count(), 1)
+        self.assertEqual(self.quantities(), {'Eggs': '2'})
+
+    def test_deleting_an_author_refreshes_other_users_plans(self):
+        delete_user_later(self.author)
+        self.assertEqual(run_pending_jobs(), (1, 0))
+
+        job = DeletionJob.objects.get()
+        self.assertEqual(job.status, DeletionJob.STATUS_DONE)
+        self.assertEqual(job.progress['mealplans.Meal'], 1)
+        self.assertEqual(self.quantities(), {'Eggs': '2'})
+
+    def test_job_resumes_after_a_failed_chunk(self):
+        refresh = deletion.refresh_plan_lists
+        calls = []
+
+        def fail_once(meal_plan_id, recipe_ids=None):
+            calls.append(meal_plan_id)
+            if len(calls) == 1:
+                raise RuntimeError('database went away')
+            return refresh(meal_plan_id, recipe_ids)
+
+        delete_user_later(self.author)
+        with mock.patch.object(deletion, 'refresh_plan_lists', side_effect=fail_once):
+            self.assertEqual(run_pending_jobs(chunk_size=1), (1, 1))
+
+        job = DeletionJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (DeletionJob.STATUS_DONE, 2))
+        self.assertEqual(job.last_error, '')
+        self.assertEqual(job.progress['mealplans.Meal'], 1)
+        self.assertEqual(job.progress['recipes.Recipe'], 1)
+        self.assertEqual(job.deleted_rows, sum(job.progress.values()))
+        self.assertFalse(get_user_model().objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(self.quantities(), {'Eggs': '2'})
+
+    def test_failed_chunk_is_rolled_back_and_retried(self):
+        delete_user_later(self.author)
+        failing = mock.patch.object(deletion, 'refresh_plan_lists', side_effect=RuntimeError('database went away'))
+        with mock.patch.object(deletion, 'MAX_ATTEMPTS', 1), failing:
+            self.assertEqual(run_pending_jobs(chunk_size=1), (0, 1))
+
+        job = DeletionJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (DeletionJob.STATUS_FAILED, 1))
+        self.assertEqual(job.last_error, 'RuntimeError: database went away')
+        # The chunk whose plan refresh failed was not deleted, and the list still matches the plan
+        self.assertNotIn('mealplans.Meal', job.progress)
+        self.assertEqual(self.plan.meals.count(), 2)
+        self.assertEqual(self.quantities(), {'Eggs': '6', 'Tomatoes': '3'})
+
+        DeletionJob.objects.filter(pk=job.pk).update(status=DeletionJob.STATUS_PENDING)
+        self.assertEqual(run_pending_jobs(chunk_size=1), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DeletionJob.STATUS_DONE, 2))
+        self.assertEqual(self.plan.meals.count(), 1)
+        self.assertEqual(self.quantities(), {'Eggs': '2'})
+
+    def test_job_fails_after_its_attempts(self):
+        delete_recipe_later(self.shared)
+        with mock.patch.object(deletion, 'refresh_plan_lists', side_effect=RuntimeError('database went away')):
+            self.assertEqual(run_pending_jobs(chunk_size=1), (0, deletion.MAX_ATTEMPTS))
+
+        job = DeletionJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (DeletionJob.STATUS_FAILED, deletion.MAX_ATTEMPTS))
+        self.assertTrue(Recipe.objects.filter(pk=self.shared.pk).exists())
+        self.assertFalse(Recipe.active.filter(pk=self.shared.pk).exists())
+
+
+@override_settings(OTP_THROTTLE_RATES={'email': (3, 600), 'ip': (5, 3600)})
+class OtpThrottleTests(TestCase):
+    """Code requests are limited per email address and per client address"""
+
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_user('kate', 'kate@example.com', 'secret-pass-1')
+
+    def request_from(self, address, forwarded=None):
+        headers = {'REMOTE_ADDR': address}
+        if forwarded:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded
+        return RequestFactory().post('/users/send-otp/', **headers)
+
+    def test_email_is_locked_out_after_its_limit(self):
+        for _ in range(3):
+            self.client.post('/users/send-otp/', {'email': 'kate@example.com'})
+        self.assertEqual(OutgoingEmail.objects.count(), 3)
+
+        self.client.post('/users/send-otp/', {'email': 'kate@example.com'})
+        self.assertEqual(OutgoingEmail.objects.count(), 3)
+        self.assertGreater(otp_throttle_wait(self.request_from('10.0.0.9'), 'kate@example.com'), 0)
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1})
+    def test_clients_behind_the_proxy_have_their_own_limit(self):
+        for number in range(5):
+            request = self.request_from('10.0.0.1', '198.51.100.7, 203.0.113.5')
+            self.assertIsNone(otp_throttle_wait(request, f'user{number}@example.com'))
+        self.assertTrue(otp_throttle_wait(self.request_from('10.0.0.1', '203.0.113.5'), 'next@example.com'))
+        # Another client forwarded by the same proxy is not held back
+        self.assertIsNone(otp_throttle_wait(self.request_from('10.0.0.1', '203.0.113.6'), 'other@example.com'))
+
+
+class BouncingBackend(EmailBackend):
+    """locmem backend that refuses mail to bounce@ addresses, and cannot connect when told to"""
+    offline = False
+
+    def open(self):
+        if self.offline:
+            raise ConnectionError('SMTP server unreachable')
+        return super().open()
+
+    def send_messages(self, messages):
+        if any(address.startswith('bounce@') for message in messages for address in message.to):
+            raise ConnectionError('Recipient refused')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='apps.users.tests.BouncingBackend')
+class OutboxTests(TestCase):
+    """send_outbox delivers queued email and retries failures with backoff"""
+
+    def make_due(self):
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+
+    def test_send_outbox_delivers_due_messages(self):
+        for number in range(3):
+            enqueue_email(f'Code {number}', 'Your code', f'user{number}@example.com')
+        out = StringIO()
+        call_command('send_outbox', '--batch-size', '2', stdout=out)
+        self.assertIn('Sent 3 emails, 0 failed', out.getvalue())
+
+        self.assertEqual(sorted(message.subject for message in mail.outbox), ['Code 0', 'Code 1', 'Code 2'])
+        self.assertEqual(set(OutgoingEmail.objects.values_list('status', 'attempts')), {('sent', 1)})
+        self.assertEqual(send_pending(), (0, 0))
+
+    def test_failures_back_off_until_attempts_run_out(self):
+        bounced = enqueue_email('Code', 'Your code', 'bounce@example.com')
+        enqueue_email('Code', 'Your code', 'kate@example.com')
+        self.assertEqual(send_pending(), (1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+
+        for attempts in range(1, MAX_ATTEMPTS):
+            bounced.refresh_from_db()
+            self.assertEqual((bounced.status, bounced.attempts), ('pending', attempts))
+            self.assertEqual(bounced.last_error, 'ConnectionError: Recipient refused')
+            wait = bounced.next_attempt_at - timezone.now()
+            self.assertAlmostEqual(wait.total_seconds(), RETRY_DELAY * 2 ** (attempts - 1), delta=5)
+            # Not retried before it is due
+            self.assertEqual(send_pending(), (0, 0))
+            self.make_due()
+            self.assertEqual(send_pending(), (0, 1))
+
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('failed', MAX_ATTEMPTS))
+        self.make_due()
+        self.assertEqual(send_pending(), (0, 0))
+
+    def test_unreachable_server_delays_the_whole_batch(self):
+        for number in range(2):
+            enqueue_email('Code', 'Your code', f'user{number}@example.com')
+        BouncingBackend.offline = True
+        try:
+            self.assertEqual(send_pending(), (0, 2))
+        finally:
+            BouncingBackend.offline = False
+        self.assertEqual(set(OutgoingEmail.objects.values_list('status', 'attempts')), {('pending', 1)})
+        retry_at = timezone.now() + timedelta(seconds=RETRY_DELAY - 5)
+        self.assertEqual(OutgoingEmail.objects.filter(next_attempt_at__gt=retry_at).count(), 2)
+
+        self.make_due()
+        self.assertEqual(send_pending(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
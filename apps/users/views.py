@@ -5,11 +5,12 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import get_user_model, logout, login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from allauth.account.forms import SignupForm
 from .models import EmailVerificationOTP
+from .deletion import delete_user_later
+from .otp import otp_throttle_wait, throttle_message
+from .outbox import enqueue_email
 from .forms import ProfileUpdateForm
 
 User = get_user_model()
@@ -21,6 +22,12 @@ def send_verification_otp(request):
     if request.method == 'POST':
         email = request.POST.get('email')
         
+        # Throttled requests stop here, before any query or email
+        wait = otp_throttle_wait(request, email)
+        if wait:
+            messages.error(request, throttle_message(wait))
+            return render(request, 'users/send_otp.html')
+        
         # Check if user exists
         try:
             user = User.objects.get(email=email)
@@ -34,10 +41,9 @@ def send_verification_otp(request):
             email=email
         )
         
-        # Send email
-        try:
-            subject = 'MealMate - Email Verification OTP'
-            message = f'''
+        # Queue the email; the outbox worker delivers it
+        subject = 'MealMate - Email Verification OTP'
+        message = f'''
 Hello {user.username},
 
 Your OTP for email verification is: {otp_obj.otp}
@@ -48,23 +54,11 @@ If you didn't request this, please ignore this email.
 
 Best regards,
 MealMate Team
-            '''
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-            )
-            
-            messages.success(request, f'OTP has been sent to {email}')
-            return redirect('users:verify_otp', otp_id=otp_obj.id)
+        '''
+        enqueue_email(subject, message, email)
         
-        except Exception as e:
-            messages.error(request, f'Failed to send OTP: {str(e)}')
-            otp_obj.delete()
-            return render(request, 'users/send_otp.html')
+        messages.success(request, f'OTP has been sent to {email}')
+        return redirect('users:verify_otp', otp_id=otp_obj.id)
     
     return render(request, 'users/send_otp.html')
 
@@ -111,16 +105,21 @@ def resend_otp(request, otp_id):
         messages.error(request, 'Invalid OTP request.')
         return redirect('users:send_otp')
     
-    # Create new OTP
+    wait = otp_throttle_wait(request, old_otp.email)
+    if wait:
+        messages.error(request, throttle_message(wait))
+        return redirect('users:verify_otp', otp_id=otp_id)
+    
+    # Replace any unused codes for this address with a new one
+    EmailVerificationOTP.objects.filter(email=old_otp.email, is_verified=False).delete()
     new_otp = EmailVerificationOTP.objects.create(
         user=old_otp.user,
         email=old_otp.email
     )
     
-    # Send email
-    try:
-        subject = 'MealMate - Email Verification OTP (Resent)'
-        message = f'''
+    # Queue the email; the outbox worker delivers it
+    subject = 'MealMate - Email Verification OTP (Resent)'
+    message = f'''
 Hello {new_otp.user.username},
 
 Your new OTP for email verification is: {new_otp.otp}
@@ -131,29 +130,17 @@ If you didn't request this, please ignore this email.
 
 Best regards,
 MealMate Team
-        '''
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [new_otp.email],
-            fail_silently=False,
-        )
-        
-        messages.success(request, f'New OTP has been sent to {new_otp.email}')
-        return redirect('users:verify_otp', otp_id=new_otp.id)
+    '''
+    enqueue_email(subject, message, new_otp.email)
     
-    except Exception as e:
-        messages.error(request, f'Failed to send OTP: {str(e)}')
-        new_otp.delete()
-        return redirect('users:verify_otp', otp_id=otp_id)
+    messages.success(request, f'New OTP has been sent to {new_otp.email}')
+    return redirect('users:verify_otp', otp_id=new_otp.id)
 
 
 @login_required
 @require_http_methods(["POST"])
 def delete_account(request):
-    """Delete user account permanently"""
+    """Deactivate the account now and queue its data for background deletion"""
     user = request.user
     username = user.username
     
@@ -161,12 +148,13 @@ def delete_account(request):
         # Logout first
         logout(request)
         
-        # Delete the user (this will cascade delete all related data)
-        user.delete()
+        # Deactivate now; the deletion worker removes the account and its data in chunks
+        delete_user_later(user)
         
         messages.success(
             request, 
-            f'Account "{username}" has been permanently deleted. We\'re sorry to see you go!'
+            f'Account "{username}" has been deactivated and its data will be permanently deleted shortly. '
+            'We\'re sorry to see you go!'
         )
     except Exception as e:
         messages.error(request, f'Failed to delete account: {str(e)}')
@@ -210,6 +198,11 @@ def custom_signup(request):
             messages.error(request, 'Email already registered.')
             return render(request, 'account/signup.html')
         
+        wait = otp_throttle_wait(request, email)
+        if wait:
+            messages.error(request, throttle_message(wait))
+            return render(request, 'account/signup.html')
+        
         # Store signup data in session
         request.session['pending_signup'] = {
             'username': username,
@@ -223,10 +216,9 @@ def custom_signup(request):
             email=email
         )
         
-        # Send OTP email
-        try:
-            subject = 'MealMate - Verify Your Email to Complete Signup'
-            message = f'''
+        # Queue the OTP email; the outbox worker delivers it
+        subject = 'MealMate - Verify Your Email to Complete Signup'
+        message = f'''
 Hello {username},
 
 Welcome to MealMate! 
@@ -241,24 +233,12 @@ If you didn't sign up for MealMate, please ignore this email.
 
 Best regards,
 MealMate Team
-            '''
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-            )
-            
-            messages.success(request, f'Verification OTP has been sent to {email}. Please check your email.')
-            
-            return redirect('users:verify_signup_otp', otp_id=otp_obj.id)
+        '''
+        enqueue_email(subject, message, email)
         
-        except Exception as e:
-            messages.error(request, f'Failed to send OTP: {str(e)}')
-            otp_obj.delete()
-            return render(request, 'account/signup.html')
+        messages.success(request, f'Verification OTP has been sent to {email}. Please check your email.')
+        
+        return redirect('users:verify_signup_otp', otp_id=otp_obj.id)
     
     return render(request, 'account/signup.html')
 
@@ -343,16 +323,21 @@ def resend_signup_otp(request, otp_id):
         messages.error(request, 'Invalid OTP request.')
         return redirect('account_signup')
     
-    # Create new OTP
+    wait = otp_throttle_wait(request, old_otp.email)
+    if wait:
+        messages.error(request, throttle_message(wait))
+        return redirect('users:verify_signup_otp', otp_id=otp_id)
+    
+    # Replace any unused codes for this address with a new one
+    EmailVerificationOTP.objects.filter(email=old_otp.email, is_verified=False).delete()
     new_otp = EmailVerificationOTP.objects.create(
         user=None,
         email=old_otp.email
     )
     
-    # Send email
-    try:
-        subject = 'MealMate - Verify Your Email (OTP Resent)'
-        message = f'''
+    # Queue the email; the outbox worker delivers it
+    subject = 'MealMate - Verify Your Email (OTP Resent)'
+    message = f'''
 Hello {pending_signup['username']},
 
 Your new OTP for email verification is: {new_otp.otp}
@@ -363,23 +348,11 @@ If you didn't request this, please ignore this email.
 
 Best regards,
 MealMate Team
-        '''
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [new_otp.email],
-            fail_silently=False,
-        )
-        
-        messages.success(request, f'New OTP has been sent to {new_otp.email}')
-        return redirect('users:verify_signup_otp', otp_id=new_otp.id)
+    '''
+    enqueue_email(subject, message, new_otp.email)
     
-    except Exception as e:
-        messages.error(request, f'Failed to send OTP: {str(e)}')
-        new_otp.delete()
-        return redirect('users:verify_signup_otp', otp_id=otp_id)
+    messages.success(request, f'New OTP has been sent to {new_otp.email}')
+    return redirect('users:verify_signup_otp', otp_id=new_otp.id)
 
 
 @login_required
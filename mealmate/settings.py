@@ -159,6 +159,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 12,
+    # Reverse proxies in front of the app; client addresses are then read from X-Forwarded-For
+    'NUM_PROXIES': config('NUM_PROXIES', default='', cast=lambda value: int(value) if value else None),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -189,6 +191,16 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='webmaster@localhost')
 
+# OTP requests allowed as (count, seconds) per email address and per client IP; counted in the cache
+OTP_THROTTLE_RATES = {
+    'email': (config('OTP_EMAIL_RATE', default=3, cast=int), 600),
+    'ip': (config('OTP_IP_RATE', default=20, cast=int), 3600),
+}
+
+# Real-time shopping list events (LocalPubSub is per process; use RedisPubSub with several workers)
+SHOPPING_REALTIME_BACKEND = config('SHOPPING_REALTIME_BACKEND', default='apps.shopping.realtime.LocalPubSub')
+SHOPPING_REALTIME_REDIS_URL = config('SHOPPING_REALTIME_REDIS_URL', default='redis://localhost:6379/0')
+
 # Security Settings for Production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True